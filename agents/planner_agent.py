@@ -1,77 +1,304 @@
 from utils.get_llm_response import get_openai_client
+from utils.model_policy import create_chat_completion, track_model_tiers, record_model_tiers
+from utils.thread_context import with_script_run_ctx
+from utils.prompt_templates import PromptTemplate
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
+import re
+
+
+# Plans longer than this are built week by week in parallel (map-reduce)
+LONG_PLAN_MIN_DAYS = 8
+DAYS_PER_PART = 7
+MAX_TOPICS_PER_DAY = 3
+LONG_PLAN_WORKERS = 5
+# Longer requests are capped; each week costs two part calls
+MAX_PLAN_DAYS = 90
+# Rounds that regenerate only the days a long plan is still missing
+MISSING_DAY_RETRIES = 2
+
+
+PLAN_PROMPT = PromptTemplate("planner.plan", """
+You are a strategic content planning specialist. Create a comprehensive content plan based on the user's requirements.
+
+Based on the user's requirements, list only day-wise content topics with a brief description for each.
+- Detect the number of days needed from the user request; if not specified, default to 2 days.
+- For each day, provide a maximum of 3 topics.
+- For each topic, include a brief description.
+- Do not include any other sections (no schedule, KPIs, audience, etc.).
+
+Format your response STRICTLY as follows:
+Day 1:
+- [Topic 1]: [Brief description]
+- [Topic 2]: [Brief description]
+- [Topic 3]: [Brief description]
+
+Day 2:
+- [Topic 1]: [Brief description]
+- [Topic 2]: [Brief description]
+- [Topic 3]: [Brief description]
+
+[Add more days only if the user specifically asks for more.]
+""", (("conversation", "Conversation so far"), ("user_input", "User Request")))
+
+CRITIC_PROMPT = PromptTemplate("planner.critic", """
+You are a critic and clarity expert. Review the following content plan and improve its clarity, focus, and usefulness.
+
+Make sure each day's entry is:
+- Clear and easy to understand
+- Free from jargon or vague language
+- Aligned with the product's core value
+- Distinct from other days (no repetition)
+
+If a day’s theme or objective is unclear, rewrite it.
+If the message is too generic, make it more specific and value-driven.
+Keep the output structure unchanged.
+
+Format your response STRICTLY as follows:
+Day 1:
+- [Topic 1]: [Brief description]
+- [Topic 2]: [Brief description]
+- [Topic 3]: [Brief description]
+
+Day 2:
+- [Topic 1]: [Brief description]
+- [Topic 2]: [Brief description]
+- [Topic 3]: [Brief description]
+
+[Add more days only if the user specifically asks for more.]
+""", (("plan", "CONTENT PLAN"),))
+
+OUTLINE_PROMPT = PromptTemplate("planner.outline", """
+You are a strategic content planning specialist. Give a long content plan one distinct theme per week,
+so that weeks build on each other without repeating.
+
+Format your response STRICTLY as follows, one line per week and nothing else:
+Week 1: [Theme]
+Week 2: [Theme]
+...
+""", (("conversation", "Conversation so far"), ("horizon", "Plan length"), ("user_input", "User Request")))
+
+PART_PROMPT = PromptTemplate("planner.part", """
+You are a strategic content planning specialist. You are writing one part of a long day-wise content plan;
+the other parts are written separately.
+- Cover every day of your part, using the day numbers given.
+- Follow the theme of the part's week and do not repeat topics from other weeks of the outline.
+- For each day, provide a maximum of 3 topics, each with a brief description.
+- Do not include any other sections (no schedule, KPIs, audience, etc.).
+
+Format your response STRICTLY as follows, for every day of your part:
+Day N:
+- [Topic 1]: [Brief description]
+- [Topic 2]: [Brief description]
+- [Topic 3]: [Brief description]
+""", (("outline", "Weekly outline of the full plan"), ("part", "Your part"), ("user_input", "User Request")))
+
+PART_CRITIC_PROMPT = PromptTemplate("planner.part_critic", """
+You are a critic and clarity expert. Review the following days of a content plan and improve their clarity, focus, and usefulness.
+
+Make sure each day's entry is clear, free from jargon, aligned with the week's theme and distinct from the other days.
+Keep the output structure and the day numbers unchanged.
+
+Format your response STRICTLY as follows, for every day of the part:
+Day N:
+- [Topic 1]: [Brief description]
+- [Topic 2]: [Brief description]
+- [Topic 3]: [Brief description]
+""", (("part", "Part under review"), ("plan", "CONTENT PLAN")))
 
 
 # prompt chaining pattern
-def planner_agent(user_input):
-    prompt = f"""
-    You are a strategic content planning specialist. Based on the user's requirements, list only day-wise content topics with a brief description for each. 
-    - Detect the number of days needed from the user request; if not specified, default to 2 days.
-    - For each day, provide a maximum of 3 topics.
-    - For each topic, include a brief description.
-    - Do not include any other sections (no schedule, KPIs, audience, etc.).
-
-    User Request: {user_input}   
-    Format your response STRICTLY as follows:
-    Day 1:
-    - [Topic 1]: [Brief description]
-    - [Topic 2]: [Brief description]
-    - [Topic 3]: [Brief description]
-
-    Day 2:
-    - [Topic 1]: [Brief description]
-    - [Topic 2]: [Brief description]
-    - [Topic 3]: [Brief description]
-
-    [Add more days only if the user specifically asks for more.]
-    """
+def planner_agent(user_input, conversation=None):
+    days = detect_plan_days(user_input)
+    note = ""
+    if days and days > MAX_PLAN_DAYS:
+        note = (f"_Plans are limited to {MAX_PLAN_DAYS} days, so this plan covers the first "
+                f"{MAX_PLAN_DAYS} of the {days} days requested._\n\n")
+        days = MAX_PLAN_DAYS
+    if days and days >= LONG_PLAN_MIN_DAYS:
+        return note + long_planner_agent(user_input, days, conversation)
 
-    client = get_openai_client()
-    response = client.chat.completions.create(
-        model="gpt-4",
-        messages=[
-            {"role": "system", "content": "You are a strategic content planning specialist. Create a comprehensive content plan based on the user's requirements."},
-            {"role": "user", "content": prompt}
-        ]
+    return _single_call_plan(get_openai_client(), user_input, conversation)
+
+
+def _single_call_plan(client, user_input, conversation=None):
+    """Draft the whole plan in one call, then critique it in a second one."""
+    response = create_chat_completion(
+        client, "PlanerAgent", "plan",
+        messages=PLAN_PROMPT.render(conversation=conversation, user_input=user_input)
     )
 
     st.text('rethinking...')
     
-    critic_prompt = f"""
-    You are a critic and clarity expert.
-
-    Review the following content plan and improve its clarity, focus, and usefulness.  
-    Make sure each day's entry is:
-    - Clear and easy to understand
-    - Free from jargon or vague language
-    - Aligned with the product's core value
-    - Distinct from other days (no repetition)
-
-    If a day’s theme or objective is unclear, rewrite it.
-    If the message is too generic, make it more specific and value-driven.
-    Keep the output structure unchanged.
-
-    CONTENT PLAN:
-    {response.choices[0].message.content}
-    ------------------------------------------------------------
-    Format your response STRICTLY as follows:
-    Day 1:
-    - [Topic 1]: [Brief description]
-    - [Topic 2]: [Brief description]
-    - [Topic 3]: [Brief description]
-
-    Day 2:
-    - [Topic 1]: [Brief description]
-    - [Topic 2]: [Brief description]
-    - [Topic 3]: [Brief description]
-
-    [Add more days only if the user specifically asks for more.]
+    critic_response = create_chat_completion(
+        client, "PlanerAgent", "critic",
+        messages=CRITIC_PROMPT.render(plan=response.choices[0].message.content)
+    )
+    return critic_response.choices[0].message.content
+
+def detect_plan_days(user_input):
+    """
+    Detect the plan horizon requested in a prompt.
+
+    Args:
+        user_input (str): The user's request
+
+    Returns:
+        int or None: Number of days, or None if the prompt does not say
+    """
+    text = user_input.lower()
+    match = re.search(r"(\d+)\s*-?\s*days?\b", text)
+    if match:
+        return int(match.group(1))
+    match = re.search(r"(\d+)\s*-?\s*weeks?\b", text)
+    if match:
+        return int(match.group(1)) * 7
+    match = re.search(r"(\d+)\s*-?\s*months?\b", text)
+    if match:
+        return int(match.group(1)) * 30
+    if re.search(r"\b(a|one)\s+month\b", text):
+        return 30
+    if re.search(r"\b(a|one)\s+week\b", text):
+        return 7
+    return None
+
+
+def parse_plan_days(plan_text):
     """
-    critic_response = client.chat.completions.create(
-        model="gpt-4",
-        messages=[
-            {"role": "system", "content": "You are a critic and clarity expert. Review the following content plan and improve its clarity, focus, and usefulness."},
-            {"role": "user", "content": critic_prompt}
-        ]
+    Split a plan into its 'Day N:' blocks.
+
+    Args:
+        plan_text (str): Plan in the 'Day N:' / '- [Topic]: [Description]' format
+
+    Returns:
+        dict: day number -> list of topic lines ('- ...'), at most MAX_TOPICS_PER_DAY each;
+              days without any topic line are left out
+    """
+    days = {}
+    current = None
+    for line in (plan_text or "").splitlines():
+        line = line.strip().strip("*").strip()
+        header = re.match(r"^day\s+(\d+)\s*:", line, re.IGNORECASE)
+        if header:
+            current = int(header.group(1))
+            days.setdefault(current, [])
+        elif current is not None and re.match(r"^[-•*]\s*\S", line):
+            days[current].append("- " + line.lstrip("-•* ").strip())
+    return {day: topics[:MAX_TOPICS_PER_DAY] for day, topics in days.items() if topics}
+
+
+def _plan_outline(client, user_input, days, conversation=None):
+    """
+    Fix one theme per week so the parts generated in parallel stay coherent.
+
+    Returns:
+        list: Theme for each week (generic themes fill any the model left out)
+    """
+    weeks = -(-days // DAYS_PER_PART)
+    response = create_chat_completion(
+        client, "PlanerAgent", "outline",
+        messages=OUTLINE_PROMPT.render(
+            conversation=conversation, horizon=f"{days} days ({weeks} weeks)", user_input=user_input
+        )
     )
-    return critic_response.choices[0].message.content
\ No newline at end of file
+    themes = {}
+    for line in (response.choices[0].message.content or "").splitlines():
+        match = re.match(r"^\W*week\s+(\d+)\W*[:\-–]\s*(.+)$", line.strip(), re.IGNORECASE)
+        if match:
+            themes[int(match.group(1))] = match.group(2).strip()
+    return [themes.get(week, f"Week {week} of the plan") for week in range(1, weeks + 1)]
+
+
+def _plan_part(client, user_input, days, themes, start, end):
+    """
+    Generate and critique the days start..end of a long plan.
+
+    Returns:
+        dict: day number -> topic lines for every valid day of the part
+    """
+    week = (start - 1) // DAYS_PER_PART
+    outline = "\n".join(f"Week {i + 1}: {theme}" for i, theme in enumerate(themes))
+    part = f"Days {start} to {end} of a {days}-day plan, week {week + 1}, theme: {themes[week]}"
+    draft = create_chat_completion(
+        client, "PlanerAgent", "plan",
+        messages=PART_PROMPT.render(outline=outline, part=part, user_input=user_input)
+    ).choices[0].message.content
+
+    reviewed = create_chat_completion(
+        client, "PlanerAgent", "critic",
+        messages=PART_CRITIC_PROMPT.render(part=part, plan=draft)
+    ).choices[0].message.content
+
+    # Prefer the reviewed days; fall back to the draft for any the critic dropped
+    parsed = {**parse_plan_days(draft), **parse_plan_days(reviewed)}
+    return {day: topics for day, topics in parsed.items() if start <= day <= end}
+
+
+def _missing_ranges(plan, days):
+    """
+    Group the days missing from a plan into contiguous ranges within one week.
+
+    Returns:
+        list: (start, end) day ranges, each inside a single DAYS_PER_PART part
+    """
+    ranges = []
+    for day in range(1, days + 1):
+        if day in plan:
+            continue
+        if ranges and ranges[-1][1] == day - 1 and (ranges[-1][0] - 1) // DAYS_PER_PART == (day - 1) // DAYS_PER_PART:
+            ranges[-1] = (ranges[-1][0], day)
+        else:
+            ranges.append((day, day))
+    return ranges
+
+
+def long_planner_agent(user_input, days, conversation=None):
+    """
+    Build a long plan as map-reduce: outline, parallel week parts, local merge.
+
+    A short outline call fixes one theme per week. Each week is then drafted
+    and critiqued concurrently, so wall-clock time stays close to that of a
+    single week instead of growing with the number of days. The parts are
+    merged and checked locally: every day from 1 to days must have a
+    'Day N:' block with 1-3 topics. Only the days still missing are sent back
+    through the part calls, up to MISSING_DAY_RETRIES times.
+
+    Args:
+        user_input (str): The user's request
+        days (int): Number of days to plan
+        conversation (str, optional): Earlier conversation, given to the outline call
+
+    Returns:
+        str: Plan in the 'Day N:' format, with every day from 1 to days
+
+    Raises:
+        RuntimeError: If some days are still missing after the retries
+    """
+    client = get_openai_client()
+    themes = _plan_outline(client, user_input, days, conversation)
+    ranges = [(start, min(start + DAYS_PER_PART - 1, days)) for start in range(1, days + 1, DAYS_PER_PART)]
+    st.text(f'planning {days} days in {len(ranges)} parallel parts...')
+
+    def run_part(start, end):
+        with track_model_tiers() as tiers:
+            part = _plan_part(client, user_input, days, themes, start, end)
+        return part, tiers
+
+    plan = {}
+    with ThreadPoolExecutor(max_workers=LONG_PLAN_WORKERS) as executor:
+        for attempt in range(MISSING_DAY_RETRIES + 1):
+            if attempt:
+                print(f"Plan is missing days in {ranges}, regenerating them")
+            futures = [executor.submit(with_script_run_ctx(run_part), start, end) for start, end in ranges]
+            for future in futures:
+                part, tiers = future.result()
+                plan.update({day: topics for day, topics in part.items() if day not in plan})
+                record_model_tiers(tiers)
+            ranges = _missing_ranges(plan, days)
+            if not ranges:
+                break
+
+    if ranges:
+        missing = sum(end - start + 1 for start, end in ranges)
+        raise RuntimeError(f"Could not generate {missing} of the {days} days of this plan, please retry")
+    return "\n\n".join(f"Day {day}:\n" + "\n".join(plan[day]) for day in range(1, days + 1))
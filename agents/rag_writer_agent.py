@@ -1,12 +1,169 @@
 import re
 import streamlit as st
+from concurrent.futures import ThreadPoolExecutor
 from utils.get_llm_response import get_openai_client
-from utils.get_embeddings import get_embeddings
-from utils.handle_chroma_db import get_chroma_collection
-from utils.sanitize_collection_name import sanitize_collection_name
+from utils.get_embeddings import get_embeddings, get_collection_embedding_provider
+from utils.handle_chroma_db import get_chroma_client
+from utils.sanitize_collection_name import get_collection_name
+from utils.retrieval_cache import cached_retrieval
+from utils.model_policy import create_chat_completion, track_model_tiers, record_model_tiers
+from utils.thread_context import with_script_run_ctx
+from utils.prompt_templates import PromptTemplate
+from utils.compress_context import compress_context
+
+# Long-form requests are outlined, written section by section in parallel, then stitched
+LONG_FORM_MIN_WORDS = 1000
+LONG_FORM_KEYWORDS = ('long-form', 'long form', 'in-depth', 'comprehensive', 'ultimate guide',
+                      'complete guide', 'whitepaper', 'white paper', 'ebook', 'e-book', 'pillar')
+MAX_SECTIONS = 6
+SECTION_WORKERS = 6
+
+# Token budgets for retrieved context after sentence-level compression
+RAG_CONTEXT_TOKEN_BUDGET = 1500
+SECTION_CONTEXT_TOKEN_BUDGET = 600
+
+WRITER_PROMPT = PromptTemplate("rag_writer.write", """
+You are an expert content writer. Using the reference material provided by the user, write a compelling post about the requested topic.
+
+**Guidelines:**
+- Leverage insights from the provided context
+- Create engaging, original content
+- Use a conversational yet professional tone
+- Include relevant examples from the context
+- Structure with clear headings and formatting
+- Deliver actionable value to readers
+
+Write a complete, ready-to-publish post.
+""", (("conversation", "Conversation so far"), ("context", "Reference material"),
+      ("user_input", "Write a compelling post about")))
+
+WRITER_WITHOUT_FILES_PROMPT = PromptTemplate("rag_writer.write_without_files", """
+You are an expert content writer who creates engaging, high-quality posts on any topic.
+
+**Your Task:** Write a compelling post about the topic given by the user.
+
+**Writing Guidelines:**
+- Create original, engaging content that captures the reader's attention
+- Use a conversational yet professional tone
+- Include actionable insights when relevant
+- Structure with clear headings and bullet points for readability
+- Add relevant examples or case studies if applicable
+- Keep content informative and value-driven
+- Optimize for engagement with compelling hooks and conclusions
+
+**Output:** Provide a complete, ready-to-publish post that delivers real value to readers.
+""", (("conversation", "Conversation so far"), ("user_input", "Write a compelling post about")))
+
+OUTLINE_PROMPT = PromptTemplate("rag_writer.outline", f"""
+You are an expert content writer. Outline a long-form post about the topic given by the user.
+
+Return between 3 and {MAX_SECTIONS} section headings that together cover the topic without overlap,
+in reading order, one per line, formatted as:
+## [Heading]
+
+Do not include an introduction or conclusion heading. No other text.
+""", (("conversation", "Conversation so far"), ("user_input", "Topic")))
+
+SECTION_PROMPT = PromptTemplate("rag_writer.section", """
+You are an expert content writer. You are writing one section of a long-form post; the other sections
+of the outline are written separately, so do not cover them.
+
+- Write ONLY the requested section
+- Start directly with the body text, without repeating the heading
+- Use a conversational yet professional tone
+- Include relevant examples, from the reference material when there is any
+- Use ### sub-headings, lists or short paragraphs where they help readability
+""", (("context", "Reference material"), ("user_input", "Post topic"),
+      ("outline", "Full outline of the post"), ("heading", "Section to write")))
+
+STITCH_PROMPT = PromptTemplate("rag_writer.stitch", """
+You are an expert editor. You receive the openings of the sections of a long-form post.
+
+Write, in the same tone:
+1. A markdown title line starting with '# '
+2. A short introduction that previews the sections in order
+3. A line containing only ---
+4. A '## Conclusion' section with a concise wrap-up and call to action
+
+No other text.
+""", (("user_input", "Post topic"), ("openings", "Section openings")))
+
+def _retrieve_documents(user_input, collection_names, n_results):
+    """
+    Embed the query and search each selected collection.
+
+    The query is embedded once per embedding provider, since every collection
+    is searched with vectors from the provider it was built with. Collections
+    that no longer exist (dropped once no session referenced them) are
+    skipped; a query never creates a collection.
+
+    Args:
+        user_input (str): Query text
+        collection_names (list): Collections to search
+        n_results (int): Number of results per collection
+
+    Returns:
+        list or None: (chunk, similarity) pairs, or None if the query could not be embedded
+                      or none of the collections exists (so the result is not cached)
+    """
+    query_embeddings = {}
+    all_documents = []
+    for collection_name in collection_names:
+        try:
+            collection = get_chroma_client().get_collection(collection_name)
+        except Exception as e:
+            print(f"Skipping collection {collection_name}: {e}")
+            continue
+
+        provider = get_collection_embedding_provider(collection.metadata)
+        if provider not in query_embeddings:
+            query_embeddings[provider] = get_embeddings(user_input, provider)
+        query_embedding = query_embeddings[provider]
+        if query_embedding is None:
+            continue
+            
+        # Query the collection
+        collection_results = collection.query(
+            query_embeddings=[query_embedding],
+            n_results=n_results
+        )
+        
+        # Add the documents from this collection to our results, with the similarity
+        # of their (unit-length) embeddings from the squared L2 distance
+        if collection_results and 'documents' in collection_results:
+            distance_lists = collection_results.get('distances') or [[] for _ in collection_results['documents']]
+            for doc_list, distances in zip(collection_results['documents'], distance_lists):
+                similarities = [1 - d / 2 for d in distances] if len(distances) == len(doc_list) else [None] * len(doc_list)
+                all_documents.extend(zip(doc_list, similarities))
+    if not query_embeddings or all(embedding is None for embedding in query_embeddings.values()):
+        return None
+    return all_documents
+
+
+def _compress_retrieved(query, retrieved, token_budget):
+    """
+    Compress retrieved chunks into prompt context.
+
+    Args:
+        query (str): Query the context will answer
+        retrieved (list): (chunk, similarity) pairs from _retrieve_documents()
+        token_budget (int): Maximum estimated tokens of the context
+
+    Returns:
+        str: Context text
+    """
+    if not retrieved:
+        return ""
+    similarities = [similarity for _, similarity in retrieved]
+    context, _ = compress_context(
+        query, [chunk for chunk, _ in retrieved], token_budget,
+        similarities if None not in similarities else None
+    )
+    return context
+
 
 # rag used agent
-def handle_rag_writer_agent(user_input, uploaded_files, n_results=2):
+def handle_rag_writer_agent(user_input, uploaded_files, n_results=2, conversation=None):
     """
     Query the knowledge base with a question and get AI response.
         
@@ -15,58 +172,36 @@ def handle_rag_writer_agent(user_input, uploaded_files, n_results=2):
         selected_doc_indices (list): List of selected document indices
         uploaded_documents (list): List of uploaded documents
         n_results (int): Number of results to retrieve
+        conversation (str, optional): Earlier conversation for context
             
     Returns:
         str or None: AI response or None if error
     """
     try:
-        query_embedding = get_embeddings(user_input)
-        all_documents = []
-        for index in uploaded_files:
-            collection_name = sanitize_collection_name(index['name'])
-            collection = get_chroma_collection(collection_name)
-            
-            if not collection:
-                continue
-                
-            # Query the collection
-            collection_results = collection.query(
-                query_embeddings=[query_embedding],
-                n_results=n_results
-            )
-            
-            # Add the documents from this collection to our results
-            if collection_results and 'documents' in collection_results:
-                for doc_list in collection_results['documents']:
-                    all_documents.extend(doc_list)
+        # Several names of one file share its collection; search it once
+        collection_names = list(dict.fromkeys(get_collection_name(index) for index in uploaded_files))
+        if is_long_form_request(user_input):
+            long_form = long_form_writer(user_input, collection_names, n_results, conversation)
+            if long_form:
+                return long_form
+
+        all_documents = cached_retrieval(
+            user_input, collection_names, n_results,
+            lambda: _retrieve_documents(user_input, collection_names, n_results)
+        ) or []
         
         # Get OpenAI client
         client = get_openai_client()
         if not client or not all_documents:
             return None
             
-        # Combine all documents into context
-        context = "\n\n".join(all_documents)  # Limit to top 10 most relevant chunks
+        # Keep only the sentences relevant to the request
+        context = _compress_retrieved(user_input, all_documents, RAG_CONTEXT_TOKEN_BUDGET)
             
         # Generate response using retrieved context
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[{
-                "role": "user",
-                "content": f"""You are an expert content writer. Using the following reference material: {context}
-                
-                Write a compelling post about: {user_input}
-
-                **Guidelines:**
-                - Leverage insights from the provided context
-                - Create engaging, original content  
-                - Use a conversational yet professional tone
-                - Include relevant examples from the context
-                - Structure with clear headings and formatting
-                - Deliver actionable value to readers
-
-                Write a complete, ready-to-publish post."""
-            }]
+        response = create_chat_completion(
+            client, "RagWriterAgent", "write",
+            messages=WRITER_PROMPT.render(conversation=conversation, context=context, user_input=user_input)
         )
         
         return response.choices[0].message.content or None
@@ -77,47 +212,157 @@ def handle_rag_writer_agent(user_input, uploaded_files, n_results=2):
 
 
 
-def handle_rag_writer_agent_without_files(user_input):
+def handle_rag_writer_agent_without_files(user_input, conversation=None):
     try:
-        prompt = f"""
-        You are an expert content writer who creates engaging, high-quality posts on any topic. 
-        
-        **Your Task:** Write a compelling post about: {user_input}
-        
-        **Writing Guidelines:**
-        - Create original, engaging content that captures the reader's attention
-        - Use a conversational yet professional tone
-        - Include actionable insights when relevant  
-        - Structure with clear headings and bullet points for readability
-        - Add relevant examples or case studies if applicable
-        - Keep content informative and value-driven
-        - Optimize for engagement with compelling hooks and conclusions
-        
-        **Output:** Provide a complete, ready-to-publish post that delivers real value to readers."""
-        
+        if is_long_form_request(user_input):
+            long_form = long_form_writer(user_input, conversation=conversation)
+            if long_form:
+                return long_form
+
         # Generate response using OpenAI
         client = get_openai_client()
         if not client:
             return None
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[{
-                "role": "user",
-                "content": prompt
-            }]
+        response = create_chat_completion(
+            client, "RagWriterAgent", "write",
+            messages=WRITER_WITHOUT_FILES_PROMPT.render(conversation=conversation, user_input=user_input)
         )
         return response.choices[0].message.content or None
     except Exception as e:
         st.error(f"Error querying knowledge base: {str(e)}")
         return None
 
-def rag_writer_agent(user_input, uploaded_files):
+def rag_writer_agent(user_input, uploaded_files, conversation=None):
     response = None
     if uploaded_files:
-        response = handle_rag_writer_agent(user_input, uploaded_files)
+        response = handle_rag_writer_agent(user_input, uploaded_files, conversation=conversation)
     else:
-        response = handle_rag_writer_agent_without_files(user_input)
+        response = handle_rag_writer_agent_without_files(user_input, conversation)
 
     return response or None
     
-       
\ No newline at end of file
+       
+
+
+def is_long_form_request(user_input):
+    """
+    Check whether a writing request asks for a long piece.
+
+    Args:
+        user_input (str): The user's request
+
+    Returns:
+        bool: True for requests of LONG_FORM_MIN_WORDS+ words or long-form keywords
+    """
+    text = user_input.lower()
+    match = re.search(r"(\d[\d,]*)\s*\+?\s*-?\s*words?\b", text)
+    if match and int(match.group(1).replace(",", "")) >= LONG_FORM_MIN_WORDS:
+        return True
+    return any(keyword in text for keyword in LONG_FORM_KEYWORDS)
+
+
+def _outline_sections(client, user_input, conversation=None):
+    """
+    Ask for the section headings of a long piece.
+
+    Returns:
+        list: Section headings (empty if the outline could not be parsed)
+    """
+    response = create_chat_completion(
+        client, "RagWriterAgent", "outline",
+        messages=OUTLINE_PROMPT.render(conversation=conversation, user_input=user_input)
+    )
+    headings = []
+    for line in (response.choices[0].message.content or "").splitlines():
+        match = re.match(r"^\s*(?:#+|\d+[.)]|[-*•])\s*(.+)$", line)
+        heading = match.group(1).strip().strip("*").strip() if match else ""
+        if heading and heading.lower() not in ("introduction", "conclusion") and heading not in headings:
+            headings.append(heading)
+    return headings[:MAX_SECTIONS]
+
+
+def _write_section(client, user_input, headings, index, collection_names, n_results):
+    """
+    Write one section, grounded in chunks retrieved for that section only.
+
+    Returns:
+        str: Section in markdown, starting with its '## ' heading
+    """
+    heading = headings[index]
+    context = ""
+    if collection_names:
+        section_query = f"{user_input}\n{heading}"
+        documents = cached_retrieval(
+            section_query, collection_names, n_results,
+            lambda: _retrieve_documents(section_query, collection_names, n_results)
+        )
+        context = _compress_retrieved(section_query, documents or [], SECTION_CONTEXT_TOKEN_BUDGET)
+
+    outline = "\n".join(f"{i + 1}. {h}" for i, h in enumerate(headings))
+    response = create_chat_completion(
+        client, "RagWriterAgent", "section",
+        messages=SECTION_PROMPT.render(
+            context=context or "(none)", user_input=user_input, outline=outline, heading=heading
+        )
+    )
+    body = (response.choices[0].message.content or "").strip()
+    # Drop a repeated heading if the model added one anyway
+    body = re.sub(r"^#+\s*" + re.escape(heading) + r"\s*\n+", "", body, flags=re.IGNORECASE)
+    return f"## {heading}\n\n{body}"
+
+
+def _stitch_sections(client, user_input, sections):
+    """
+    Light consistency pass: write the title, introduction and conclusion around the sections.
+
+    Only the opening of each section is sent, so this call stays small
+    whatever the length of the post.
+
+    Returns:
+        str: Complete post
+    """
+    openings = "\n\n".join(section[:400] for section in sections)
+    response = create_chat_completion(
+        client, "RagWriterAgent", "stitch",
+        messages=STITCH_PROMPT.render(user_input=user_input, openings=openings)
+    )
+    framing = (response.choices[0].message.content or "").strip()
+    intro, _, conclusion = framing.partition("\n---")
+    parts = [intro.strip(), *sections, conclusion.strip()]
+    return "\n\n".join(part for part in parts if part)
+
+
+def long_form_writer(user_input, collection_names=None, n_results=2, conversation=None):
+    """
+    Write a long piece as outline, concurrent sections and a stitching pass.
+
+    Each section is written by its own call with only the chunks retrieved
+    for its heading, so per-call contexts stay small and latency follows the
+    slowest section instead of the full length of the post.
+
+    Args:
+        user_input (str): The user's request
+        collection_names (list, optional): Collections to ground each section in
+        n_results (int): Number of results per collection and section
+        conversation (str, optional): Earlier conversation, given to the outline call
+
+    Returns:
+        str or None: Post in markdown, or None if no usable outline was produced
+    """
+    client = get_openai_client()
+    if not client:
+        return None
+    headings = _outline_sections(client, user_input, conversation)
+    if len(headings) < 2:
+        return None
+
+    def write(index):
+        with track_model_tiers() as tiers:
+            return _write_section(client, user_input, headings, index, collection_names, n_results), tiers
+
+    with ThreadPoolExecutor(max_workers=SECTION_WORKERS) as executor:
+        results = list(executor.map(with_script_run_ctx(write), range(len(headings))))
+    for _, tiers in results:
+        record_model_tiers(tiers)
+
+    return _stitch_sections(client, user_input, [section for section, _ in results])
@@ -1,4 +1,8 @@
 from utils.get_llm_response import get_openai_client
+from utils.single_flight import single_flight, make_fingerprint
+from utils.model_policy import create_chat_completion
+from utils.prompt_templates import PromptTemplate
+from utils.compress_context import compress_context
 from tavily import TavilyClient
 import streamlit as st
 import json
@@ -25,49 +29,61 @@ tools_to_use  = [   {
     }
 }]
 
+_tavily_clients = {}
+
+# Token budget for web page content after sentence-level compression
+WEB_CONTEXT_TOKEN_BUDGET = 1000
+
 def get_tavily_client():
+    # Reuse one client per API key across sessions
     api_key = st.secrets["TAVILY_API_KEY"]
-    tavilyClient = TavilyClient(api_key)
+    tavilyClient = _tavily_clients.get(api_key)
+    if tavilyClient is None:
+        tavilyClient = TavilyClient(api_key)
+        _tavily_clients[api_key] = tavilyClient
     return tavilyClient
 
 
 def web_search(query):
     
-  content = ""
   tavilyClient = get_tavily_client()
-  response = tavilyClient.search(query=query,max_results=2)
+  # Concurrent sessions searching the same query share one Tavily call
+  response = single_flight(
+    "web_search",
+    make_fingerprint(query, 2),
+    lambda: tavilyClient.search(query=query,max_results=2)
+  )
   web_results = response.get("results")
-  for r in web_results:
-    content+=(r["content"])
+  # Keep only the sentences of the pages that are relevant to the query
+  content, _ = compress_context(query, [r["content"] for r in web_results], WEB_CONTEXT_TOKEN_BUDGET)
   return (content)
 
-def research_agent(user_input):
-    prompt = f"""
-    You are a ResearchAgent.
 
-    Given the product or service description below, identify up to 5 relevant insights to inform marketing strategy or content planning.
+RESEARCH_PROMPT = PromptTemplate("research.answer", """
+You are a ResearchAgent.
+
+Given the product or service description from the user, identify up to 5 relevant insights to inform marketing strategy or content planning.
+
+For each insight, provide:
+- Insight: [short title or key point]
+- Category: [e.g., audience pain point, trending topic, competitor angle, content gap]
+- Why it matters: [1–2 lines]
 
-    USER INPUT:  
-    {user_input}
+Return in plain text, formatted like this:
 
-    For each insight, provide:
-    - Insight: [short title or key point]
-    - Category: [e.g., audience pain point, trending topic, competitor angle, content gap]
-    - Why it matters: [1–2 lines]
+Insight: [title]
+Category: [type]
+Why it matters: [explanation]
+""", (("conversation", "Conversation so far"), ("user_input", "USER INPUT")))
 
-    Return in plain text, formatted like this:
 
-    Insight: [title]  
-    Category: [type]  
-    Why it matters: [explanation]  
-    """
+def research_agent(user_input, conversation=None):
+    messages = RESEARCH_PROMPT.render(conversation=conversation, user_input=user_input)
 
     client = get_openai_client()
-    response = client.chat.completions.create(
-        model="gpt-4",
-        messages=[
-            {"role": "user", "content": prompt}
-        ],
+    response = create_chat_completion(
+        client, "ResearchAgent", "tool_call",
+        messages=messages,
         tools = tools_to_use
         
     )
@@ -77,11 +93,9 @@ def research_agent(user_input):
     arguments = json.loads(tool_calls[0].function.arguments)
     res = web_search(arguments.get("query"))
 
-    final_reponse = client.chat.completions.create(
-    model="gpt-4",
-    messages=[{
-        "role":"user","content": prompt
-    },{
+    final_reponse = create_chat_completion(
+    client, "ResearchAgent", "answer",
+    messages=[*messages,{
         "role":"assistant","tool_calls":tool_calls
     },
       {
@@ -2,27 +2,26 @@ import streamlit as st
 from utils.get_llm_response import get_llm_response
 from openai import OpenAI
 from utils.get_llm_response import get_openai_client
+from utils.model_policy import create_chat_completion
+from utils.prompt_templates import PromptTemplate
 
-def seo_agent(user_input):
-    prompt = f"""
-   You are an expert SEO assistant.
+SEO_PROMPT = PromptTemplate("seo.answer", """
+You are a SEO specialist. Create a comprehensive SEO plan based on the user's requirements.
 
-    Task: {user_input}
+You are an expert SEO assistant. Provide a concise, actionable SEO response to the task. Focus your answer on:
+- Primary keyword(s) and search intent
+- Top 5 keyword suggestions OR a step-by-step strategy (as needed)
+- One practical recommendation to improve SEO for the query
+- 5 suitable hashtags relevant to the topic
 
-    Provide a concise, actionable SEO response. Focus your answer on:
-    - Primary keyword(s) and search intent
-    - Top 5 keyword suggestions OR a step-by-step strategy (as needed)
-    - One practical recommendation to improve SEO for the query
-    - 5 suitable hashtags relevant to the topic
+Use a clear bullet or numbered list. Do not add extra explanations or sections.
+""", (("conversation", "Conversation so far"), ("user_input", "Task")))
 
-    Use a clear bullet or numbered list. Do not add extra explanations or sections.
-    """
+
+def seo_agent(user_input, conversation=None):
     client = get_openai_client()
-    response = client.chat.completions.create(
-        model="gpt-4",
-        messages=[
-            {"role": "system", "content": "You are a SEO specialist. Create a comprehensive SEO plan based on the user's requirements."},
-            {"role": "user", "content": prompt}
-        ]
+    response = create_chat_completion(
+        client, "SeoAgent", "answer",
+        messages=SEO_PROMPT.render(conversation=conversation, user_input=user_input)
     )
     return response.choices[0].message.content
\ No newline at end of file
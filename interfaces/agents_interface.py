@@ -1,5 +1,7 @@
 import streamlit as st
 from interfaces.chat_interface import show_chat_interface
+from utils.session_manager import get_memory_report, get_session_id
+from utils.request_profiler import PROFILE_ALL_REQUESTS
 
 def show_agents_interface():
     """Display the agents interface with sidebar navigation"""
@@ -76,6 +78,40 @@ def show_agents_interface():
         
         st.markdown("#### 🔬 ResearchAgent")
         st.markdown("*Comprehensive topic research*")
+        
+        st.markdown("---")
+        
+        # Profile the next agent call or upload to find where its time goes
+        if PROFILE_ALL_REQUESTS:
+            st.caption("🔥 Profiling every request (PROFILE_REQUESTS=1)")
+        elif st.session_state.get("profile_next_request"):
+            st.caption("🔥 The next request will be profiled")
+        elif st.button("🔥 Profile next request", key="profile_next_request_button", use_container_width=True):
+            st.session_state.profile_next_request = True
+            st.rerun()
+        
+        last_profile = st.session_state.get("last_profile")
+        if last_profile:
+            with st.expander(f"🔥 Last profile: {last_profile['label']} ({last_profile['duration_seconds']:.2f}s)"):
+                st.caption(f"cProfile: `{last_profile['prof_path']}`")
+                st.caption(f"Collapsed stacks ({last_profile['samples']} samples): `{last_profile['collapsed_path']}`")
+                st.dataframe(last_profile['top'], use_container_width=True, hide_index=True)
+        
+        # Memory used by this session and by all sessions in the process
+        with st.expander("🧠 Memory"):
+            report = get_memory_report()
+            mb = 1024 * 1024
+            session = report['sessions'].get(get_session_id())
+            if session:
+                st.caption(
+                    f"This session: {session['state_bytes'] / mb:.2f} MB in memory, "
+                    f"{session['disk_bytes'] / mb:.2f} MB on disk, "
+                    f"{session['memory_delta_bytes'] / mb:+.1f} MB {report['source']} over {session['runs']} runs"
+                )
+            st.caption(
+                f"All sessions ({len(report['sessions'])}): {report['total_state_bytes'] / mb:.2f} MB in memory, "
+                f"{report['total_disk_bytes'] / mb:.2f} MB on disk; process {report['process_bytes'] / mb:.0f} MB {report['source']}"
+            )
     
     # Main content area
     show_chat_interface()
\ No newline at end of file
@@ -1,13 +1,17 @@
 import streamlit as st
 import time
 from streamlit_extras.add_vertical_space import add_vertical_space
-from utils.sanitize_collection_name import sanitize_collection_name
-from utils.assign_agent import assign_agent
-from interfaces.session_history import add_to_history, initialize_history, get_history
+from utils.sanitize_collection_name import get_collection_name
+from utils.assign_agent import assign_agent, assign_task_graph, is_composite_request
+from utils.run_task_graph import run_task_graph
+from interfaces.session_history import add_to_history, initialize_history, get_history, get_conversation_context, get_entry_response
 from utils.handle_agent_call import handle_agent_call
-from utils.extract_pdf_content import extract_pdf_content, validate_pdf_file, get_pdf_metadata
-from utils.handle_file_upload import handle_file_upload
-from utils.handle_chroma_db import clear_chroma_db
+from utils.model_policy import track_model_tiers
+from utils.speculative_routing import start_speculative_agent, run_with_speculation, cancel_speculation
+from utils.extract_pdf_content import extract_pdf_content, validate_pdf_file, get_pdf_metadata, make_document_descriptor
+from utils.handle_file_upload import start_background_ingestion, get_ingestion_progress
+from utils.session_manager import register_session_collection, release_session_collection
+from utils.request_profiler import profile_if_requested
 
 
 def show_chat_interface():
@@ -31,6 +35,8 @@ def show_chat_interface():
         st.session_state.show_file_upload = False
     if "processing_files" not in st.session_state:
         st.session_state.processing_files = []
+    if "uploader_generation" not in st.session_state:
+        st.session_state.uploader_generation = 0
     
     # Custom CSS for the simple interface
     st.markdown("""
@@ -267,7 +273,8 @@ def show_chat_interface():
                 "PlanerAgent": "🗓️",
                 "RagWriterAgent": "✍️", 
                 "SeoAgent": "🔍",
-                "ResearchAgent": "🔬"
+                "ResearchAgent": "🔬",
+                "CompositeAgent": "🧩"
             }
             emoji = agent_emojis.get(entry['agent_type'], "🤖")
             
@@ -276,10 +283,21 @@ def show_chat_interface():
                 <div class="agent-header">
                     {emoji} {entry['agent_type']}
                 </div>
-                {entry['response']}
+                {get_entry_response(entry)}
             </div>
             """, unsafe_allow_html=True)
             
+            # Share of each document that was indexed when the answer was generated
+            if entry.get('coverage'):
+                st.caption("📚 Answer covered: " + ", ".join(
+                    f"{doc['name']} ({doc['fraction']:.0%})" for doc in entry['coverage']
+                ))
+            
+            if entry.get('model_tiers'):
+                st.caption("⚙️ Model tiers: " + ", ".join(
+                    f"{stage} → {tier}" for stage, tier in entry['model_tiers'].items()
+                ))
+            
     # Input container at bottom    
     # Show info message if RagWriterAgent is pending
     if st.session_state.pending_agent_call == "RagWriterAgent":
@@ -295,7 +313,7 @@ def show_chat_interface():
                 type=['pdf'],
                 accept_multiple_files=True,
                 help="Upload PDF files for analysis",
-                key="inline_file_uploader"
+                key=f"inline_file_uploader_{st.session_state.uploader_generation}"
             )
             
             # Process uploaded files immediately
@@ -307,11 +325,10 @@ def show_chat_interface():
                         
                         # Add to processing list
                         st.session_state.processing_files.append({
-                            'name': uploaded_file.name,
-                            'file': uploaded_file
+                            'name': uploaded_file.name
                         })
                         
-                        with st.spinner(f"Processing {uploaded_file.name}..."):
+                        with st.spinner(f"Processing {uploaded_file.name}..."), profile_if_requested("upload"):
                             # Validate PDF
                             is_valid, error_message = validate_pdf_file(uploaded_file)
                             
@@ -320,28 +337,33 @@ def show_chat_interface():
                                 pdf_data = extract_pdf_content(uploaded_file)
                                 
                                 if not (pdf_data['content'].startswith("Error") or pdf_data['content'] == "No text content found in PDF"):
-                                    # Add to knowledge base
-                                    upload_success = handle_file_upload(pdf_data)
+                                    # Add to knowledge base in the background; indexed
+                                    # batches are searchable while the rest is embedded.
+                                    # The collection is keyed by content hash, so a file
+                                    # another session already uploaded is not embedded again
+                                    register_session_collection(get_collection_name(pdf_data))
+                                    start_background_ingestion(pdf_data)
                                     
-                                    if upload_success:
-                                        # Add to session uploaded files
-                                        doc_info = {
-                                            'name': sanitize_collection_name(uploaded_file.name),
-                                            'type': uploaded_file.type,
-                                            'size': uploaded_file.size,
-                                            'content': pdf_data['content'],
-                                            'file_obj': uploaded_file,
-                                            'upload_time': time.time()
-                                        }
-                                        st.session_state.uploaded_files.append(doc_info)
-                                        uploaded_files=None
-                                        st.success(f"✅ Successfully processed and added {uploaded_file.name}")
-                                    else:
-                                        st.error(f"❌ Failed to add {uploaded_file.name} to knowledge base")
+                                    # Add to session uploaded files; only a compact
+                                    # descriptor is kept, the text stays on disk, and
+                                    # the file name is this session's label for the document
+                                    doc_info = make_document_descriptor(pdf_data)
+                                    doc_info.update({
+                                        'name': uploaded_file.name,
+                                        'upload_time': time.time()
+                                    })
+                                    st.session_state.uploaded_files.append(doc_info)
+                                    uploaded_files=None
+                                    st.success(f"✅ Added {uploaded_file.name} - indexing in the background, you can ask about it right away")
                                 else:
                                     st.error(f"❌ Could not extract content from {uploaded_file.name}")
                             else:
                                 st.error(f"❌ Invalid PDF: {error_message}")
+                
+                # Files are handled once per upload: a fresh uploader releases the
+                # uploaded bytes, and nothing is left in processing
+                st.session_state.processing_files = []
+                st.session_state.uploader_generation += 1
 
     # Input form
     with st.form(key="chat_form", clear_on_submit=True):
@@ -382,20 +404,33 @@ def show_chat_interface():
         
     # Handle form submission
     if submitted and user_input.strip():
+        # Earlier turns within a fixed token budget, so users need not paste them back in
+        conversation = get_conversation_context()
+        
         # If there's a pending agent call (RagWriterAgent), execute it
         if st.session_state.pending_agent_call:
-            with st.spinner("🤖 Processing your request..."):
+            # Snapshot how much of each document is searchable for this answer
+            coverage = [
+                {'name': file_info['name'], **get_ingestion_progress(file_info)}
+                for file_info in st.session_state.uploaded_files
+            ]
+            
+            with st.spinner("🤖 Processing your request..."), track_model_tiers() as model_tiers, \
+                    profile_if_requested(st.session_state.pending_agent_call):
                 chat_response = handle_agent_call(
                     st.session_state.pending_agent_call, 
                     user_input,
-                    st.session_state.uploaded_files
+                    st.session_state.uploaded_files,
+                    conversation
                 )
             
             # Add to session history
             add_to_history(
                 query=user_input,
                 response=chat_response,
-                agent_type=st.session_state.pending_agent_call
+                agent_type=st.session_state.pending_agent_call,
+                coverage=coverage or None,
+                model_tiers=model_tiers or None
             )
             
             # Clear pending data and file upload state
@@ -406,7 +441,28 @@ def show_chat_interface():
             # Rerun to show new message
             st.rerun()
         else:
-            # Normal flow - assign agent and process
+            # Composite flow - several agents run as a task graph
+            task_graph = None
+            if is_composite_request(user_input):
+                with st.spinner("🧩 Splitting your request across agents..."):
+                    task_graph = assign_task_graph(user_input)
+            
+            if task_graph and len(task_graph) > 1:
+                with st.spinner(f"🤖 Running {len(task_graph)} agents..."), track_model_tiers() as model_tiers, \
+                        profile_if_requested("CompositeAgent"):
+                    composite_result = run_task_graph(task_graph, st.session_state.uploaded_files,
+                                                      conversation=conversation)
+                
+                add_to_history(
+                    query=user_input,
+                    response=composite_result['response'],
+                    agent_type="CompositeAgent",
+                    model_tiers=model_tiers or None
+                )
+                st.rerun()
+            
+            # Normal flow - assign agent and process, starting the likely agent while routing
+            speculation = start_speculative_agent(user_input, conversation)
             with st.spinner("🤖 Assigning the best agent for your query..."):
                 assigned_agent = assign_agent(user_input)
                 st.session_state.last_assigned_agent = assigned_agent
@@ -414,19 +470,22 @@ def show_chat_interface():
             
             # Check if RagWriterAgent is assigned
             if assigned_agent == "RagWriterAgent":
+                cancel_speculation(speculation)
                 st.session_state.pending_agent_call = assigned_agent
                 st.session_state.pending_user_input = user_input
                 st.rerun()
             else:
                 # Get actual agent response for non-RAG agents
-                with st.spinner("🤖 Processing your request..."):
-                    chat_response = handle_agent_call(assigned_agent, user_input)
+                with st.spinner("🤖 Processing your request..."), track_model_tiers() as model_tiers, \
+                        profile_if_requested(assigned_agent):
+                    chat_response = run_with_speculation(speculation, assigned_agent, user_input, conversation)
                 
                 # Add to session history
                 add_to_history(
                     query=user_input,
                     response=chat_response,
-                    agent_type=assigned_agent
+                    agent_type=assigned_agent,
+                    model_tiers=model_tiers or None
                 )
                 
                 # Rerun to show new message
@@ -435,14 +494,30 @@ def show_chat_interface():
     # Display uploaded files after the query box
     if st.session_state.uploaded_files:
         st.markdown("**📁 Uploaded Files:**")
+        any_indexing = False
         for i, file_info in enumerate(st.session_state.uploaded_files):
+            progress = get_ingestion_progress(file_info)
             col1, col2 = st.columns([10, 1])
             with col1:
-                st.text(f"📄 {file_info['name']}")
+                if progress['status'] == 'complete':
+                    st.text(f"📄 {file_info['name']}")
+                elif progress['status'] == 'indexing':
+                    any_indexing = True
+                    st.text(f"📄 {file_info['name']} - {progress['fraction']:.0%} indexed (partial results available)")
+                else:
+                    st.text(f"📄 {file_info['name']} - indexing stopped at {progress['fraction']:.0%}")
+                    if st.button("↻ Resume indexing", key=f"resume_uploaded_file_{i}"):
+                        start_background_ingestion(file_info)
+                        st.rerun()
             with col2:
                 if st.button("✕", key=f"remove_uploaded_file_{i}", help="Remove file"):
-                    clear_chroma_db(sanitize_collection_name(file_info['name']))
                     st.session_state.uploaded_files.pop(i)
+                    # Only this session's reference is removed; the collection is
+                    # dropped once no file of this or any other session points to it
+                    collection_name = get_collection_name(file_info)
+                    if not any(get_collection_name(f) == collection_name for f in st.session_state.uploaded_files):
+                        release_session_collection(collection_name)
                     st.rerun()
-
-
+        
+        if any_indexing and st.button("🔄 Refresh indexing progress", key="refresh_indexing_progress"):
+            st.rerun()
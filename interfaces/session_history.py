@@ -1,5 +1,7 @@
 import streamlit as st
 from datetime import datetime
+from utils.conversation_memory import build_conversation_context, summarize_in_background
+from utils.session_manager import INLINE_PAYLOAD_CHARS, get_session_id, store_payload, load_payload, remove_payloads
 
 def initialize_history():
     """Initialize session history if it doesn't exist"""
@@ -7,8 +9,10 @@ def initialize_history():
         st.session_state.session_history = []
     if 'show_history' not in st.session_state:
         st.session_state.show_history = False
+    if 'conversation_memory' not in st.session_state:
+        st.session_state.conversation_memory = {"summary": "", "summarized_count": 0}
 
-def add_to_history(query, response, agent_type=None):
+def add_to_history(query, response, agent_type=None, coverage=None, model_tiers=None):
     """
     Add a query-response pair to session history
     
@@ -16,6 +20,8 @@ def add_to_history(query, response, agent_type=None):
         query (str): User's query
         response (str): Agent's response
         agent_type (str): Type of agent that provided the response
+        coverage (list, optional): Per-document indexing progress at answer time
+        model_tiers (dict, optional): Model tier used by each agent stage
     """
     initialize_history()
     
@@ -24,19 +30,72 @@ def add_to_history(query, response, agent_type=None):
         "query": query,
         "response": response,
         "agent_type": agent_type,
+        "coverage": coverage,
+        "model_tiers": model_tiers,
         "id": len(st.session_state.session_history) + 1
     }
     
+    # Long responses are kept on disk; the entry only holds their id
+    session_id = get_session_id()
+    if session_id and isinstance(response, str) and len(response) > INLINE_PAYLOAD_CHARS:
+        history_entry["response"] = None
+        history_entry["response_id"] = store_payload(session_id, response)
+    
     st.session_state.session_history.append(history_entry)
+    # Fold turns leaving the verbatim window into the summary while the user reads the answer
+    summarize_in_background(_resolve_pending_responses(), st.session_state.conversation_memory)
 
 def get_history():
     """Get all session history"""
     initialize_history()
     return st.session_state.session_history
 
+def get_entry_response(entry):
+    """
+    Get the full response of a history entry, reading it from disk if it was moved there
+    
+    Args:
+        entry (dict): Session history entry
+        
+    Returns:
+        str: The response
+    """
+    if entry.get("response_id"):
+        response = load_payload(get_session_id(), entry["response_id"])
+        return response if response is not None else "(This response is no longer available.)"
+    return entry["response"]
+
 def clear_history():
     """Clear all session history"""
     st.session_state.session_history = []
+    st.session_state.conversation_memory = {"summary": "", "summarized_count": 0}
+    session_id = get_session_id()
+    if session_id:
+        remove_payloads(session_id)
+
+def get_conversation_context():
+    """
+    Get the conversation context for the next agent call.
+    
+    The last turns are kept verbatim and older ones are folded into a
+    summary cached in the session, so the context has a fixed token budget
+    however long the conversation gets. No LLM call is made here; the
+    summary is updated in the background by add_to_history().
+    
+    Returns:
+        str or None: Conversation context, or None before the first turn
+    """
+    initialize_history()
+    # The summary is updated in the background; until it catches up the
+    # turns it has not folded in yet are given verbatim
+    return build_conversation_context(_resolve_pending_responses(), st.session_state.conversation_memory,
+                                      summarize=None)
+
+def _resolve_pending_responses():
+    """History with the responses of the turns not summarised yet read back from disk"""
+    history = st.session_state.session_history
+    start = min(st.session_state.conversation_memory.get("summarized_count", 0), len(history))
+    return history[:start] + [{**entry, "response": get_entry_response(entry)} for entry in history[start:]]
 
 def get_history_count():
     """Get total number of history entries"""
@@ -56,8 +115,10 @@ def export_history_as_text():
         exported_text += f"📅 {entry['timestamp']}\n"
         if entry['agent_type']:
             exported_text += f"🤖 Agent: {entry['agent_type']}\n"
+        if entry.get('model_tiers'):
+            exported_text += "⚙️ Model tiers: " + ", ".join(f"{stage}={tier}" for stage, tier in entry['model_tiers'].items()) + "\n"
         exported_text += f"❓ Query: {entry['query']}\n"
-        exported_text += f"💬 Response: {entry['response']}\n"
+        exported_text += f"💬 Response: {get_entry_response(entry)}\n"
         exported_text += "-" * 30 + "\n\n"
     
     return exported_text
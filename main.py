@@ -11,6 +11,7 @@ except ImportError:
 import streamlit as st
 from interfaces.agents_interface import show_agents_interface
 from interfaces.home_interface import show_home_interface
+from utils.session_manager import session_run
 
 # Page configuration
 st.set_page_config(
@@ -23,17 +24,19 @@ st.set_page_config(
 
 
 def main():
-    # Initialize session state
-    if 'show_agents' not in st.session_state:
-        st.session_state.show_agents = False
-    
-    # Check if we should show agents interface or home page
-    if st.session_state.show_agents:
-        show_agents_interface()
-        return
-    
-    # Show home/landing page interface
-    show_home_interface()
+    # Register this session's run: evicts idle sessions and records memory use
+    with session_run():
+        # Initialize session state
+        if 'show_agents' not in st.session_state:
+            st.session_state.show_agents = False
+        
+        # Check if we should show agents interface or home page
+        if st.session_state.show_agents:
+            show_agents_interface()
+            return
+        
+        # Show home/landing page interface
+        show_home_interface()
 
 if __name__ == "__main__":
     main()
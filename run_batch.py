@@ -0,0 +1,238 @@
+# SQLite3 compatibility setup, must run before ChromaDB loads (see main.py)
+import sys
+try:
+    import pysqlite3
+    sys.modules['sqlite3'] = pysqlite3
+except ImportError:
+    pass
+
+import argparse
+import csv
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from utils.assign_agent import assign_agent
+from utils.handle_agent_call import handle_agent_call
+from utils.extract_pdf_content import extract_pdf_content, validate_pdf_file
+from utils.handle_file_upload import handle_file_upload
+from utils.sanitize_collection_name import get_collection_name
+from utils.session_manager import pin_collection, ingestion_reference
+from utils.single_flight import single_flight, make_fingerprint
+from utils.latency_stats import summarize_latencies
+from utils.model_policy import track_model_tiers
+
+
+class LocalPdfFile:
+    """Minimal stand-in for streamlit.UploadedFile backed by a file on disk."""
+
+    def __init__(self, path):
+        self.path = path
+        self.name = os.path.basename(path)
+        self.size = os.path.getsize(path)
+        self.type = "application/pdf" if path.lower().endswith(".pdf") else "application/octet-stream"
+
+    def read(self):
+        with open(self.path, "rb") as f:
+            return f.read()
+
+
+def load_batch_items(input_path):
+    """
+    Read batch items from a JSONL or CSV file.
+
+    Each item needs a 'prompt' and may carry an 'id' and 'documents'
+    (a list in JSONL, a ';'-separated string in CSV).
+
+    Args:
+        input_path (str): Path to a .jsonl or .csv file
+
+    Returns:
+        list: [{'id': str, 'prompt': str, 'documents': list}]
+    """
+    if input_path.lower().endswith(".csv"):
+        with open(input_path, newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+    else:
+        with open(input_path, encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+
+    items = []
+    for row_number, row in enumerate(rows, start=1):
+        prompt = (row.get("prompt") or "").strip()
+        if not prompt:
+            print(f"⚠️ Skipping row {row_number}: no prompt")
+            continue
+        documents = row.get("documents") or []
+        if isinstance(documents, str):
+            documents = [d.strip() for d in documents.split(";") if d.strip()]
+        items.append({
+            "id": str(row.get("id") or f"row-{row_number}"),
+            "prompt": prompt,
+            "documents": documents
+        })
+    return items
+
+
+def load_completed_ids(output_path):
+    """
+    Collect ids that already have a successful result in the output file.
+
+    A partially written last line (e.g. after a crash) is ignored.
+
+    Args:
+        output_path (str): Path to the JSONL results file
+
+    Returns:
+        set: Ids of completed items
+    """
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if not result.get("error"):
+                completed.add(result.get("id"))
+    return completed
+
+
+_ingested_documents = {}
+_ingested_lock = threading.Lock()
+
+
+def ingest_document(path):
+    """
+    Extract and index a PDF once per batch run.
+
+    Items referencing the same path concurrently share a single ingestion;
+    a failed ingestion is retried by the next item that needs the file.
+
+    Args:
+        path (str): Path to the PDF on disk
+
+    Returns:
+        dict or None: Uploaded-file entry for rag_writer_agent, None if ingestion failed
+    """
+    path = os.path.abspath(path)
+    with _ingested_lock:
+        if path in _ingested_documents:
+            return _ingested_documents[path]
+
+    def ingest():
+        pdf_file = LocalPdfFile(path)
+        is_valid, error_message = validate_pdf_file(pdf_file)
+        if not is_valid:
+            print(f"❌ Invalid PDF {path}: {error_message}")
+            return None
+        pdf_data = extract_pdf_content(pdf_file)
+        collection_name = get_collection_name(pdf_data)
+        with ingestion_reference(collection_name):
+            if not handle_file_upload(pdf_data):
+                return None
+            # Shared with sessions that may upload the same file; none of them may drop it mid-run
+            pin_collection(collection_name)
+        return {'name': pdf_file.name, 'id': pdf_data['id']}
+
+    document = single_flight("ingest", make_fingerprint(path), ingest)
+    # Failures are not cached, so a later item using the same file tries again
+    if document is not None:
+        with _ingested_lock:
+            _ingested_documents[path] = document
+    return document
+
+
+def run_item(item):
+    """
+    Route one prompt and run the assigned agent.
+
+    Args:
+        item (dict): Batch item from load_batch_items()
+
+    Returns:
+        dict: Result record written to the output file
+    """
+    start = time.perf_counter()
+    result = {"id": item["id"], "prompt": item["prompt"], "agent": None, "response": None, "error": None}
+    try:
+        uploaded_files = [doc for doc in map(ingest_document, item["documents"]) if doc]
+        result["agent"] = assign_agent(item["prompt"])
+        with track_model_tiers() as model_tiers:
+            result["response"] = handle_agent_call(result["agent"], item["prompt"], uploaded_files or None)
+        result["model_tiers"] = model_tiers
+        if result["response"] is None:
+            result["error"] = "Agent returned no response"
+    except Exception as e:
+        result["error"] = str(e)
+    result["latency_s"] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def run_batch(input_path, output_path, concurrency=4, resume=True):
+    """
+    Run every prompt in input_path and stream results to output_path as JSONL.
+
+    Args:
+        input_path (str): JSONL or CSV file of prompts
+        output_path (str): JSONL file receiving one result per line
+        concurrency (int): Maximum number of items processed at once
+        resume (bool): Skip items already completed in output_path
+
+    Returns:
+        dict: Run summary with counts, throughput and latency percentiles
+    """
+    items = load_batch_items(input_path)
+    completed = load_completed_ids(output_path) if resume else set()
+    pending = [item for item in items if item["id"] not in completed]
+    print(f"📋 {len(items)} items, {len(items) - len(pending)} already done, {len(pending)} to run")
+
+    latencies = []
+    failures = 0
+    write_lock = threading.Lock()
+    start = time.perf_counter()
+
+    with open(output_path, "a" if resume else "w", encoding="utf-8") as out, \
+         ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(run_item, item) for item in pending]
+        for future in as_completed(futures):
+            result = future.result()
+            with write_lock:
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                out.flush()
+                os.fsync(out.fileno())
+            if result["error"]:
+                failures += 1
+                print(f"❌ {result['id']}: {result['error']}")
+            else:
+                latencies.append(result["latency_s"])
+                print(f"✅ {result['id']} → {result['agent']} ({result['latency_s']:.2f}s)")
+
+    summary = summarize_latencies(latencies, wall_seconds=time.perf_counter() - start)
+    summary.update({"succeeded": len(latencies), "failed": failures, "skipped": len(items) - len(pending)})
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a batch of prompts through AutoMarketer.AI agents")
+    parser.add_argument("input", help="JSONL or CSV file with 'prompt' and optional 'id' and 'documents'")
+    parser.add_argument("-o", "--output", default="batch_results.jsonl", help="JSONL file to append results to")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="Maximum concurrent items")
+    parser.add_argument("--no-resume", action="store_true", help="Overwrite output instead of skipping completed ids")
+    args = parser.parse_args()
+
+    summary = run_batch(args.input, args.output, concurrency=args.concurrency, resume=not args.no_resume)
+
+    print("-" * 50)
+    print(f"Succeeded: {summary['succeeded']}  Failed: {summary['failed']}  Skipped: {summary['skipped']}")
+    if summary["count"]:
+        print(f"Throughput: {summary['throughput']:.2f} items/s")
+        print(f"Latency p50: {summary['p50']:.2f}s  p95: {summary['p95']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Check that the conversation context given to agents stays within a fixed size.
+
+Simulates a long conversation with ever longer answers against a recording
+client (no network access or API keys needed) and verifies that:
+- the context never exceeds its token budget, however many turns there are,
+- every turn is summarised exactly once, when it leaves the verbatim window,
+- each summarisation request has a bounded size (only the new turn is sent),
+- with a slow background summariser, every turn is still in the context,
+  either folded into the summary or kept verbatim until it is.
+Exits non-zero on failure.
+
+    python scripts/check_conversation_memory.py --turns 60
+"""
+import os
+import sys
+import time
+import argparse
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils.conversation_memory as conversation_memory
+from utils.compress_context import estimate_tokens
+
+
+# Headings and separators around the budgeted parts of the context
+CONTEXT_OVERHEAD_TOKENS = 40
+
+
+class SummaryClient:
+    """Stands in for the OpenAI client; returns a summary that keeps growing with the input."""
+
+    def __init__(self):
+        self.chat = self
+        self.completions = self
+        self.prompt_tokens = []
+
+    def create(self, **request):
+        prompt = "".join(message["content"] for message in request["messages"])
+        self.prompt_tokens.append(estimate_tokens(prompt))
+        # A verbose model: echo the whole summary back plus a line per turn
+        content = request["messages"][-1]["content"] + "\n- another remembered fact" * 20
+        message = SimpleNamespace(content=content, tool_calls=None)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+def make_turn(turn):
+    return {
+        "query": f"Turn {turn}: follow up on the previous answer " * turn,
+        "response": f"Answer {turn} with plenty of detail. " * (50 * turn),
+        "agent_type": "SeoAgent"
+    }
+
+
+def check_background_summary(turns, delay_seconds):
+    """
+    Add turns faster than a slow background summariser keeps up and check that none is lost.
+
+    Returns:
+        list: Failure messages
+    """
+    def slow_summarize(summary, entry):
+        time.sleep(delay_seconds)
+        # Keep a marker per turn so the check can tell which turns the summary holds
+        return f"{summary} [{entry['query'].split(':', 1)[0].lower()}]".strip()
+
+    history, memory, threads = [], {"summary": "", "summarized_count": 0}, []
+    failures = []
+    largest_lag = 0
+    for turn in range(1, turns + 1):
+        context = conversation_memory.build_conversation_context(history, memory, summarize=None) or ""
+        lost = [index for index in range(1, turn)
+                if f"Turn {index}:" not in context and f"[turn {index}]" not in context]
+        if lost:
+            failures.append(f"background turn {turn}: turns {lost} missing from the context")
+        largest_lag = max(largest_lag, len(history) - conversation_memory.RECENT_TURNS
+                          - memory.get("summarized_count", 0))
+        history.append(make_turn(turn))
+        thread = conversation_memory.summarize_in_background(list(history), memory, slow_summarize)
+        if thread:
+            threads.append(thread)
+        time.sleep(delay_seconds / 4)
+
+    for thread in threads:
+        thread.join()
+    expected = max(turns - conversation_memory.RECENT_TURNS, 0)
+    if memory["summarized_count"] != expected:
+        failures.append(f"background summary folded in {memory['summarized_count']} turns, expected {expected}")
+    print(f"Background summary: up to {largest_lag} turns pending, "
+          f"{memory['summarized_count']} folded in after {turns} turns")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--turns", type=int, default=60)
+    parser.add_argument("--summary-delay", type=float, default=0.02,
+                        help="Seconds each background summary call takes")
+    args = parser.parse_args()
+
+    client = SummaryClient()
+    conversation_memory.get_openai_client = lambda: client
+
+    budget = (conversation_memory.SUMMARY_TOKEN_BUDGET
+              + conversation_memory.RECENT_TURNS * conversation_memory.TURN_TOKEN_BUDGET
+              + CONTEXT_OVERHEAD_TOKENS)
+    history, memory, sizes = [], {"summary": "", "summarized_count": 0}, []
+    failures = []
+
+    for turn in range(1, args.turns + 1):
+        context = conversation_memory.build_conversation_context(history, memory) or ""
+        sizes.append(estimate_tokens(context))
+        if sizes[-1] > budget:
+            failures.append(f"turn {turn}: context of {sizes[-1]} tokens exceeds {budget}")
+        history.append(make_turn(turn))
+
+    expected_summaries = max(args.turns - 1 - conversation_memory.RECENT_TURNS, 0)
+    if len(client.prompt_tokens) != expected_summaries:
+        failures.append(f"{len(client.prompt_tokens)} summary calls, expected {expected_summaries}")
+    summarize_budget = (conversation_memory.SUMMARY_TOKEN_BUDGET
+                        + conversation_memory.SUMMARIZE_TURN_TOKEN_BUDGET
+                        + estimate_tokens(conversation_memory.SUMMARIZE_PROMPT.instructions)
+                        + CONTEXT_OVERHEAD_TOKENS)
+    if client.prompt_tokens and max(client.prompt_tokens) > summarize_budget:
+        failures.append(f"summary request of {max(client.prompt_tokens)} tokens exceeds {summarize_budget}")
+
+    failures += check_background_summary(args.turns, args.summary_delay)
+
+    print(f"Context tokens over {args.turns} turns: first {sizes[1] if len(sizes) > 1 else 0}, "
+          f"max {max(sizes)}, last {sizes[-1]} (budget {budget})")
+    print(f"Summary calls: {len(client.prompt_tokens)}, largest request "
+          f"{max(client.prompt_tokens, default=0)} tokens (budget {summarize_budget})")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    raise SystemExit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
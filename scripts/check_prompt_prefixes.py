@@ -0,0 +1,129 @@
+"""
+Check that agent prompts keep a byte-identical, cacheable prefix.
+
+Every agent stage is called twice with different user input against a
+recording client (no network access or API keys needed). For each stage the
+two requests are serialised the way they are sent, and the shared leading
+bytes must cover the whole static system message. Exits non-zero on failure.
+
+    python scripts/check_prompt_prefixes.py
+"""
+import os
+import sys
+import json
+import itertools
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import agents.planner_agent as planner_agent
+import agents.rag_writer_agent as rag_writer_agent
+import agents.research_agent as research_agent
+import agents.seo_agent as seo_agent
+import utils.assign_agent as assign_agent
+import utils.get_llm_response as get_llm_response
+import utils.conversation_memory as conversation_memory
+from utils.prompt_templates import TEMPLATES, verify_stable_prefixes
+
+
+class RecordingClient:
+    """Stands in for the OpenAI client and records every chat request per stage."""
+
+    def __init__(self):
+        self.chat = self
+        self.completions = self
+        self.requests = []
+        self._ids = itertools.count(1)
+
+    def create(self, **request):
+        self.requests.append(request)
+        text = request["messages"][-1].get("content") or ""
+        if "Week 1:" in request["messages"][0]["content"]:
+            content = "Week 1: Basics\nWeek 2: Depth"
+        elif request["messages"][0]["content"].startswith("You are an expert content writer. Outline"):
+            content = "## First\n## Second\n## Third"
+        elif "Day" in request["messages"][0]["content"]:
+            content = "\n\n".join(f"Day {day}:\n- Topic: {text[:20]}" for day in range(1, 15))
+        else:
+            content = f"Response to {text[:40]}"
+        tool_calls = None
+        if request.get("tools") and request["messages"][-1]["role"] == "user":
+            tool_calls = [SimpleNamespace(
+                id=f"call_{next(self._ids)}", type="function",
+                function=SimpleNamespace(name="web_search", arguments=json.dumps({"query": text[:40]}))
+            )]
+        message = SimpleNamespace(content=content, tool_calls=tool_calls)
+        usage = SimpleNamespace(prompt_tokens=0, prompt_tokens_details=SimpleNamespace(cached_tokens=0))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+
+def serialise(request):
+    """Bytes of a request in the order the provider sees them: tools, then messages."""
+    def default(value):
+        return vars(value) if isinstance(value, SimpleNamespace) else str(value)
+    return json.dumps({"tools": request.get("tools"), "messages": request["messages"]}, default=default).encode("utf-8")
+
+
+def shared_prefix_length(first, second):
+    """Number of leading bytes two byte strings have in common."""
+    length = 0
+    for a, b in zip(first, second):
+        if a != b:
+            break
+        length += 1
+    return length
+
+
+def record_agent_requests(user_input):
+    """Run every agent stage once and return the requests grouped by system prompt."""
+    client = RecordingClient()
+    for module in (planner_agent, rag_writer_agent, research_agent, seo_agent, assign_agent, get_llm_response,
+                   conversation_memory):
+        module.get_openai_client = lambda: client
+    research_agent.web_search = lambda query: f"Search results for {query}"
+    rag_writer_agent.cached_retrieval = lambda query, names, n, retrieve: [(f"Chunk about {query}.", 0.8)]
+    planner_agent.st.text = lambda *args, **kwargs: None
+
+    assign_agent.assign_agent(user_input)
+    assign_agent.assign_task_graph(user_input)
+    planner_agent.planner_agent(f"Plan 2 days about {user_input}")
+    planner_agent.planner_agent(f"Plan 14 days about {user_input}")
+    seo_agent.seo_agent(user_input)
+    research_agent.research_agent(user_input)
+    rag_writer_agent.handle_rag_writer_agent(f"Write a post about {user_input}", [{"name": "doc.pdf"}])
+    rag_writer_agent.handle_rag_writer_agent_without_files(f"Write a post about {user_input}")
+    rag_writer_agent.handle_rag_writer_agent(f"Write a comprehensive guide to {user_input}", [{"name": "doc.pdf"}])
+    conversation_memory.summarize_turn(f"- Product: {user_input}", {"query": user_input, "response": user_input})
+
+    by_prefix = {}
+    for request in client.requests:
+        name = next((t.name for t in TEMPLATES.values() if request["messages"][0]["content"] == t.instructions), None)
+        if name is None:
+            raise SystemExit(f"Request does not start with a registered template: {request['messages'][0]}")
+        by_prefix.setdefault(name, request)
+    return by_prefix
+
+
+def main():
+    failures = verify_stable_prefixes()
+
+    first = record_agent_requests("eco-friendly running shoes")
+    second = record_agent_requests("B2B invoicing software for freelancers in Germany")
+    for name, template in sorted(TEMPLATES.items()):
+        if name not in first or name not in second:
+            failures.append(name)
+            print(f"FAIL {name}: not used by any agent call")
+            continue
+        shared = shared_prefix_length(serialise(first[name]), serialise(second[name]))
+        static = len(serialise({"tools": first[name].get("tools"),
+                                "messages": [{"role": "system", "content": template.instructions}]})) - 2
+        status = "ok" if shared >= static else "FAIL"
+        if status == "FAIL":
+            failures.append(name)
+        print(f"{status:4} {name}: {shared} shared prefix bytes (static prefix {static})")
+
+    raise SystemExit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
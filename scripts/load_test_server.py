@@ -0,0 +1,97 @@
+"""
+Load test for the AutoMarketer.AI HTTP service (server.py).
+
+Fires concurrent requests at /route or /agents/{name} and reports requests
+per second and latency percentiles. With --stub the app runs in-process
+against stubbed backends, so no network access or API keys are needed.
+
+    python scripts/load_test_server.py --stub --requests 500 --concurrency 50
+    python scripts/load_test_server.py --url http://localhost:8000 --endpoint agent
+"""
+import os
+import sys
+import argparse
+import asyncio
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.latency_stats import summarize_latencies
+
+
+def create_stub_app(latency_seconds):
+    """Build the service with backends that sleep instead of calling OpenAI, Tavily or Chroma."""
+    from server import create_app
+
+    def stub_router(user_input):
+        time.sleep(latency_seconds)
+        return "SeoAgent"
+
+    def stub_agent_runner(agent_name, user_input, uploaded_files=None):
+        time.sleep(latency_seconds)
+        return f"{agent_name} response to: {user_input}"
+
+    def stub_document_ingestor(name, data, content_type):
+        time.sleep(latency_seconds)
+        return {'name': name, 'pages': 1, 'size': len(data)}
+
+    return create_app(router=stub_router, agent_runner=stub_agent_runner,
+                      document_ingestor=stub_document_ingestor)
+
+
+async def run_load_test(client, endpoint, total_requests, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one_request(i):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                if endpoint == "route":
+                    response = await client.post("/route", json={"prompt": f"Best keywords for blog {i}"})
+                else:
+                    response = await client.post("/agents/SeoAgent", json={"prompt": f"Best keywords for blog {i}"})
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+            except Exception:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one_request(i) for i in range(total_requests)))
+    summary = summarize_latencies(latencies, wall_seconds=time.perf_counter() - start, percentiles=(50, 95, 99))
+    summary["errors"] = errors
+    return summary
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Load test the AutoMarketer.AI HTTP service")
+    parser.add_argument("--url", default="http://localhost:8000", help="Base URL of a running server")
+    parser.add_argument("--stub", action="store_true", help="Run the app in-process with stubbed backends")
+    parser.add_argument("--stub-latency", type=float, default=0.05, help="Seconds each stubbed backend call takes")
+    parser.add_argument("--endpoint", choices=["route", "agent"], default="route")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.stub:
+        transport = httpx.ASGITransport(app=create_stub_app(args.stub_latency))
+        client = httpx.AsyncClient(transport=transport, base_url="http://stub", timeout=None)
+    else:
+        client = httpx.AsyncClient(base_url=args.url, timeout=None)
+
+    async with client:
+        summary = await run_load_test(client, args.endpoint, args.requests, args.concurrency)
+
+    print(f"Requests: {summary['count']} ok, {summary['errors']} errors")
+    if summary["count"]:
+        print(f"Throughput: {summary['throughput']:.1f} req/s")
+        print(f"Latency p50: {summary['p50'] * 1000:.1f} ms  p95: {summary['p95'] * 1000:.1f} ms  "
+              f"p99: {summary['p99'] * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
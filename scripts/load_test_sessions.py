@@ -0,0 +1,329 @@
+"""
+Load test the Streamlit app with many concurrent simulated sessions.
+
+Each session is a streamlit.testing.v1.AppTest of main.py, driven through
+the home page, the agents view, several chat messages and a PDF upload
+with a RagWriterAgent answer. OpenAI, Tavily and Chroma are replaced with
+in-process stubs that sleep for a configurable time, and the run happens
+in a temporary directory, so no network access or API keys are needed and
+./chrome_store is not touched. Reports p50/p95/p99 latency per step,
+throughput, peak RSS and error counts.
+
+    python scripts/load_test_sessions.py --sessions 50 --concurrency 50
+    python scripts/load_test_sessions.py --sessions 20 --llm-latency 0.5 --json report.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import logging
+import hashlib
+import argparse
+import tempfile
+import contextlib
+import threading
+import resource
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import chromadb
+import streamlit.testing.v1.app_test as app_test
+from unittest.mock import MagicMock
+from streamlit.testing.v1 import AppTest
+from streamlit.runtime import Runtime
+from streamlit.testing.v1.util import patch_config_options
+from streamlit.runtime.media_file_manager import MediaFileManager
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+from streamlit.runtime.dataframe_source_manager import DataframeSourceManager
+from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+
+import agents.planner_agent as planner_agent
+import agents.rag_writer_agent as rag_writer_agent
+import agents.research_agent as research_agent
+import agents.seo_agent as seo_agent
+import utils.assign_agent as assign_agent
+import utils.get_llm_response as get_llm_response
+import utils.get_embeddings as get_embeddings
+import utils.conversation_memory as conversation_memory
+import utils.handle_chroma_db as handle_chroma_db
+from utils.latency_stats import summarize_latencies
+from measure_upload_memory import build_pdf
+
+
+EMBEDDING_DIMENSIONS = 256
+
+CHAT_MESSAGES = [
+    ("chat_seo", "Suggest SEO keywords for eco-friendly running shoes"),
+    ("chat_research", "Find market trends for eco-friendly running shoes"),
+    ("chat_plan", "Plan a 5 day calendar for eco-friendly running shoes"),
+]
+RAG_MESSAGE = "Write a blog post about eco-friendly running shoes using the brochure"
+
+
+class StubLatency:
+    """Sleeps for a lognormally distributed time around a median, like a remote API."""
+
+    def __init__(self, median_seconds, spread=0.3):
+        self.median_seconds = median_seconds
+        self.spread = spread
+
+    def sleep(self):
+        if self.median_seconds > 0:
+            time.sleep(self.median_seconds * random.lognormvariate(0, self.spread))
+
+
+class StubOpenAI:
+    """Chat completions and embeddings in the shape of the OpenAI v1 client."""
+
+    def __init__(self, chat_latency, embedding_latency):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._chat))
+        self.embeddings = SimpleNamespace(create=self._embed)
+        self.chat_latency = chat_latency
+        self.embedding_latency = embedding_latency
+
+    def _chat(self, **request):
+        self.chat_latency.sleep()
+        system = request["messages"][0].get("content") or ""
+        text = request["messages"][-1].get("content") or ""
+        tool_calls = None
+        if request.get("tools") and request["messages"][-1]["role"] == "user":
+            tool_calls = [SimpleNamespace(
+                id="call_1", type="function",
+                function=SimpleNamespace(name="web_search", arguments=json.dumps({"query": text[-80:]}))
+            )]
+            content = None
+        elif system == assign_agent.ROUTING_PROMPT.instructions:
+            content = get_llm_response._fallback_routing(text)
+        elif "Day" in system:
+            content = "\n\n".join(f"Day {day}:\n- Topic: Running shoe tips {day}\n- Type: Blog post"
+                                  for day in range(1, 6))
+        else:
+            content = "Eco-friendly running shoes use recycled materials. " * 40
+        message = SimpleNamespace(content=content, tool_calls=tool_calls)
+        usage = SimpleNamespace(prompt_tokens=0, prompt_tokens_details=SimpleNamespace(cached_tokens=0))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+    def _embed(self, input, model=None, **kwargs):
+        self.embedding_latency.sleep()
+        texts = [input] if isinstance(input, str) else list(input)
+        data = []
+        for index, text in enumerate(texts):
+            seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+            vector = np.random.default_rng(seed).standard_normal(EMBEDDING_DIMENSIONS)
+            data.append(SimpleNamespace(index=index, embedding=(vector / np.linalg.norm(vector)).tolist()))
+        return SimpleNamespace(data=data)
+
+
+class StubTavily:
+    """Web search returning fixed pages."""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def search(self, query, max_results=2):
+        self.latency.sleep()
+        return {"results": [
+            {"content": f"Page {i} about {query}. Sales of sustainable sneakers grew last year. " * 20}
+            for i in range(max_results)
+        ]}
+
+
+def install_stubs(chat_latency, embedding_latency, search_latency):
+    """Point every backend the app uses at the in-process stubs."""
+    client = StubOpenAI(StubLatency(chat_latency), StubLatency(embedding_latency))
+    for module in (planner_agent, rag_writer_agent, research_agent, seo_agent, assign_agent,
+                   get_llm_response, get_embeddings, conversation_memory):
+        module.get_openai_client = lambda: client
+    tavily = StubTavily(StubLatency(search_latency))
+    research_agent.get_tavily_client = lambda: tavily
+    # Pre-seed the shared client cache so every session uses an in-memory store
+    handle_chroma_db._chroma_clients["./chrome_store"] = chromadb.EphemeralClient()
+
+
+# AppTest gives every session the id "test session id"; give each simulated
+# session its own, so per-session state (stored answers, eviction) stays separate
+_current_session = threading.local()
+
+
+class SessionScriptRunner(app_test.LocalScriptRunner):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._session_id = getattr(_current_session, "session_id", self._session_id)
+
+
+class _PerRunRuntime(Runtime):
+    """Takes the Runtime singleton AppTest sets and clears around each run."""
+
+
+@contextlib.contextmanager
+def allow_concurrent_app_tests():
+    """
+    Let AppTest runs of different sessions overlap.
+
+    Around each run AppTest installs a mock Runtime singleton and sets the
+    global.appTest option, and restores both afterwards, which breaks any
+    other session running at that moment. Both are set once for the whole
+    load test instead, and AppTest's per-run assignments are redirected.
+    """
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.dataframe_source_mgr = DataframeSourceManager()
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime._instance = runtime
+    app_test.Runtime = _PerRunRuntime
+    app_test.patch_config_options = lambda options: contextlib.nullcontext()
+    app_test.LocalScriptRunner = SessionScriptRunner
+    with patch_config_options({"global.appTest": True}):
+        yield
+
+
+def current_rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def peak_rss_bytes():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def find_button(at, label_prefix):
+    return next(button for button in at.button if button.label.startswith(label_prefix))
+
+
+def run_session(index, pdf_bytes, timeout):
+    """
+    Drive one session through the app and time each step.
+
+    Returns:
+        list: (step, seconds, error or None) tuples
+    """
+    _current_session.session_id = f"load-test-session-{index}"
+    results = []
+    at = AppTest.from_file(os.path.join(REPO_ROOT, "main.py"), default_timeout=timeout)
+
+    def step(name, action, check=None):
+        started = time.perf_counter()
+        error = None
+        try:
+            action()
+            if at.exception:
+                error = at.exception[0].message
+            elif at.error:
+                error = at.error[0].value
+            elif check is not None and not check():
+                error = "unexpected result"
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        results.append((name, time.perf_counter() - started, error))
+        return error is None
+
+    def send(text):
+        at.text_area(key="chat_input").input(text)
+        find_button(at, "Send").click().run()
+
+    def history_length():
+        return len(at.session_state["session_history"]) if "session_history" in at.session_state else 0
+
+    if not step("home", at.run):
+        return results
+    if not step("agents_view", lambda: find_button(at, "🚀 Get Started").click().run(),
+                lambda: at.session_state["show_agents"]):
+        return results
+
+    for name, text in CHAT_MESSAGES:
+        expected = history_length() + 1
+        step(name, lambda: send(text), lambda: history_length() == expected)
+
+    if not step("rag_request", lambda: send(RAG_MESSAGE),
+                lambda: at.session_state["pending_agent_call"] == "RagWriterAgent"):
+        return results
+    if not step("open_upload", lambda: find_button(at, "+ Add File").click().run(),
+                lambda: len(at.file_uploader) == 1):
+        return results
+    step("upload_pdf",
+         lambda: at.file_uploader[0].set_value((f"brochure-{index}.pdf", pdf_bytes, "application/pdf")).run(),
+         lambda: len(at.session_state["uploaded_files"]) == 1)
+    expected = history_length() + 1
+    step("rag_answer", lambda: send(RAG_MESSAGE), lambda: history_length() == expected)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sessions", type=int, default=50, help="Sessions to simulate")
+    parser.add_argument("--concurrency", type=int, default=50, help="Sessions running at the same time")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Median seconds per stubbed chat completion")
+    parser.add_argument("--embedding-latency", type=float, default=0.05, help="Median seconds per stubbed embeddings call")
+    parser.add_argument("--search-latency", type=float, default=0.3, help="Median seconds per stubbed web search")
+    parser.add_argument("--pdf-pages", type=int, default=20, help="Pages of the uploaded PDF")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds a single script run may take")
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    json_path = os.path.abspath(args.json) if args.json else None
+    # AppTest logs a warning with a stack trace for every collapsed widget label
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    # Caches, manifests and stored answers go to a scratch directory
+    os.chdir(tempfile.mkdtemp(prefix="load-test-sessions-"))
+    install_stubs(args.llm_latency, args.embedding_latency, args.search_latency)
+    build_pdf("brochure.pdf", args.pdf_pages)
+    with open("brochure.pdf", "rb") as f:
+        pdf_bytes = f.read()
+
+    baseline_rss = current_rss_bytes()
+    started = time.perf_counter()
+    with allow_concurrent_app_tests(), ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        sessions = list(executor.map(lambda i: run_session(i, pdf_bytes, args.timeout), range(args.sessions)))
+    wall_seconds = time.perf_counter() - started
+
+    steps = {}
+    for results in sessions:
+        for name, seconds, error in results:
+            entry = steps.setdefault(name, {"latencies": [], "errors": []})
+            (entry["errors"] if error else entry["latencies"]).append(error or seconds)
+
+    report = {
+        "sessions": args.sessions,
+        "concurrency": args.concurrency,
+        "wall_seconds": wall_seconds,
+        "steps_per_second": sum(len(results) for results in sessions) / wall_seconds,
+        "sessions_per_minute": args.sessions / wall_seconds * 60,
+        "baseline_rss_mb": baseline_rss / 1024 / 1024 if baseline_rss else None,
+        "peak_rss_mb": peak_rss_bytes() / 1024 / 1024,
+        "errors": sum(len(entry["errors"]) for entry in steps.values()),
+        "steps": {
+            name: {**summarize_latencies(entry["latencies"], percentiles=(50, 95, 99)),
+                   "errors": len(entry["errors"]),
+                   "sample_errors": sorted(set(entry["errors"]))[:3]}
+            for name, entry in steps.items()
+        }
+    }
+
+    print(f"{args.sessions} sessions, {args.concurrency} concurrent, {wall_seconds:.1f}s wall")
+    print(f"Throughput: {report['steps_per_second']:.2f} steps/s, {report['sessions_per_minute']:.1f} sessions/min")
+    print(f"RSS: baseline {report['baseline_rss_mb'] or 0:.0f} MB, peak {report['peak_rss_mb']:.0f} MB")
+    print(f"{'step':14} {'ok':>4} {'err':>4} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, summary in report["steps"].items():
+        percentiles = [f"{summary[p] * 1000:9.0f}" if summary[p] is not None else f"{'-':>9}"
+                       for p in ("p50", "p95", "p99")]
+        print(f"{name:14} {summary['count']:4d} {summary['errors']:4d} {' '.join(percentiles)}")
+        for error in summary["sample_errors"]:
+            print(f"    {error}")
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump(report, f, indent=2)
+    raise SystemExit(1 if report["errors"] else 0)
+
+
+if __name__ == "__main__":
+    main()
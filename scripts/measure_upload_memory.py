@@ -0,0 +1,128 @@
+"""
+Measure peak and steady-state memory of the PDF upload path.
+
+Builds a synthetic multi-page PDF, then in separate processes runs
+  - legacy:  PdfReader(io.BytesIO(upload.read())) and a session entry holding
+             the full text and the upload object (the previous behaviour)
+  - current: extract_pdf_document() and a compact document descriptor
+and reports Python heap peak (tracemalloc), heap retained by the session
+entry, and process peak RSS.
+
+    python scripts/measure_upload_memory.py --pages 300
+"""
+import os
+import sys
+import gc
+import io
+import json
+import argparse
+import resource
+import subprocess
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def build_pdf(path, pages, words_per_page=400):
+    """Write a minimal text PDF with the given number of pages."""
+    page_text = " ".join(f"word{i % 97}" for i in range(words_per_page))
+    lines = [page_text[i:i + 90] for i in range(0, len(page_text), 90)]
+    content = "BT /F1 9 Tf 20 770 Td 11 TL " + " ".join(f"({line}) '" for line in lines) + " ET"
+
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>",
+               f"<< /Type /Pages /Kids [{' '.join(f'{3 + 2 * i} 0 R' for i in range(pages))}] /Count {pages} >>"]
+    font_id = 3 + 2 * pages
+    for i in range(pages):
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {4 + 2 * i} 0 R "
+                       f"/Resources << /Font << /F1 {font_id} 0 R >> >> >>")
+        objects.append(f"<< /Length {len(content)} >>\nstream\n{content}\nendstream")
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    with open(path, "wb") as f:
+        offsets = []
+        position = f.write(b"%PDF-1.4\n")
+        for number, body in enumerate(objects, start=1):
+            offsets.append(position)
+            position += f.write(f"{number} 0 obj\n{body}\nendobj\n".encode())
+        xref = "".join(f"{offset:010d} 00000 n \n" for offset in offsets)
+        f.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n{xref}"
+                f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{position}\n%%EOF\n".encode())
+
+
+class SimulatedUpload(io.BytesIO):
+    """BytesIO with the attributes of streamlit.UploadedFile."""
+
+    def __init__(self, data, name):
+        super().__init__(data)
+        self.name = name
+        self.size = len(data)
+        self.type = "application/pdf"
+
+
+def measure(mode, pdf_path, cache_dir):
+    import PyPDF2
+    from utils.extract_pdf_content import extract_pdf_document, make_document_descriptor, clean_extracted_text
+
+    with open(pdf_path, "rb") as f:
+        upload = SimulatedUpload(f.read(), os.path.basename(pdf_path))
+
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    if mode == "legacy":
+        reader = PyPDF2.PdfReader(io.BytesIO(upload.read()))
+        text = clean_extracted_text("".join(page.extract_text() + "\n" for page in reader.pages))
+        session_entry = {'name': upload.name, 'content': text, 'file_obj': upload}
+        del reader, text
+    else:
+        pdf_data = extract_pdf_document(upload, cache_dir=cache_dir)
+        session_entry = make_document_descriptor(pdf_data)
+        del pdf_data
+        # The session no longer references the upload, so its buffer can be freed
+        upload.close()
+    del upload
+    # PyPDF2 objects form reference cycles; collect them so only live data counts
+    gc.collect()
+
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "mode": mode,
+        "peak_heap_mb": (peak - baseline) / 2 ** 20,
+        "retained_heap_mb": (current - baseline) / 2 ** 20,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "session_keys": sorted(session_entry)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure upload path memory")
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--worker", choices=["legacy", "current"], help=argparse.SUPPRESS)
+    parser.add_argument("--pdf", help=argparse.SUPPRESS)
+    parser.add_argument("--cache-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(measure(args.worker, args.pdf, args.cache_dir)))
+        return
+
+    with tempfile.TemporaryDirectory() as workdir:
+        pdf_path = os.path.join(workdir, "synthetic.pdf")
+        build_pdf(pdf_path, args.pages)
+        print(f"Synthetic PDF: {args.pages} pages, {os.path.getsize(pdf_path) / 2 ** 20:.1f} MB")
+
+        for mode in ("legacy", "current"):
+            # A fresh process per mode so peak RSS is not shared between runs
+            output = subprocess.run(
+                [sys.executable, __file__, "--worker", mode, "--pdf", pdf_path,
+                 "--cache-dir", os.path.join(workdir, "cache")],
+                capture_output=True, text=True, check=True
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{mode:>8}: peak heap {result['peak_heap_mb']:.1f} MB, "
+                  f"retained {result['retained_heap_mb']:.1f} MB, peak RSS {result['peak_rss_mb']:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+"""
+Local OpenAI-compatible stub server for offline, reproducible performance work.
+
+Serves /v1/chat/completions (including stream=true and tool calls),
+/v1/embeddings (float and base64) and /v1/models with deterministic
+responses and pseudo-embeddings, and injects latency, 429 rate limits and
+500 failures from a named profile. Point the app at it with a base URL:
+
+    python scripts/stub_openai_server.py --port 8001 --profile typical
+    OPENAI_BASE_URL=http://localhost:8001/v1 streamlit run main.py
+
+Profiles: instant, typical, slow, flaky (see PROFILES). Any profile value can
+be overridden, e.g. --latency-median 1.5 --rate-limit-rps 5. GET /stats
+returns request counts by endpoint and status.
+"""
+import os
+import re
+import sys
+import json
+import time
+import base64
+import random
+import asyncio
+import hashlib
+import argparse
+import threading
+from collections import Counter, deque
+
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.compress_context import estimate_tokens
+
+
+# Seconds are lognormal around latency_median (time to first token); each
+# completion token adds token_delay. error_rate and rate_limit_rate are the
+# share of requests failing with 500 and 429; rate_limit_rps caps requests per
+# second (0 = no cap), like an account limit.
+PROFILES = {
+    "instant": {"latency_median": 0.0, "latency_sigma": 0.0, "token_delay": 0.0, "embedding_latency": 0.0,
+                "error_rate": 0.0, "rate_limit_rate": 0.0, "rate_limit_rps": 0},
+    "typical": {"latency_median": 0.4, "latency_sigma": 0.5, "token_delay": 0.01, "embedding_latency": 0.1,
+                "error_rate": 0.0, "rate_limit_rate": 0.0, "rate_limit_rps": 0},
+    "slow": {"latency_median": 2.0, "latency_sigma": 0.7, "token_delay": 0.03, "embedding_latency": 0.5,
+             "error_rate": 0.0, "rate_limit_rate": 0.0, "rate_limit_rps": 0},
+    "flaky": {"latency_median": 0.6, "latency_sigma": 0.9, "token_delay": 0.015, "embedding_latency": 0.2,
+              "error_rate": 0.05, "rate_limit_rate": 0.1, "rate_limit_rps": 20},
+}
+
+EMBEDDING_DIMENSIONS = {"text-embedding-3-small": 1536, "text-embedding-3-large": 3072,
+                        "text-embedding-ada-002": 1536}
+DEFAULT_MAX_TOKENS = 300
+
+# First matching rule answers the request: 'match' is a regex over the system
+# and user messages, the answer is 'content' or one of 'choices' picked by a
+# hash of the request. Everything else gets deterministic filler text.
+DEFAULT_RULES = [
+    {"match": r"Only respond with the agent name",
+     "choices": ["PlanerAgent", "RagWriterAgent", "SeoAgent", "ResearchAgent"]},
+]
+
+_FILLER = ("Stub response covering the audience, the offer, proof points, channels, timing and a clear "
+           "call to action for the campaign. ").split()
+
+
+def _digest(value):
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode("utf-8")).digest()
+
+
+def completion_text(messages, max_tokens, rules):
+    """
+    Deterministic reply to a chat request.
+
+    Args:
+        messages (list): Chat messages
+        max_tokens (int): Upper bound on the estimated reply tokens
+        rules (list): Response rules, see DEFAULT_RULES
+
+    Returns:
+        str: Same messages always give the same reply
+    """
+    text = "\n".join(str(message.get("content") or "") for message in messages)
+    digest = _digest(messages)
+    for rule in rules:
+        if re.search(rule["match"], text):
+            if "choices" in rule:
+                return rule["choices"][digest[0] % len(rule["choices"])]
+            return rule["content"]
+    words = [f"[{digest.hex()[:8]}]"]
+    budget_chars = max_tokens * 4
+    length = len(words[0])
+    for i in range(10_000):
+        word = _FILLER[(i + digest[1]) % len(_FILLER)]
+        if length + len(word) + 1 > budget_chars:
+            break
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)
+
+
+def pseudo_embedding(text, dimensions):
+    """
+    Unit-length vector derived from a hash of the text.
+
+    Args:
+        text (str): Input text
+        dimensions (int): Vector size
+
+    Returns:
+        np.ndarray: float32 vector, identical for identical text
+    """
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dimensions).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+class FaultInjector:
+    """
+    Draws latencies and failures from a profile with a seeded generator.
+
+    The same seed and request order give the same latencies and failures.
+
+    Args:
+        profile (dict): Values as in PROFILES
+        seed (int): Random seed
+    """
+
+    def __init__(self, profile, seed=0):
+        self.profile = profile
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._recent = deque()
+
+    def latency(self):
+        with self._lock:
+            if self.profile["latency_median"] <= 0:
+                return 0.0
+            return self.profile["latency_median"] * self._random.lognormvariate(0, self.profile["latency_sigma"])
+
+    def embedding_latency(self):
+        with self._lock:
+            if self.profile["embedding_latency"] <= 0:
+                return 0.0
+            return self.profile["embedding_latency"] * self._random.lognormvariate(0, self.profile["latency_sigma"])
+
+    def fault(self):
+        """Return (status, error type, message) for a failing request, or None."""
+        now = time.monotonic()
+        with self._lock:
+            limit = self.profile["rate_limit_rps"]
+            if limit:
+                while self._recent and now - self._recent[0] > 1.0:
+                    self._recent.popleft()
+                if len(self._recent) >= limit:
+                    return 429, "rate_limit_exceeded", f"Rate limit of {limit} requests per second reached"
+                self._recent.append(now)
+            draw = self._random.random()
+        if draw < self.profile["rate_limit_rate"]:
+            return 429, "rate_limit_exceeded", "Rate limit reached (injected)"
+        if draw < self.profile["rate_limit_rate"] + self.profile["error_rate"]:
+            return 500, "server_error", "The server had an error while processing your request (injected)"
+        return None
+
+
+def _error_response(status, error_type, message):
+    headers = {"retry-after": "1", "x-ratelimit-remaining-requests": "0"} if status == 429 else None
+    return JSONResponse(status_code=status, headers=headers,
+                        content={"error": {"message": message, "type": error_type, "code": error_type}})
+
+
+def _tool_call(tools, messages, digest):
+    function = tools[0]["function"]
+    parameters = function.get("parameters", {})
+    argument = (parameters.get("required") or list(parameters.get("properties", {})) or ["input"])[0]
+    query = str(messages[-1].get("content") or "")[:100]
+    return {"id": f"call_{digest.hex()[:24]}", "type": "function",
+            "function": {"name": function["name"], "arguments": json.dumps({argument: query})}}
+
+
+def create_stub_app(profile, rules=DEFAULT_RULES, seed=0):
+    """
+    Build the stub OpenAI API.
+
+    Args:
+        profile (dict): Latency and fault settings, see PROFILES
+        rules (list): Response rules, see DEFAULT_RULES
+        seed (int): Seed for latencies and injected faults
+
+    Returns:
+        FastAPI: The ASGI application
+    """
+    app = FastAPI(title="OpenAI stub")
+    faults = FaultInjector(profile, seed)
+    stats = Counter()
+    seen_prefixes = set()
+
+    def usage(messages, completion_tokens):
+        prompt_tokens = sum(estimate_tokens(str(message.get("content") or "")) for message in messages)
+        # Like the real API: repeated system prefixes of 1024+ tokens are cached in 128-token blocks
+        system = str(messages[0].get("content") or "") if messages and messages[0].get("role") == "system" else ""
+        system_tokens = estimate_tokens(system)
+        cached = 0
+        if system_tokens >= 1024:
+            key = hashlib.sha256(system.encode("utf-8")).hexdigest()
+            if key in seen_prefixes:
+                cached = system_tokens // 128 * 128
+            seen_prefixes.add(key)
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "prompt_tokens_details": {"cached_tokens": cached}}
+
+    @app.get("/v1/models")
+    async def models():
+        names = ["gpt-4", "gpt-4o-mini", "gpt-3.5-turbo", *EMBEDDING_DIMENSIONS]
+        return {"object": "list", "data": [{"id": name, "object": "model", "owned_by": "stub"} for name in names]}
+
+    @app.get("/stats")
+    async def get_stats():
+        return {"requests": dict(stats), "profile": profile}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        fault = faults.fault()
+        if fault:
+            stats[f"chat {fault[0]}"] += 1
+            return _error_response(*fault)
+
+        messages = body.get("messages", [])
+        model = body.get("model", "gpt-4")
+        max_tokens = body.get("max_tokens") or body.get("max_completion_tokens") or DEFAULT_MAX_TOKENS
+        digest = _digest(messages)
+        created = int(time.time())
+        completion_id = f"chatcmpl-{digest.hex()[:24]}"
+        tools = body.get("tools")
+        tool_call = _tool_call(tools, messages, digest) if tools and messages[-1].get("role") == "user" else None
+        content = None if tool_call else completion_text(messages, max_tokens, rules)
+        completion_tokens = estimate_tokens(content or tool_call["function"]["arguments"])
+        first_token = faults.latency()
+
+        if not body.get("stream"):
+            await asyncio.sleep(first_token + completion_tokens * profile["token_delay"])
+            stats["chat 200"] += 1
+            message = {"role": "assistant", "content": content}
+            if tool_call:
+                message["tool_calls"] = [tool_call]
+            return {
+                "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": message,
+                             "finish_reason": "tool_calls" if tool_call else "stop"}],
+                "usage": usage(messages, completion_tokens)
+            }
+
+        include_usage = (body.get("stream_options") or {}).get("include_usage")
+
+        def chunk(delta, finish_reason=None):
+            return "data: " + json.dumps({
+                "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            }) + "\n\n"
+
+        async def events():
+            await asyncio.sleep(first_token)
+            yield chunk({"role": "assistant", "content": "" if content is not None else None})
+            if tool_call:
+                yield chunk({"tool_calls": [{"index": 0, **tool_call}]})
+            else:
+                for piece in re.findall(r"\S+\s*", content):
+                    await asyncio.sleep(estimate_tokens(piece) * profile["token_delay"])
+                    yield chunk({"content": piece})
+            yield chunk({}, "tool_calls" if tool_call else "stop")
+            if include_usage:
+                yield "data: " + json.dumps({
+                    "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [], "usage": usage(messages, completion_tokens)
+                }) + "\n\n"
+            yield "data: [DONE]\n\n"
+            stats["chat stream 200"] += 1
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        fault = faults.fault()
+        if fault:
+            stats[f"embeddings {fault[0]}"] += 1
+            return _error_response(*fault)
+
+        model = body.get("model", "text-embedding-3-small")
+        dimensions = body.get("dimensions") or EMBEDDING_DIMENSIONS.get(model, 1536)
+        inputs = body.get("input")
+        inputs = [inputs] if isinstance(inputs, str) else list(inputs or [])
+        as_base64 = body.get("encoding_format") == "base64"
+        data = []
+        for index, text in enumerate(inputs):
+            vector = pseudo_embedding(text if isinstance(text, str) else json.dumps(text), dimensions)
+            embedding = base64.b64encode(vector.tobytes()).decode("ascii") if as_base64 else vector.tolist()
+            data.append({"object": "embedding", "index": index, "embedding": embedding})
+        await asyncio.sleep(faults.embedding_latency())
+        stats["embeddings 200"] += 1
+        tokens = sum(estimate_tokens(str(text)) for text in inputs)
+        return {"object": "list", "data": data, "model": model,
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens}}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="typical")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for latencies and injected faults")
+    parser.add_argument("--responses", help="JSON file of response rules, tried before the built-in ones")
+    for key, value in PROFILES["typical"].items():
+        parser.add_argument(f"--{key.replace('_', '-')}", type=type(value), help=f"Override the profile's {key}")
+    args = parser.parse_args()
+
+    profile = dict(PROFILES[args.profile])
+    profile.update({key: getattr(args, key) for key in profile if getattr(args, key) is not None})
+    rules = list(DEFAULT_RULES)
+    if args.responses:
+        with open(args.responses) as f:
+            rules = json.load(f) + rules
+
+    import uvicorn
+    print(f"OpenAI stub on http://{args.host}:{args.port}/v1 with profile {args.profile}: {profile}")
+    uvicorn.run(create_stub_app(profile, rules, args.seed), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
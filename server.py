@@ -0,0 +1,176 @@
+# SQLite3 compatibility setup, must run before ChromaDB loads (see main.py)
+import sys
+try:
+    import pysqlite3
+    sys.modules['sqlite3'] = pysqlite3
+except ImportError:
+    pass
+
+import argparse
+import asyncio
+import json
+import os
+
+from fastapi import FastAPI, File, HTTPException, Request, UploadFile
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+
+from utils.assign_agent import assign_agent
+from utils.handle_agent_call import handle_agent_call, AGENT_NAMES
+from utils.extract_pdf_content import extract_pdf_content, validate_pdf_file
+from utils.handle_file_upload import handle_file_upload
+from utils.sanitize_collection_name import get_collection_name
+from utils.session_manager import pin_collection, ingestion_reference
+from utils.manage_chroma_store import collect_garbage
+
+
+class RouteRequest(BaseModel):
+    prompt: str
+
+
+class AgentRequest(BaseModel):
+    prompt: str
+    documents: list[str] = []
+
+
+class BytesUploadedFile:
+    """Minimal stand-in for streamlit.UploadedFile backed by an in-memory upload."""
+
+    def __init__(self, name, data, content_type):
+        self.name = name
+        self.size = len(data)
+        self.type = content_type
+        self._data = data
+
+    def read(self):
+        return self._data
+
+
+def ingest_document(name, data, content_type):
+    """
+    Validate, extract and index an uploaded PDF.
+
+    Args:
+        name (str): Original file name
+        data (bytes): File contents
+        content_type (str): MIME type reported by the client
+
+    Returns:
+        dict: {'name': content-addressed collection name to pass in 'documents',
+               'filename': str, 'pages': int, 'size': int}
+
+    Raises:
+        ValueError: If the file is invalid or could not be indexed
+    """
+    uploaded_file = BytesUploadedFile(name, data, content_type)
+    is_valid, error_message = validate_pdf_file(uploaded_file)
+    if not is_valid:
+        raise ValueError(error_message)
+    pdf_data = extract_pdf_content(uploaded_file)
+    collection_name = get_collection_name(pdf_data)
+    with ingestion_reference(collection_name):
+        if not handle_file_upload(pdf_data):
+            raise ValueError(f"Could not add {name} to the knowledge base")
+        # Clients reference the document by name later, so no session may drop it
+        pin_collection(collection_name)
+    return {'name': collection_name, 'filename': name, 'pages': pdf_data['pages'], 'size': pdf_data['size']}
+
+
+def _sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def create_app(router=assign_agent, agent_runner=handle_agent_call, document_ingestor=ingest_document,
+               heartbeat_seconds=10):
+    """
+    Build the HTTP service.
+
+    The blocking router, agents and ingestion run on the worker thread pool so
+    the event loop keeps serving other requests. Backends are injectable so the
+    service can run offline against stubs.
+
+    Args:
+        router (callable): user_input -> agent name
+        agent_runner (callable): (agent_name, user_input, uploaded_files) -> response text
+        document_ingestor (callable): (name, data, content_type) -> document info dict
+        heartbeat_seconds (float): Interval of SSE keep-alive events while an agent runs
+
+    Returns:
+        FastAPI: The ASGI application
+    """
+    app = FastAPI(title="AutoMarketer.AI")
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    @app.post("/route")
+    async def route(body: RouteRequest):
+        agent = await run_in_threadpool(router, body.prompt)
+        return {"agent": agent}
+
+    @app.post("/agents/{name}")
+    async def run_agent(name: str, body: AgentRequest, request: Request, stream: bool = False):
+        if name not in AGENT_NAMES:
+            raise HTTPException(status_code=404, detail=f"Unknown agent '{name}'")
+        uploaded_files = [{'name': document} for document in body.documents] or None
+
+        wants_stream = stream or "text/event-stream" in request.headers.get("accept", "")
+        if not wants_stream:
+            response = await run_in_threadpool(agent_runner, name, body.prompt, uploaded_files)
+            if response is None:
+                raise HTTPException(status_code=502, detail="Agent returned no response")
+            return {"agent": name, "response": response}
+
+        async def events():
+            yield _sse_event("start", {"agent": name})
+            task = asyncio.ensure_future(run_in_threadpool(agent_runner, name, body.prompt, uploaded_files))
+            # Keep proxies from closing the connection while the agent works
+            while True:
+                done, _ = await asyncio.wait({task}, timeout=heartbeat_seconds)
+                if done:
+                    break
+                yield _sse_event("heartbeat", {})
+            try:
+                response = task.result()
+            except Exception as e:
+                yield _sse_event("error", {"detail": str(e)})
+                return
+            if response is None:
+                yield _sse_event("error", {"detail": "Agent returned no response"})
+                return
+            for paragraph in response.split("\n\n"):
+                yield _sse_event("message", {"text": paragraph + "\n\n"})
+            yield _sse_event("done", {"agent": name})
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/documents")
+    async def upload_document(file: UploadFile = File(...)):
+        data = await file.read()
+        try:
+            return await run_in_threadpool(
+                document_ingestor, file.filename, data, file.content_type or "application/pdf"
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+
+    return app
+
+
+app = create_app()
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run the AutoMarketer.AI HTTP service")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", 1)))
+    args = parser.parse_args()
+
+    # Reclaim segment folders left behind by dropped collections before serving
+    collect_garbage()
+    uvicorn.run("server:app", host=args.host, port=args.port, workers=args.workers)
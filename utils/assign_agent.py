@@ -1,17 +1,12 @@
-from .get_llm_response import get_llm_response
+import re
+import json
+from .get_llm_response import get_llm_response, get_openai_client, _fallback_routing
+from .single_flight import single_flight, make_fingerprint
+from .model_policy import create_chat_completion
+from .handle_agent_call import AGENT_NAMES
+from .prompt_templates import PromptTemplate
 
-def assign_agent(user_input):
-    """
-    Assigns the most appropriate agent based on user input using routing logic.
-    
-    Args:
-        user_input (str): The user's query or request
-        
-    Returns:
-        str: The assigned agent name (PlanerAgent, RagWriterAgent, SeoAgent, or ResearchAgent)
-    """
-    
-    routing_prompt = f"""
+ROUTING_PROMPT = PromptTemplate("routing", """
 You are a strict routing assistant.
 
 GOAL: Given the raw user prompt, select EXACTLY ONE best-matching agent from the fixed list below.
@@ -34,11 +29,217 @@ EXAMPLES:
 2. User: "Write a blog post about Rag"         → RagWriterAgent
 3. User: "Best keywords for travel blog"       → SeoAgent
 4. User: "Research top AI tools in 2024"      → ResearchAgent
+""", (("user_input", "User prompt"),))
+
+TASK_GRAPH_PROMPT = PromptTemplate("task_graph", """
+You are a strict planning router.
+
+GOAL: Break the user prompt into the smallest set of agent tasks needed to satisfy it.
+
+AVAILABLE AGENTS (DO NOT RENAME, DO NOT ADD):
+ - PlanerAgent      (For planning, schedules, calendars, content plans, timelines)
+ - RagWriterAgent   (For writing, drafting, content generation)
+ - SeoAgent         (For SEO optimization, keyword strategy, SERP/ranking related questions)
+ - ResearchAgent    (For researching, looking up, fact finding, gathering information)
+
+RULES:
+- Use at most 4 tasks and each agent at most once.
+- A task depends on another task only if it needs that task's output.
+- Tasks without dependencies will run in parallel, so do not add unnecessary dependencies.
+- Respond with JSON only: a list of objects with keys "id", "agent", "task", "depends_on".
+
+EXAMPLE:
+User: "Research competitors, pick SEO keywords and plan a 7-day calendar"
+[{"id": "t1", "agent": "ResearchAgent", "task": "Research competitors", "depends_on": []},
+ {"id": "t2", "agent": "SeoAgent", "task": "Pick SEO keywords", "depends_on": []},
+ {"id": "t3", "agent": "PlanerAgent", "task": "Plan a 7-day content calendar", "depends_on": ["t1", "t2"]}]
+""", (("user_input", "User prompt"),))
+
 
-User prompt : {user_input}
-"""
+def assign_agent(user_input):
+    """
+    Assigns the most appropriate agent based on user input using routing logic.
     
-    return get_llm_response(routing_prompt)
+    Args:
+        user_input (str): The user's query or request
+        
+    Returns:
+        str: The assigned agent name (PlanerAgent, RagWriterAgent, SeoAgent, or ResearchAgent)
+    """
+    return get_llm_response(ROUTING_PROMPT.render(user_input=user_input))
 
 
+def is_composite_request(user_input):
+    """
+    Cheap local check for prompts that ask several agents for work.
+
+    The prompt is split into clauses and each clause is matched against the
+    agent keywords. Only prompts touching two or more agents are sent to the
+    task graph router, so single-agent prompts pay no extra LLM call.
+    
+    Args:
+        user_input (str): The user's query or request
+        
+    Returns:
+        bool: True if the prompt looks like a multi-agent request
+    """
+    agents = {agent for _, agent in _split_into_agent_tasks(user_input)}
+    return len(agents) > 1
+
+
+def assign_task_graph(user_input):
+    """
+    Split a composite request into a small task graph of agents.
+    
+    Args:
+        user_input (str): The user's query or request
+        
+    Returns:
+        list: Nodes as {'id': str, 'agent': str, 'task': str, 'depends_on': list}
+              in a valid topological order
+    """
+    graph_messages = TASK_GRAPH_PROMPT.render(user_input=user_input)
+    client = get_openai_client()
+    if client is not None:
+        def request():
+            response = create_chat_completion(
+                client, "Router", "task_graph",
+                messages=graph_messages,
+                temperature=0
+            )
+            return response.choices[0].message.content.strip()
+
+        try:
+            raw_graph = single_flight("task_graph", make_fingerprint("Router", "task_graph", graph_messages, 0), request)
+            return validate_task_graph(json.loads(raw_graph))
+        except Exception as e:
+            print(f"Task graph routing failed, using keyword decomposition: {e}")
+
+    return _fallback_task_graph(user_input)
+
+
+def validate_task_graph(nodes):
+    """
+    Check a task graph and return its nodes in topological order.
+
+    Unknown agents, duplicate ids, agents used more than once and
+    dependencies on unknown ids are rejected. Nodes without an id get the
+    first free 't<n>' id.
+    
+    Args:
+        nodes (list): Raw node dicts as returned by the router
+        
+    Returns:
+        list: Normalized nodes in topological order
+        
+    Raises:
+        ValueError: If the graph is empty, malformed, repeats an id or agent, or is cyclic
+    """
+    if not isinstance(nodes, list) or not nodes:
+        raise ValueError("Task graph must be a non-empty list")
+
+    explicit_ids = {str(node["id"]) for node in nodes if isinstance(node, dict) and node.get("id")}
+    normalized = {}
+    agents = set()
+    for node in nodes:
+        if not isinstance(node, dict) or node.get("agent") not in AGENT_NAMES or not node.get("task"):
+            raise ValueError(f"Invalid task graph node: {node}")
+        if node["agent"] in agents:
+            raise ValueError(f"Agent {node['agent']} appears more than once in the task graph")
+        agents.add(node["agent"])
+        if node.get("id"):
+            node_id = str(node["id"])
+            if node_id in normalized:
+                raise ValueError(f"Duplicate task graph node id {node_id}")
+        else:
+            node_id = next(f"t{n}" for n in range(1, len(nodes) + 2)
+                           if f"t{n}" not in explicit_ids and f"t{n}" not in normalized)
+        normalized[node_id] = {
+            "id": node_id,
+            "agent": node["agent"],
+            "task": str(node["task"]),
+            "depends_on": [str(dep) for dep in node.get("depends_on") or []]
+        }
+
+    for node in normalized.values():
+        unknown = [dep for dep in node["depends_on"] if dep not in normalized]
+        if unknown:
+            raise ValueError(f"Node {node['id']} depends on unknown tasks {unknown}")
+
+    # Kahn's algorithm, keeping the router's order among ready nodes
+    ordered = []
+    remaining = dict(normalized)
+    while remaining:
+        ready = [node for node in remaining.values()
+                 if all(dep not in remaining for dep in node["depends_on"])]
+        if not ready:
+            raise ValueError("Task graph contains a cycle")
+        for node in ready:
+            ordered.append(node)
+            del remaining[node["id"]]
+    return ordered
+
+
+def _split_into_agent_tasks(user_input):
+    """
+    Split a prompt into clauses and tag each clause with a keyword-matched agent.
+    
+    Args:
+        user_input (str): The user's query or request
+        
+    Returns:
+        list: (clause, agent) tuples for clauses that match an agent
+    """
+    clauses = re.split(r",|;|\bthen\b|\band\b|\balso\b", user_input, flags=re.IGNORECASE)
+    tasks = []
+    for clause in clauses:
+        clause = clause.strip(" .")
+        if len(clause.split()) < 2:
+            continue
+        clause_lower = clause.lower()
+        for agent, keywords in _AGENT_KEYWORDS:
+            if any(re.search(rf"\b{keyword}", clause_lower) for keyword in keywords):
+                tasks.append((clause, agent))
+                break
+    return tasks
+
+
+# Checked in order; research and SEO first since plans and posts usually build on them
+_AGENT_KEYWORDS = (
+    ("ResearchAgent", ("research", "competitor", "trend", "insight", "look up", "find out")),
+    ("SeoAgent", ("seo", "keyword", "hashtag", "ranking", "serp")),
+    ("PlanerAgent", ("plan", "calendar", "schedule", "timeline")),
+    ("RagWriterAgent", ("write", "draft", "post", "blog", "copy", "article")),
+)
+
+
+def _fallback_task_graph(user_input):
+    """
+    Keyword-based task graph used when the LLM router is unavailable.
+
+    Research and SEO tasks run first in parallel; planning and writing tasks
+    depend on all of them, and writing also depends on planning.
+    
+    Args:
+        user_input (str): The user's query or request
+        
+    Returns:
+        list: Nodes in topological order
+    """
+    tasks = {}
+    for clause, agent in _split_into_agent_tasks(user_input):
+        tasks.setdefault(agent, clause)
+    if not tasks:
+        tasks[_fallback_routing(user_input)] = user_input
 
+    nodes = []
+    for index, (agent, _) in enumerate(_AGENT_KEYWORDS, start=1):
+        if agent not in tasks:
+            continue
+        if agent in ("ResearchAgent", "SeoAgent"):
+            depends_on = []
+        else:
+            upstream = ("ResearchAgent", "SeoAgent", "PlanerAgent") if agent == "RagWriterAgent" else ("ResearchAgent", "SeoAgent")
+            depends_on = [node["id"] for node in nodes if node["agent"] in upstream]
+        nodes.append({"id": f"t{index}", "agent": agent, "task": tasks[agent], "depends_on": depends_on})
+    return nodes
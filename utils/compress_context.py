@@ -0,0 +1,142 @@
+import re
+import numpy as np
+
+
+# Share of the score taken from embedding similarity when it is available
+EMBEDDING_WEIGHT = 0.5
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[]?[A-Z0-9])|\n{2,}")
+_TOKEN = re.compile(r"\w+")
+_STOPWORDS = frozenset(
+    "a an the and or but if of to in on for with by at from as is are was were be been it its this that "
+    "these those i you we they he she my your our their what which who how why when where about into "
+    "than then so not no do does did can could will would should may might must write post blog".split()
+)
+
+
+def estimate_tokens(text):
+    """
+    Approximate the number of model tokens in a text (about 4 characters per token).
+
+    Args:
+        text (str): Text to measure
+
+    Returns:
+        int: Estimated token count
+    """
+    return -(-len(text) // 4)
+
+
+def split_sentences(text):
+    """
+    Split a passage into sentences.
+
+    Args:
+        text (str): Passage
+
+    Returns:
+        list: Non-empty sentences, in order
+    """
+    return [sentence.strip() for sentence in _SENTENCE_END.split(text or "") if sentence and sentence.strip()]
+
+
+def score_sentences(query, sentences):
+    """
+    Lexical relevance of each sentence to the query.
+
+    Query terms are weighted by their inverse frequency across the sentences,
+    so words that appear everywhere count less, and scores are normalised by
+    sentence length so long sentences are not favoured.
+
+    Args:
+        query (str): Query text
+        sentences (list): Candidate sentences
+
+    Returns:
+        np.ndarray: Score per sentence in the range 0-1
+    """
+    terms = sorted({t for t in _TOKEN.findall(query.lower()) if t not in _STOPWORDS})
+    if not terms or not sentences:
+        return np.zeros(len(sentences))
+    term_index = {term: i for i, term in enumerate(terms)}
+
+    sentence_tokens = [_TOKEN.findall(sentence.lower()) for sentence in sentences]
+    lengths = np.array([max(len(tokens), 1) for tokens in sentence_tokens], dtype=np.float64)
+    rows = np.fromiter((row for row, tokens in enumerate(sentence_tokens) for t in tokens if t in term_index),
+                       dtype=np.int64)
+    cols = np.fromiter((term_index[t] for tokens in sentence_tokens for t in tokens if t in term_index),
+                       dtype=np.int64)
+
+    counts = np.zeros((len(sentences), len(terms)))
+    np.add.at(counts, (rows, cols), 1)
+    document_frequency = (counts > 0).sum(axis=0)
+    idf = np.log((len(sentences) + 1) / (document_frequency + 1)) + 1
+    scores = (np.log1p(counts) * idf).sum(axis=1) / np.sqrt(lengths)
+    top = scores.max()
+    return scores / top if top > 0 else scores
+
+
+def compress_context(query, passages, token_budget, passage_similarities=None):
+    """
+    Keep the sentences most relevant to the query within a token budget.
+
+    Sentences are scored on lexical overlap with the query and, when
+    passage_similarities is given (e.g. from the vector search that
+    retrieved the passages), on the embedding similarity of the passage they
+    come from, so no extra embedding calls are made. The best sentences are
+    kept until the budget is spent and are returned in source order.
+
+    Args:
+        query (str): Query the context will answer
+        passages (list): Passages (chunks, web pages) in source order
+        token_budget (int): Maximum estimated tokens of the result
+        passage_similarities (list, optional): Embedding similarity (0-1) per passage
+
+    Returns:
+        tuple: (compressed text, stats dict with 'original_tokens',
+               'compressed_tokens', 'ratio', 'sentences_kept', 'sentences_total')
+    """
+    sentences, sources, seen = [], [], set()
+    for index, passage in enumerate(passages):
+        for sentence in split_sentences(passage):
+            # Repeated sentences (boilerplate, overlapping chunks) are kept once
+            key = " ".join(_TOKEN.findall(sentence.lower()))
+            if key in seen:
+                continue
+            seen.add(key)
+            sentences.append(sentence)
+            sources.append(index)
+
+    token_counts = np.array([estimate_tokens(sentence) for sentence in sentences], dtype=np.int64)
+    original_tokens = sum(estimate_tokens(passage) for passage in passages)
+
+    if token_counts.sum() <= token_budget:
+        keep = np.ones(len(sentences), dtype=bool)
+    else:
+        scores = score_sentences(query, sentences)
+        if passage_similarities is not None and len(passage_similarities) == len(passages):
+            similarity = np.clip(np.asarray(passage_similarities, dtype=np.float64), 0, 1)[np.array(sources, dtype=np.int64)]
+            scores = (1 - EMBEDDING_WEIGHT) * scores + EMBEDDING_WEIGHT * similarity
+        # Highest score first; earlier sentences win ties
+        order = np.lexsort((np.arange(len(sentences)), -scores))
+        fits = np.cumsum(token_counts[order]) <= token_budget
+        fits[0] = True  # always keep the best sentence
+        keep = np.zeros(len(sentences), dtype=bool)
+        keep[order[fits]] = True
+
+    kept_passages = {}
+    for sentence, source, kept in zip(sentences, sources, keep):
+        if kept:
+            kept_passages.setdefault(source, []).append(sentence)
+    compressed = "\n\n".join(" ".join(kept_passages[source]) for source in sorted(kept_passages))
+
+    compressed_tokens = int(token_counts[keep].sum()) if len(sentences) else 0
+    stats = {
+        "original_tokens": original_tokens,
+        "compressed_tokens": compressed_tokens,
+        "ratio": compressed_tokens / original_tokens if original_tokens else 1.0,
+        "sentences_kept": int(keep.sum()),
+        "sentences_total": len(sentences)
+    }
+    print(f"🗜️ Context compressed {original_tokens} → {compressed_tokens} tokens ({stats['ratio']:.0%} kept)")
+    return compressed, stats
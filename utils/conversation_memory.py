@@ -0,0 +1,202 @@
+import threading
+from utils.get_llm_response import get_openai_client
+from utils.model_policy import create_chat_completion
+from utils.prompt_templates import PromptTemplate
+from utils.compress_context import estimate_tokens
+
+
+# Fixed budget for the conversation context given to agents: the summary of
+# older turns plus the last RECENT_TURNS turns, each clipped to its own budget,
+# so the context stops growing once the conversation is long enough
+RECENT_TURNS = 3
+TURN_TOKEN_BUDGET = 300
+SUMMARY_TOKEN_BUDGET = 250
+# Largest slice of a turn sent to the summarizer
+SUMMARIZE_TURN_TOKEN_BUDGET = 600
+# Older turns the background summary has not folded in yet share this budget,
+# each clipped to at least MIN_PENDING_TURN_TOKENS, so none of them is lost
+PENDING_TOKEN_BUDGET = 2 * TURN_TOKEN_BUDGET
+MIN_PENDING_TURN_TOKENS = 40
+
+SUMMARIZE_PROMPT = PromptTemplate("memory.summarize", f"""
+You maintain a running summary of a conversation between a user and marketing assistants.
+
+Update the summary with the new turn. Keep facts the user may refer back to: their product, audience,
+goals, constraints, decisions and the key points of each answer. Drop small talk and formatting.
+Write at most {SUMMARY_TOKEN_BUDGET * 3 // 4} words as short bullet points. Return only the updated summary.
+""", (("summary", "Current summary"), ("turn", "New turn")))
+
+
+_memory_lock = threading.Lock()
+# Newest history handed to a running summary thread, by id() of its memory
+_latest_history = {}
+
+
+def clip_to_tokens(text, token_budget):
+    """
+    Cut a text to a token budget at a word boundary.
+
+    Args:
+        text (str): Text to clip
+        token_budget (int): Maximum estimated tokens
+
+    Returns:
+        str: The text, or its beginning followed by an ellipsis
+    """
+    text = (text or "").strip()
+    if estimate_tokens(text) <= token_budget:
+        return text
+    return text[:max(token_budget * 4 - 2, 0)].rsplit(" ", 1)[0] + " …"
+
+
+def format_turn(entry, token_budget):
+    """
+    Render one history entry as a user/assistant exchange within a token budget.
+
+    Args:
+        entry (dict): Session history entry
+        token_budget (int): Maximum estimated tokens for the turn
+
+    Returns:
+        str: 'User: ...' / 'Assistant (Agent): ...' lines
+    """
+    query = clip_to_tokens(entry.get("query"), token_budget // 3)
+    agent = f" ({entry['agent_type']})" if entry.get("agent_type") else ""
+    response = clip_to_tokens(entry.get("response"), token_budget - estimate_tokens(query) - 8)
+    return f"User: {query}\nAssistant{agent}: {response}"
+
+
+def summarize_turn(summary, entry):
+    """
+    Fold one turn into the running summary with a single small LLM call.
+
+    Only the current summary and the new turn are sent, so the cost of each
+    step does not depend on the length of the conversation. Without an API
+    client (or on error) the turn's query is appended locally instead.
+
+    Args:
+        summary (str): Current summary
+        entry (dict): History entry leaving the verbatim window
+
+    Returns:
+        str: Updated summary, within SUMMARY_TOKEN_BUDGET
+    """
+    client = get_openai_client()
+    if client is not None:
+        try:
+            response = create_chat_completion(
+                client, "Memory", "summarize",
+                messages=SUMMARIZE_PROMPT.render(
+                    summary=summary or "(empty)",
+                    turn=format_turn(entry, SUMMARIZE_TURN_TOKEN_BUDGET)
+                )
+            )
+            return clip_to_tokens(response.choices[0].message.content, SUMMARY_TOKEN_BUDGET)
+        except Exception as e:
+            print(f"Conversation summary failed, keeping a local summary: {e}")
+
+    updated = f"{summary}\n- User asked: {clip_to_tokens(entry.get('query'), 40)}".strip()
+    # Keep the most recent part when the local summary outgrows its budget
+    while estimate_tokens(updated) > SUMMARY_TOKEN_BUDGET and "\n" in updated:
+        updated = updated.split("\n", 1)[1]
+    return clip_to_tokens(updated, SUMMARY_TOKEN_BUDGET)
+
+
+def build_conversation_context(history, memory, summarize=summarize_turn):
+    """
+    Build the conversation context for the next agent call.
+
+    Turns older than the last RECENT_TURNS are folded into memory['summary']
+    one at a time, the first time they leave the verbatim window, and are
+    never summarised again. memory is updated in place and should be kept
+    per session.
+
+    With summarize=None no LLM call is made: older turns that
+    summarize_in_background() has not folded in yet are all kept next to
+    the previous summary, clipped to share PENDING_TOKEN_BUDGET.
+
+    Args:
+        history (list): Session history entries, oldest first
+        memory (dict): {'summary': str, 'summarized_count': int}, updated in place
+        summarize (callable or None): (summary, entry) -> updated summary
+
+    Returns:
+        str or None: Context within SUMMARY_TOKEN_BUDGET + RECENT_TURNS * TURN_TOKEN_BUDGET
+                     tokens (plus headings, and PENDING_TOKEN_BUDGET while a summary
+                     is pending), or None for a new conversation
+    """
+    with _memory_lock:
+        if memory.get("summarized_count", 0) > len(history):
+            # History was cleared; start over
+            memory["summary"], memory["summarized_count"] = "", 0
+        summary, summarized_count = memory.get("summary", ""), memory.get("summarized_count", 0)
+
+    older = max(len(history) - RECENT_TURNS, 0)
+    if summarize is not None:
+        for entry in history[summarized_count:older]:
+            summary = summarize(summary, entry)
+            summarized_count += 1
+            memory["summary"], memory["summarized_count"] = summary, summarized_count
+    pending = history[min(summarized_count, older):older]
+    pending_budget = max(PENDING_TOKEN_BUDGET // max(len(pending), 1), MIN_PENDING_TURN_TOKENS)
+
+    sections = []
+    if summary:
+        sections.append(f"Summary of earlier conversation:\n{summary}")
+    recent = ([format_turn(entry, pending_budget) for entry in pending]
+              + [format_turn(entry, TURN_TOKEN_BUDGET) for entry in history[older:]])
+    if recent:
+        sections.append("Recent turns:\n" + "\n\n".join(recent))
+    return "\n\n".join(sections) or None
+
+
+def summarize_in_background(history, memory, summarize=summarize_turn):
+    """
+    Fold turns that left the verbatim window into memory['summary'] on a daemon thread.
+
+    Called after a response is added to the history, so the summary call
+    runs while the user reads the answer instead of before the next agent
+    call. At most one summary thread runs per memory; a call made while it
+    runs hands it the newer history, and it keeps going until it has caught up.
+
+    Args:
+        history (list): Session history entries, oldest first, with their responses resolved
+        memory (dict): {'summary': str, 'summarized_count': int}, updated in place
+        summarize (callable): (summary, entry) -> updated summary
+
+    Returns:
+        threading.Thread or None: The summary thread, None if one is already running
+                                  or nothing is pending
+    """
+    with _memory_lock:
+        _latest_history[id(memory)] = history
+        if memory.get("summarizing") or memory.get("summarized_count", 0) >= len(history) - RECENT_TURNS:
+            return None
+        memory["summarizing"] = True
+
+    def finish():
+        memory["summarizing"] = False
+        _latest_history.pop(id(memory), None)
+
+    def run():
+        try:
+            while True:
+                with _memory_lock:
+                    latest = _latest_history.get(id(memory), [])
+                    done = memory.get("summarized_count", 0)
+                    if done >= len(latest) - RECENT_TURNS:
+                        # Checked and cleared under one lock, so no newer history is missed
+                        finish()
+                        return
+                    summary, entry = memory.get("summary", ""), latest[done]
+                summary = summarize(summary, entry)
+                with _memory_lock:
+                    memory["summary"], memory["summarized_count"] = summary, done + 1
+        except Exception as e:
+            print(f"Background conversation summary failed: {e}")
+            with _memory_lock:
+                finish()
+
+    thread = threading.Thread(target=run, name="conversation-summary", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,347 @@
+import os
+import re
+import json
+import hashlib
+import threading
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: appends of whole lines are not interleaved in practice
+    fcntl = None
+
+
+# SimHash settings: 64-bit signatures over the set of distinct word 3-shingles.
+# Signatures within MAX_HAMMING_DISTANCE bits only make two chunks candidates;
+# a candidate is a near-duplicate when the exact Jaccard similarity of their
+# shingle sets is at least MIN_JACCARD. Shared markup or boilerplate can bring
+# signatures of distinct chunks close, but not their shingle sets.
+SIGNATURE_BITS = 64
+SHINGLE_SIZE = 3
+MAX_HAMMING_DISTANCE = 3
+MIN_JACCARD = 0.9
+
+# Signatures of every indexed chunk in the knowledge base: one append-only
+# file of 'chunk_id signature' lines per collection, shared by every process
+# using the store and deleted together with the collection
+SIGNATURE_DIR = "./ingest_manifests/signatures"
+LEGACY_SIGNATURE_INDEX_PATH = "./ingest_manifests/chunk_signatures.json"
+
+_BIT_POSITIONS = np.arange(SIGNATURE_BITS, dtype=np.uint64)
+_POPCOUNT_8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+_kb_signatures = None  # {collection: {chunk_id: signature}}
+_kb_offsets = {}       # collection -> bytes of its signature file already read
+_kb_matrix = None      # (signatures as np.uint64 array, [(collection, chunk_id)]), rebuilt on change
+_kb_lock = threading.Lock()
+_stats = {"chunks": 0, "skipped": 0, "reused": 0, "embedding_calls_saved": 0, "index_bytes_saved": 0}
+
+
+def shingle_set(text):
+    """
+    Distinct word shingles of a text.
+
+    Args:
+        text (str): Text to split
+
+    Returns:
+        frozenset: Lowercased SHINGLE_SIZE-word shingles (a single shingle for shorter texts)
+    """
+    tokens = re.findall(r"\w+", text.lower())
+    if not tokens:
+        return frozenset()
+    return frozenset(" ".join(tokens[i:i + SHINGLE_SIZE])
+                     for i in range(max(1, len(tokens) - SHINGLE_SIZE + 1)))
+
+
+def jaccard(shingles, other_shingles):
+    """
+    Exact Jaccard similarity of two shingle sets.
+
+    Returns:
+        float: |intersection| / |union|, 1.0 for two empty sets
+    """
+    if not shingles and not other_shingles:
+        return 1.0
+    return len(shingles & other_shingles) / len(shingles | other_shingles)
+
+
+def is_near_duplicate(text, other_text):
+    """
+    Whether two texts are near-duplicates by exact shingle comparison.
+
+    Args:
+        text (str): First text
+        other_text (str): Second text
+
+    Returns:
+        bool: True if their shingle sets have Jaccard similarity of at least MIN_JACCARD
+    """
+    return jaccard(shingle_set(text), shingle_set(other_text)) >= MIN_JACCARD
+
+
+def simhash(text):
+    """
+    Compute the 64-bit SimHash signature of a text.
+
+    Args:
+        text (str): Text to fingerprint
+
+    Returns:
+        int: Signature
+    """
+    return _simhash_shingles(shingle_set(text))
+
+
+def _simhash_shingles(shingles):
+    # Every distinct shingle votes once, so repeated markup cannot outweigh the text
+    if not shingles:
+        return 0
+    shingles = sorted(shingles)
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little") for s in shingles),
+        dtype=np.uint64, count=len(shingles)
+    )
+    # Each shingle votes +1/-1 on every bit; the signature keeps the majority
+    bits = (hashes[:, None] >> _BIT_POSITIONS) & np.uint64(1)
+    votes = (bits.astype(np.int32) * 2 - 1).sum(axis=0)
+    return int(((votes > 0).astype(np.uint64) << _BIT_POSITIONS).sum())
+
+
+def hamming_distances(signature, signatures):
+    """
+    Hamming distance between one signature and an array of signatures.
+
+    Args:
+        signature (int): Signature to compare
+        signatures (np.ndarray): uint64 array of signatures
+
+    Returns:
+        np.ndarray: Number of differing bits for each entry
+    """
+    xor = np.bitwise_xor(signatures, np.uint64(signature))
+    return _POPCOUNT_8[xor.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+
+def _signature_path(collection_name):
+    return os.path.join(SIGNATURE_DIR, f"{collection_name}.sig")
+
+
+def _migrate_legacy_index():
+    """Split the former single-file index into per-collection files (call with _kb_lock held)."""
+    try:
+        with open(LEGACY_SIGNATURE_INDEX_PATH, encoding="utf-8") as f:
+            legacy = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return
+    for collection_name, chunks in legacy.items():
+        _append_signatures(collection_name, {chunk_id: int(sig, 16) for chunk_id, sig in chunks.items()})
+    try:
+        os.remove(LEGACY_SIGNATURE_INDEX_PATH)
+    except OSError:
+        pass
+
+
+def _refresh_kb_index():
+    """
+    Bring the in-memory index up to date with the signature files (call with _kb_lock held).
+
+    Files are append-only, so only bytes written since the last refresh are
+    read; a file that shrank was recreated and is read again. Collections
+    whose file disappeared were dropped, possibly by another process.
+    """
+    global _kb_signatures, _kb_matrix
+    if _kb_signatures is None:
+        _kb_signatures = {}
+        _migrate_legacy_index()
+    try:
+        names = {entry.name[:-len(".sig")] for entry in os.scandir(SIGNATURE_DIR) if entry.name.endswith(".sig")}
+    except OSError:
+        names = set()
+
+    for collection_name in set(_kb_offsets) - names:
+        _kb_offsets.pop(collection_name)
+        _kb_signatures.pop(collection_name, None)
+        _kb_matrix = None
+    for collection_name in names:
+        offset = _kb_offsets.get(collection_name, 0)
+        try:
+            with open(_signature_path(collection_name), "rb") as f:
+                f.seek(0, os.SEEK_END)
+                size = f.tell()
+                if size == offset:
+                    continue
+                if size < offset:
+                    offset = 0
+                    _kb_signatures.pop(collection_name, None)
+                f.seek(offset)
+                data = f.read(size - offset)
+        except OSError:
+            continue
+        # A writer may be mid-line; the partial line is read on the next refresh
+        complete = data[:data.rfind(b"\n") + 1]
+        chunks = _kb_signatures.setdefault(collection_name, {})
+        for line in complete.decode("utf-8").splitlines():
+            chunk_id, _, signature = line.rpartition(" ")
+            if chunk_id:
+                chunks[chunk_id] = int(signature, 16)
+        _kb_offsets[collection_name] = offset + len(complete)
+        _kb_matrix = None
+
+
+def _get_kb_matrix():
+    """Flatten the signature index into a NumPy array for vectorised search (call with _kb_lock held)."""
+    global _kb_matrix
+    if _kb_matrix is None:
+        refs = [(collection, chunk_id) for collection, chunks in _kb_signatures.items() for chunk_id in chunks]
+        values = np.array([_kb_signatures[collection][chunk_id] for collection, chunk_id in refs], dtype=np.uint64)
+        _kb_matrix = (values, refs)
+    return _kb_matrix
+
+
+def _append_signatures(collection_name, chunk_signatures):
+    """Append records to a collection's signature file under an exclusive file lock."""
+    os.makedirs(SIGNATURE_DIR, exist_ok=True)
+    records = "".join(f"{chunk_id} {signature:016x}\n" for chunk_id, signature in chunk_signatures.items())
+    with open(_signature_path(collection_name), "a", encoding="utf-8") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            f.write(records)
+            f.flush()
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def find_near_duplicates(chunks, collection_name):
+    """
+    Decide, for every chunk of a document, whether it needs embedding.
+
+    A chunk that nearly repeats an earlier chunk of the same document (page
+    headers, footers, legal boilerplate, repeated slides) is skipped; it is
+    only skipped after its shingles were compared with that chunk's. A chunk
+    whose signature is close to a chunk already indexed in another collection
+    is kept, but may reuse that chunk's embedding instead of calling the API
+    once the texts were compared (see _embed_with_reuse in
+    handle_file_upload), so every document stays complete on its own.
+
+    Args:
+        chunks (list): Chunks of the document, in order
+        collection_name (str): Collection the document is indexed into
+
+    Returns:
+        tuple: (signatures, plan) where plan[i] is None (embed), ('skip', j)
+               (duplicate of chunk j) or ('reuse', collection, chunk_id)
+    """
+    shingles = [shingle_set(chunk) for chunk in chunks]
+    signatures = [_simhash_shingles(chunk_shingles) for chunk_shingles in shingles]
+    plan = [None] * len(chunks)
+    kept = np.zeros(len(chunks), dtype=np.uint64)
+    kept_indices = []
+
+    with _kb_lock:
+        _refresh_kb_index()
+        kb_values, kb_refs = _get_kb_matrix()
+        other_collection = np.array([collection != collection_name for collection, _ in kb_refs], dtype=bool)
+
+        for index, signature in enumerate(signatures):
+            if kept_indices:
+                distances = hamming_distances(signature, kept[:len(kept_indices)])
+                candidates = np.flatnonzero(distances <= MAX_HAMMING_DISTANCE)
+                duplicate_of = next(
+                    (kept_indices[c] for c in candidates[np.argsort(distances[candidates], kind="stable")]
+                     if jaccard(shingles[index], shingles[kept_indices[c]]) >= MIN_JACCARD),
+                    None
+                )
+                if duplicate_of is not None:
+                    plan[index] = ('skip', duplicate_of)
+                    continue
+            kept[len(kept_indices)] = signature
+            kept_indices.append(index)
+
+            if len(kb_values):
+                distances = hamming_distances(signature, kb_values)
+                distances[~other_collection] = SIGNATURE_BITS + 1
+                closest = int(np.argmin(distances))
+                if distances[closest] <= MAX_HAMMING_DISTANCE:
+                    plan[index] = ('reuse', *kb_refs[closest])
+
+    return signatures, plan
+
+
+def register_chunk_signatures(collection_name, chunk_signatures):
+    """
+    Add indexed chunks to the knowledge-base signature index.
+
+    Only the new records are appended to the collection's file, so processes
+    sharing the store never overwrite each other's entries.
+
+    Args:
+        collection_name (str): Collection the chunks were written to
+        chunk_signatures (dict): chunk_id -> signature
+    """
+    if not chunk_signatures:
+        return
+    with _kb_lock:
+        _append_signatures(collection_name, chunk_signatures)
+
+
+def forget_collection_signatures(collection_name):
+    """
+    Remove a dropped collection from the signature index.
+
+    Other processes drop it from their index on their next refresh.
+
+    Args:
+        collection_name (str): Collection name
+    """
+    global _kb_matrix
+    with _kb_lock:
+        try:
+            os.remove(_signature_path(collection_name))
+        except OSError:
+            pass
+        _kb_offsets.pop(collection_name, None)
+        if _kb_signatures is not None and _kb_signatures.pop(collection_name, None) is not None:
+            _kb_matrix = None
+
+
+def record_dedupe_savings(chunks, plan, embedding_dimensions):
+    """
+    Count the embedding calls and index space saved for one document.
+
+    Args:
+        chunks (list): Chunks of the document
+        plan (list): Plan from find_near_duplicates()
+        embedding_dimensions (int): Length of the embedding vectors
+
+    Returns:
+        dict: {'chunks', 'skipped', 'reused', 'embedding_calls_saved', 'index_bytes_saved'}
+    """
+    skipped = [i for i, decision in enumerate(plan) if decision and decision[0] == 'skip']
+    reused = sum(1 for decision in plan if decision and decision[0] == 'reuse')
+    savings = {
+        "chunks": len(chunks),
+        "skipped": len(skipped),
+        "reused": reused,
+        "embedding_calls_saved": len(skipped) + reused,
+        # float32 vector plus the stored chunk text for every skipped chunk
+        "index_bytes_saved": sum(embedding_dimensions * 4 + len(chunks[i].encode("utf-8")) for i in skipped)
+    }
+    with _kb_lock:
+        for key, value in savings.items():
+            _stats[key] += value
+    return savings
+
+
+def get_dedupe_stats():
+    """
+    Get process-wide near-duplicate savings.
+
+    Returns:
+        dict: Totals of chunks seen, skipped, reused, embedding calls and index bytes saved
+    """
+    with _kb_lock:
+        return dict(_stats)
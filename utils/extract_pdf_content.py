@@ -1,8 +1,308 @@
 import PyPDF2
 import io
+import os
+import re
+import json
+import mmap
+import hashlib
+import tempfile
+import time
+import threading
+import contextlib
 import streamlit as st
 
 
+# Extraction results keyed by the SHA-256 of the file bytes
+PDF_CACHE_DIR = "./pdf_cache"
+# Least recently used entries are removed once the cache outgrows this
+PDF_CACHE_MAX_BYTES = int(os.environ.get("PDF_CACHE_MAX_MB", 512)) * 1024 * 1024
+# Entries used more recently than this are kept, since session descriptors
+# point at their text file for as long as an idle session lives
+PDF_CACHE_MIN_AGE_SECONDS = int(os.environ.get("PDF_CACHE_MIN_AGE_SECONDS", 2 * 60 * 60))
+
+# Uploads larger than this are spilled to a temporary file and parsed through mmap
+SPILL_THRESHOLD_BYTES = 16 * 1024 * 1024
+
+
+@contextlib.contextmanager
+def open_upload_buffer(uploaded_file, spill_threshold=SPILL_THRESHOLD_BYTES):
+    """
+    Expose an upload's bytes for hashing and parsing without copying them.
+    
+    Streamlit uploads are BytesIO objects, so small files are read through a
+    memoryview of the existing buffer. Large uploads are written from that
+    view to a temporary file and memory-mapped, so parsing is backed by the
+    page cache instead of another in-memory copy. Files that already live on
+    disk (a 'path' attribute) are mapped directly.
+    
+    Args:
+        uploaded_file (streamlit.UploadedFile): Streamlit uploaded file object
+        spill_threshold (int): Size in bytes above which uploads are spilled to disk
+        
+    Yields:
+        tuple: (buffer, stream) - a buffer-protocol view of the bytes and a
+               seekable stream over the same bytes for PdfReader
+    """
+    path = getattr(uploaded_file, 'path', None)
+    if path and os.path.getsize(path) > 0:
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped, mapped
+        return
+    
+    if not hasattr(uploaded_file, 'getbuffer'):
+        data = uploaded_file.read()
+        yield memoryview(data), io.BytesIO(data)
+        return
+    
+    view = uploaded_file.getbuffer()
+    try:
+        if view.nbytes <= spill_threshold:
+            uploaded_file.seek(0)
+            yield view, uploaded_file
+            return
+        
+        with tempfile.TemporaryFile(prefix="upload-") as spill_file:
+            spill_file.write(view)
+            spill_file.flush()
+            view.release()
+            with mmap.mmap(spill_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                yield mapped, mapped
+    finally:
+        view.release()
+
+
+def extract_pdf_document(uploaded_file, cache_dir=PDF_CACHE_DIR):
+    """
+    Parse a PDF once and return its text, page offsets and metadata.
+    
+    Results are cached on disk by the SHA-256 of the file bytes, so uploading
+    an identical file again (under any name) skips parsing entirely. The text
+    is kept in its own file ('text_path') so sessions can refer to it instead
+    of holding it in memory.
+    
+    Args:
+        uploaded_file (streamlit.UploadedFile): Streamlit uploaded file object
+        cache_dir (str): Directory of the extraction cache, None to disable it
+        
+    Returns:
+        dict: {'id': str, 'name': str, 'content': str, 'size': int, 'pages': int,
+               'type': str, 'page_offsets': list, 'metadata': dict, 'text_path': str}
+              'page_offsets[i]' is the character offset of page i+1 in 'content'
+    """
+    with open_upload_buffer(uploaded_file) as (buffer, stream):
+        document_id = hashlib.sha256(buffer).hexdigest()
+        cache_path = os.path.join(cache_dir, document_id) if cache_dir else None
+        
+        extraction = _load_cached_extraction(cache_path)
+        if extraction is None:
+            extraction = _parse_pdf(stream)
+            _save_cached_extraction(cache_path, extraction)
+            evict_pdf_cache(cache_dir)
+    
+    return {
+        'id': document_id,
+        'name': uploaded_file.name,
+        'size': uploaded_file.size,
+        'type': uploaded_file.type,
+        'text_path': f"{cache_path}.txt" if cache_path else None,
+        **extraction
+    }
+
+
+def make_document_descriptor(pdf_data):
+    """
+    Build the compact per-session record of an extracted document.
+    
+    The descriptor points at the text on disk instead of holding the text or
+    the uploaded file object.
+    
+    Args:
+        pdf_data (dict): Result of extract_pdf_document()
+        
+    Returns:
+        dict: {'id', 'name', 'type', 'size', 'pages', 'text_path'}
+    """
+    return {key: pdf_data.get(key) for key in ('id', 'name', 'type', 'size', 'pages', 'text_path')}
+
+
+def load_document_text(document):
+    """
+    Get a document's text from memory or from its text file on disk.
+    
+    Args:
+        document (dict): Extraction result or descriptor
+        
+    Returns:
+        str: Document text ('' if unavailable)
+    """
+    if document.get('content'):
+        return document['content']
+    text_path = document.get('text_path')
+    if text_path and os.path.exists(text_path):
+        with open(text_path, encoding='utf-8') as f:
+            return f.read()
+    return ''
+
+
+def _parse_pdf(stream):
+    """
+    Extract text, page offsets and metadata with a single PdfReader.
+    
+    Args:
+        stream: Seekable binary stream over the PDF bytes (BytesIO or mmap)
+        
+    Returns:
+        dict: {'content': str, 'pages': int, 'page_offsets': list, 'metadata': dict}
+    """
+    pdf_reader = PyPDF2.PdfReader(stream)
+    
+    page_texts = []
+    page_offsets = []
+    offset = 0
+    for page in pdf_reader.pages:
+        # Same normalization as clean_extracted_text, applied per page so offsets stay exact
+        page_text = re.sub(r'\s+', ' ', page.extract_text() or '').strip()
+        page_offsets.append(offset)
+        if page_text:
+            page_texts.append(page_text)
+            offset += len(page_text) + 1
+    
+    return {
+        'content': clean_extracted_text(' '.join(page_texts)),
+        'pages': len(pdf_reader.pages),
+        'page_offsets': page_offsets,
+        'metadata': _read_pdf_metadata(pdf_reader)
+    }
+
+
+def _read_pdf_metadata(pdf_reader):
+    """
+    Read document metadata from an open PdfReader.
+    
+    Args:
+        pdf_reader (PyPDF2.PdfReader): Parsed PDF
+        
+    Returns:
+        dict: PDF metadata information
+    """
+    metadata = {
+        'pages': len(pdf_reader.pages),
+        'title': '',
+        'author': '',
+        'subject': '',
+        'creator': '',
+        'producer': '',
+        'creation_date': '',
+        'modification_date': ''
+    }
+    
+    # Extract metadata if available
+    if pdf_reader.metadata:
+        metadata.update({
+            'title': str(pdf_reader.metadata.get('/Title', '')),
+            'author': str(pdf_reader.metadata.get('/Author', '')),
+            'subject': str(pdf_reader.metadata.get('/Subject', '')),
+            'creator': str(pdf_reader.metadata.get('/Creator', '')),
+            'producer': str(pdf_reader.metadata.get('/Producer', '')),
+            'creation_date': str(pdf_reader.metadata.get('/CreationDate', '')),
+            'modification_date': str(pdf_reader.metadata.get('/ModDate', ''))
+        })
+    
+    return metadata
+
+
+def _load_cached_extraction(cache_path):
+    """Load '<hash>.json' (pages, offsets, metadata) and '<hash>.txt' (text) from the cache."""
+    if not cache_path or not os.path.exists(f"{cache_path}.json") or not os.path.exists(f"{cache_path}.txt"):
+        return None
+    try:
+        with open(f"{cache_path}.json", encoding='utf-8') as f:
+            extraction = json.load(f)
+        with open(f"{cache_path}.txt", encoding='utf-8') as f:
+            extraction['content'] = f.read()
+        # The modification time is the entry's last use for evict_pdf_cache()
+        os.utime(f"{cache_path}.json")
+        os.utime(f"{cache_path}.txt")
+        return extraction
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def _save_cached_extraction(cache_path, extraction):
+    if not cache_path:
+        return
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        # Write then rename so concurrent readers never see a partial file;
+        # the text goes first because the JSON marks the entry as complete
+        suffix = f"{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(f"{cache_path}.txt.{suffix}", 'w', encoding='utf-8') as f:
+            f.write(extraction['content'])
+        os.replace(f"{cache_path}.txt.{suffix}", f"{cache_path}.txt")
+        with open(f"{cache_path}.json.{suffix}", 'w', encoding='utf-8') as f:
+            json.dump({key: value for key, value in extraction.items() if key != 'content'}, f)
+        os.replace(f"{cache_path}.json.{suffix}", f"{cache_path}.json")
+    except OSError as e:
+        print(f"Could not cache PDF extraction: {e}")
+
+
+def evict_pdf_cache(cache_dir=PDF_CACHE_DIR, max_bytes=PDF_CACHE_MAX_BYTES,
+                    min_age_seconds=PDF_CACHE_MIN_AGE_SECONDS):
+    """
+    Remove the least recently used extractions until the cache fits in max_bytes.
+    
+    An entry's last use is the modification time of its files, refreshed on
+    every cache hit. Entries used within min_age_seconds are kept even over
+    the limit, and leftover temporary files of interrupted writes older than
+    that are removed.
+    
+    Args:
+        cache_dir (str): Directory of the extraction cache
+        max_bytes (int): Size the cache is trimmed to
+        min_age_seconds (float): Minimum time since last use before an entry may be removed
+        
+    Returns:
+        dict: {'removed': list of document ids, 'freed_bytes': int}
+    """
+    if not cache_dir or not os.path.isdir(cache_dir):
+        return {'removed': [], 'freed_bytes': 0}
+    
+    now = time.time()
+    entries = {}
+    total_bytes = 0
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        if name.endswith('.tmp'):
+            if now - stat.st_mtime >= min_age_seconds:
+                with contextlib.suppress(OSError):
+                    os.remove(path)
+            continue
+        document_id = name.split('.', 1)[0]
+        size, last_used = entries.get(document_id, (0, 0))
+        entries[document_id] = (size + stat.st_size, max(last_used, stat.st_mtime))
+        total_bytes += stat.st_size
+    
+    removed = []
+    freed_bytes = 0
+    for document_id, (size, last_used) in sorted(entries.items(), key=lambda item: item[1][1]):
+        if total_bytes - freed_bytes <= max_bytes or now - last_used < min_age_seconds:
+            break
+        # The JSON marks an entry as complete, so it goes first
+        for extension in ('.json', '.txt'):
+            with contextlib.suppress(OSError):
+                os.remove(os.path.join(cache_dir, document_id + extension))
+        removed.append(document_id)
+        freed_bytes += size
+    
+    if removed:
+        print(f"🧹 Evicted {len(removed)} PDF extraction(s) from the cache, {freed_bytes / (1024 * 1024):.1f} MB")
+    return {'removed': removed, 'freed_bytes': freed_bytes}
+
+
 def extract_pdf_content(uploaded_file):
     """
     Extract text content from uploaded PDF file.
@@ -13,30 +313,10 @@ def extract_pdf_content(uploaded_file):
     Returns:
         dict: Dictionary containing file info and extracted content
               Format: {'name': str, 'content': str, 'size': int, 'pages': int}
+              plus 'id', 'page_offsets' and 'metadata' from extract_pdf_document()
     """
     try:
-        # Create a PDF reader object
-        pdf_reader = PyPDF2.PdfReader(io.BytesIO(uploaded_file.read()))
-        
-        # Extract text from all pages
-        extracted_text = ""
-        total_pages = len(pdf_reader.pages)
-        
-        for page_num in range(total_pages):
-            page = pdf_reader.pages[page_num]
-            extracted_text += page.extract_text() + "\n"
-        
-        # Clean up the extracted text
-        cleaned_text = clean_extracted_text(extracted_text)
-        
-        # Return structured data
-        return {
-            'name': uploaded_file.name,
-            'content': cleaned_text,
-            'size': uploaded_file.size,
-            'pages': total_pages,
-            'type': uploaded_file.type
-        }
+        return extract_pdf_document(uploaded_file)
         
     except Exception as e:
         st.error(f"Error extracting PDF content: {str(e)}")
@@ -63,8 +343,6 @@ def clean_extracted_text(text):
         return "No text content found in PDF"
     
     # Remove excessive whitespace and normalize line breaks
-    import re
-    
     # Remove multiple consecutive whitespaces
     text = re.sub(r'\s+', ' ', text)
     
@@ -114,6 +392,8 @@ def get_pdf_metadata(uploaded_file):
     """
     Extract metadata from PDF file.
     
+    Served from the same single-parse extraction (and cache) as the content.
+    
     Args:
         uploaded_file (streamlit.UploadedFile): Streamlit uploaded file object
         
@@ -121,32 +401,7 @@ def get_pdf_metadata(uploaded_file):
         dict: PDF metadata information
     """
     try:
-        pdf_reader = PyPDF2.PdfReader(io.BytesIO(uploaded_file.read()))
-        
-        metadata = {
-            'pages': len(pdf_reader.pages),
-            'title': '',
-            'author': '',
-            'subject': '',
-            'creator': '',
-            'producer': '',
-            'creation_date': '',
-            'modification_date': ''
-        }
-        
-        # Extract metadata if available
-        if pdf_reader.metadata:
-            metadata.update({
-                'title': pdf_reader.metadata.get('/Title', ''),
-                'author': pdf_reader.metadata.get('/Author', ''),
-                'subject': pdf_reader.metadata.get('/Subject', ''),
-                'creator': pdf_reader.metadata.get('/Creator', ''),
-                'producer': pdf_reader.metadata.get('/Producer', ''),
-                'creation_date': str(pdf_reader.metadata.get('/CreationDate', '')),
-                'modification_date': str(pdf_reader.metadata.get('/ModDate', ''))
-            })
-        
-        return metadata
+        return extract_pdf_document(uploaded_file)['metadata']
         
     except Exception as e:
         return {
@@ -1,24 +1,231 @@
+import re
+import hashlib
+import threading
+from functools import lru_cache
+import numpy as np
 import streamlit as st
 from openai import OpenAI
-from utils.get_llm_response import get_openai_client
+from utils.get_llm_response import get_openai_client, _get_setting
+from utils.single_flight import single_flight, make_fingerprint
 
-def get_embeddings(text):
+# Native output size of the OpenAI embedding models; text-embedding-3 models
+# can return fewer dimensions through the 'dimensions' parameter
+OPENAI_EMBEDDING_DIMENSIONS = {
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+    "text-embedding-ada-002": 1536,
+}
+HASHING_DIMENSIONS = 512
+
+# Collections without a recorded provider were built before providers existed
+LEGACY_EMBEDDING_METADATA = {
+    "embedding_provider": "openai",
+    "embedding_model": "text-embedding-3-small",
+    "embedding_dimensions": 1536,
+}
+
+_TOKEN = re.compile(r"\w+")
+
+
+class OpenAIEmbeddingProvider:
+    """
+    Embeddings from the OpenAI API.
+
+    Args:
+        model (str): Embedding model
+        dimensions (int, optional): Output size; smaller than the model's native
+                                    size gives shorter vectors (text-embedding-3 only)
+    """
+
+    name = "openai"
+
+    def __init__(self, model="text-embedding-3-small", dimensions=None):
+        self.model = model
+        self.dimensions = dimensions or OPENAI_EMBEDDING_DIMENSIONS.get(model, 1536)
+
+    def embed(self, texts):
+        """
+        Embed texts with a single API call.
+
+        Args:
+            texts (list): Texts to embed
+
+        Returns:
+            list: Embedding vectors in the same order as texts
+        """
+        client = get_openai_client()
+        request = {"input": list(texts), "model": self.model}
+        if self.dimensions != OPENAI_EMBEDDING_DIMENSIONS.get(self.model):
+            request["dimensions"] = self.dimensions
+
+        def call():
+            response = client.embeddings.create(**request)
+            return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+        # Concurrent sessions embedding the same texts share one call
+        fingerprint = make_fingerprint(self.model, self.dimensions, request["input"])
+        return single_flight("embeddings", fingerprint, call)
+
+
+class HashingEmbeddingProvider:
+    """
+    Local embeddings from a signed hashing vectoriser; no network or model files.
+
+    Words and word pairs are hashed into a fixed number of buckets with a
+    random sign, counts are dampened with log1p and the vector is scaled to
+    unit length. Retrieval quality is below a trained model, but embedding
+    runs on the CPU in microseconds per chunk.
+
+    Args:
+        dimensions (int): Number of hash buckets
+    """
+
+    name = "hashing"
+    model = "hashing-v1"
+
+    def __init__(self, dimensions=HASHING_DIMENSIONS):
+        self.dimensions = dimensions
+
+    def embed(self, texts):
+        """
+        Embed texts locally.
+
+        Args:
+            texts (list): Texts to embed
+
+        Returns:
+            list: Unit-length vectors (all zeros for texts without words)
+        """
+        texts = list(texts)
+        rows, buckets, signs = [], [], []
+        for row, text in enumerate(texts):
+            words = _TOKEN.findall((text or "").lower())
+            for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+                bucket, sign = _hash_feature(feature, self.dimensions)
+                rows.append(row)
+                buckets.append(bucket)
+                signs.append(sign)
+
+        matrix = np.zeros((len(texts), self.dimensions))
+        np.add.at(matrix, (np.array(rows, dtype=np.int64), np.array(buckets, dtype=np.int64)),
+                  np.array(signs, dtype=np.float64))
+        matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+        return matrix.tolist()
+
+
+@lru_cache(maxsize=1 << 16)
+def _hash_feature(feature, dimensions):
+    # Stable across processes, unlike hash()
+    value = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+    return value % dimensions, 1.0 if value >> 63 else -1.0
+
+
+EMBEDDING_PROVIDERS = {
+    OpenAIEmbeddingProvider.name: OpenAIEmbeddingProvider,
+    HashingEmbeddingProvider.name: HashingEmbeddingProvider,
+}
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+
+def get_embedding_provider(name=None, model=None, dimensions=None):
     """
-    Create embeddings for given text using OpenAI API.
-    
+    Get an embedding provider, by default the configured one.
+
+    EMBEDDING_PROVIDER ('openai' or 'hashing'), EMBEDDING_MODEL and
+    EMBEDDING_DIMENSIONS are read from Streamlit secrets or the environment.
+
+    Args:
+        name (str, optional): Provider name
+        model (str, optional): Model (OpenAI only)
+        dimensions (int, optional): Vector size
+
+    Returns:
+        OpenAIEmbeddingProvider or HashingEmbeddingProvider: Shared provider instance
+    """
+    if name is None:
+        name = _get_setting("EMBEDDING_PROVIDER") or "openai"
+        model = model or _get_setting("EMBEDDING_MODEL")
+        dimensions = dimensions or _get_setting("EMBEDDING_DIMENSIONS")
+    if name not in EMBEDDING_PROVIDERS:
+        raise ValueError(f"Unknown embedding provider '{name}', expected one of {sorted(EMBEDDING_PROVIDERS)}")
+    dimensions = int(dimensions) if dimensions else None
+
+    key = (name, model, dimensions)
+    with _providers_lock:
+        provider = _providers.get(key)
+        if provider is None:
+            if name == OpenAIEmbeddingProvider.name:
+                provider = OpenAIEmbeddingProvider(model or "text-embedding-3-small", dimensions)
+            else:
+                provider = HashingEmbeddingProvider(dimensions or HASHING_DIMENSIONS)
+            _providers[key] = provider
+        return provider
+
+
+def embedding_metadata(provider):
+    """
+    Collection metadata recording how its embeddings were made.
+
+    Args:
+        provider: Embedding provider
+
+    Returns:
+        dict: {'embedding_provider', 'embedding_model', 'embedding_dimensions'}
+    """
+    return {
+        "embedding_provider": provider.name,
+        "embedding_model": provider.model,
+        "embedding_dimensions": provider.dimensions,
+    }
+
+
+def get_collection_embedding_provider(metadata):
+    """
+    Provider that built a collection, so queries are embedded the same way.
+
+    Args:
+        metadata (dict or None): Collection metadata
+
+    Returns:
+        Embedding provider recorded in the metadata, or the legacy OpenAI one
+    """
+    if not metadata or "embedding_provider" not in metadata:
+        metadata = LEGACY_EMBEDDING_METADATA
+    return get_embedding_provider(metadata["embedding_provider"], metadata.get("embedding_model"),
+                                  metadata.get("embedding_dimensions"))
+
+
+def get_embeddings(text, provider=None):
+    """
+    Create embeddings for given text.
+
     Args:
         text (str): Text to create embeddings for
-        
+        provider (optional): Embedding provider, defaults to the configured one
+
     Returns:
         list or None: Embedding vector or None if error
     """
+    embeddings = get_embeddings_batch([text], provider)
+    return embeddings[0] if embeddings else None
+
+def get_embeddings_batch(texts, provider=None):
+    """
+    Create embeddings for several texts with a single provider call.
+
+    Args:
+        texts (list): Texts to create embeddings for
+        provider (optional): Embedding provider, defaults to the configured one
+
+    Returns:
+        list or None: Embedding vectors in the same order as texts, or None if error
+    """
     try:
-        client = get_openai_client()
-        response = client.embeddings.create(
-            input=text,
-            model="text-embedding-3-small"
-        )
-        return response.data[0].embedding
+        return (provider or get_embedding_provider()).embed(texts)
     except Exception as e:
         st.error(f"Error creating embeddings: {str(e)}")
-        return None
\ No newline at end of file
+        return None
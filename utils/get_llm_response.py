@@ -1,16 +1,46 @@
+import os
+import threading
 import streamlit as st
 from openai import OpenAI
+from utils.single_flight import single_flight, make_fingerprint
+from utils.model_policy import create_chat_completion
+
+# One pooled client per API key, shared by all sessions and workers in the process
+_openai_clients = {}
+_openai_clients_lock = threading.Lock()
+
+def _get_setting(name):
+    """Read a setting from Streamlit secrets, falling back to the environment."""
+    try:
+        if name in st.secrets:
+            return st.secrets[name]
+    except Exception:
+        pass
+    return os.environ.get(name)
 
 def get_openai_client():
     """
     Get OpenAI client with API key from Streamlit secrets.
     
+    The client (and its HTTP connection pool) is created once per process
+    and reused by every caller. OPENAI_BASE_URL (secret or environment
+    variable) points the client at another OpenAI-compatible endpoint, such
+    as scripts/stub_openai_server.py; no real API key is needed then.
+    
     Returns:
         OpenAI: OpenAI client instance
     """
     try:
-        api_key = st.secrets["OPENAI_API_KEY"]
-        return OpenAI(api_key=api_key)
+        base_url = _get_setting("OPENAI_BASE_URL")
+        api_key = _get_setting("OPENAI_API_KEY") or ("stub" if base_url else None)
+        if api_key is None:
+            raise KeyError("OPENAI_API_KEY is not set")
+        with _openai_clients_lock:
+            client = _openai_clients.get((api_key, base_url))
+            if client is None:
+                client = OpenAI(api_key=api_key, base_url=base_url)
+                _openai_clients[(api_key, base_url)] = client
+        return client
     except Exception as e:
         st.error(f"Error initializing OpenAI client: {str(e)}")
         return None
@@ -20,35 +50,37 @@ def get_llm_response(prompt):
     Get response from OpenAI LLM using the provided prompt.
     
     Args:
-        prompt (str): The prompt to send to the LLM
+        prompt (str or list): The prompt to send to the LLM, or chat messages
+                              (e.g. from a PromptTemplate) whose last message holds the request
         
     Returns:
         str: The LLM response or fallback response if API fails
     """
+    messages = prompt if isinstance(prompt, list) else [{"role": "user", "content": prompt}]
     client = get_openai_client()
     
     if client is None:
         print("OpenAI client is not available")
         # Fallback to keyword-based routing if OpenAI is not available
-        return _fallback_routing(prompt)
+        return _fallback_routing(messages[-1]["content"])
     
-    try:    
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{
-                "role": "user",
-                "content": prompt
-            }],
-            max_tokens=10,
+    def request():
+        response = create_chat_completion(
+            client, "Router", "route",
+            messages=messages,
             temperature=0
         )
         return response.choices[0].message.content.strip()
+
+    try:
+        # Identical prompts already in flight in other sessions share one call
+        return single_flight("llm", make_fingerprint("Router", "route", messages, 0), request)
         
     except Exception as e:
         st.error(f"Error getting LLM response: {str(e)}")
         # Fallback to keyword-based routing
         print("Fallback to keyword-based routing")
-        return _fallback_routing(prompt)
+        return _fallback_routing(messages[-1]["content"])
 
 def _fallback_routing(prompt):
     """
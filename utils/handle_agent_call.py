@@ -3,14 +3,16 @@ from agents.rag_writer_agent import rag_writer_agent
 from agents.seo_agent import seo_agent
 from agents.research_agent import research_agent
 
-def handle_agent_call(agent_name, user_input, uploaded_files=None):
+AGENT_NAMES = ("PlanerAgent", "RagWriterAgent", "SeoAgent", "ResearchAgent")
+
+def handle_agent_call(agent_name, user_input, uploaded_files=None, conversation=None):
     match agent_name:
         case "PlanerAgent":
-            response = planner_agent(user_input)
+            response = planner_agent(user_input, conversation)
             return response
         case "RagWriterAgent":
-            return rag_writer_agent(user_input, uploaded_files)
+            return rag_writer_agent(user_input, uploaded_files, conversation)
         case "SeoAgent":
-            return seo_agent(user_input)
+            return seo_agent(user_input, conversation)
         case "ResearchAgent":
-            return research_agent(user_input)
\ No newline at end of file
+            return research_agent(user_input, conversation)
\ No newline at end of file
@@ -3,28 +3,38 @@ import streamlit as st
 import chromadb
 from chromadb.config import Settings
 import os
+import threading
+from utils.ingestion_manifest import remove_manifests
+from utils.dedupe_chunks import forget_collection_signatures
+from utils.retrieval_cache import bump_collection_version
 
 
-def clear_chroma_db(collection_name=None):
+# One client per persist directory, shared by all sessions in the process
+_chroma_clients = {}
+_chroma_clients_lock = threading.Lock()
+
+
+def get_chroma_client(persist_directory="./chrome_store"):
     """
-    Clear all documents from ChromaDB collection(s).
-    
+    Get the shared ChromaDB client for a persist directory.
+
     Args:
-        collection_name (str, optional): Name of specific collection to clear.
-                                       If None, clears all collections.
-        
+        persist_directory (str): Directory to persist ChromaDB data
+
     Returns:
-        bool: True if successful, False otherwise
+        ClientAPI: Persistent client, or an in-memory client if persistent storage fails
     """
-    try:
-        persist_directory = "./chrome_store"
-        
+    with _chroma_clients_lock:
+        chroma_client = _chroma_clients.get(persist_directory)
+        if chroma_client is not None:
+            return chroma_client
+
         # Try to create the directory if it doesn't exist
         try:
             os.makedirs(persist_directory, exist_ok=True)
         except:
             pass
-        
+
         # Use more compatible ChromaDB configuration
         try:
             chroma_client = chromadb.PersistentClient(path=persist_directory)
@@ -32,21 +42,60 @@ def clear_chroma_db(collection_name=None):
             # Fallback to in-memory client if persistent storage fails
             print(f"Warning: Persistent storage failed, using in-memory client: {e}")
             chroma_client = chromadb.Client()
-        
+
+        _chroma_clients[persist_directory] = chroma_client
+        return chroma_client
+
+
+def drop_collection(collection_name, persist_directory="./chrome_store"):
+    """
+    Drop a collection without reading its contents.
+
+    Unlike fetching every id and deleting them one by one, this removes the
+    collection and its segments in a single call, so memory use does not
+    depend on the collection size and no empty collection is left behind.
+    Its near-duplicate signatures are removed too, so no later ingestion
+    tries to reuse embeddings that no longer exist.
+
+    Args:
+        collection_name (str): Name of the collection to drop
+        persist_directory (str): Directory to persist ChromaDB data
+
+    Returns:
+        bool: True if the collection was dropped, False if it did not exist
+    """
+    try:
+        get_chroma_client(persist_directory).delete_collection(name=collection_name)
+        print(f"🗑️ Dropped ChromaDB collection '{collection_name}'")
+        return True
+    except Exception:
+        print(f"📭 ChromaDB collection '{collection_name}' not found or already dropped")
+        return False
+    finally:
+        forget_collection_signatures(collection_name)
+        # Bumped after the write, so a retrieval racing the drop is keyed to the old version
+        bump_collection_version(collection_name)
+
+
+def clear_chroma_db(collection_name=None):
+    """
+    Clear all documents from ChromaDB collection(s).
+
+    Args:
+        collection_name (str, optional): Name of specific collection to clear.
+                                       If None, clears all collections.
+
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    try:
+        chroma_client = get_chroma_client()
+
         if collection_name:
-            # Clear specific collection
-            try:
-                collection = chroma_client.get_collection(name=collection_name)
-                all_items = collection.get()
-                if all_items['ids']:
-                    collection.delete(ids=all_items['ids'])
-                    print(f"🗑️ Cleared ChromaDB collection '{collection_name}'")
-                else:
-                    print(f"📭 ChromaDB collection '{collection_name}' was already empty")
-                return True
-            except Exception as e:
-                print(f"Collection '{collection_name}' not found or already cleared")
-                return True
+            # Drop specific collection; a missing collection counts as cleared
+            drop_collection(collection_name)
+            remove_manifests(collection_name)
+            return True
         else:
             # Clear all collections
             try:
@@ -54,6 +103,9 @@ def clear_chroma_db(collection_name=None):
                 if collections:
                     for collection in collections:
                         chroma_client.delete_collection(name=collection.name)
+                        bump_collection_version(collection.name)
+                        remove_manifests(collection.name)
+                        forget_collection_signatures(collection.name)
                         print(f"🗑️ Deleted ChromaDB collection '{collection.name}'")
                 else:
                     print("📭 No ChromaDB collections found")
@@ -61,7 +113,7 @@ def clear_chroma_db(collection_name=None):
             except Exception as e:
                 print(f"Error clearing all collections: {str(e)}")
                 return False
-        
+
     except Exception as e:
         st.error(f"Error clearing ChromaDB: {str(e)}")
         return False
@@ -70,32 +122,19 @@ def clear_chroma_db(collection_name=None):
 def get_chroma_collection(collection_name, persist_directory="./chrome_store"):
     """
     Get or create a ChromaDB collection.
-    
+
     Args:
         collection_name (str): Name of the collection
         persist_directory (str): Directory to persist ChromaDB data
-        
+
     Returns:
         Collection or None: ChromaDB collection or None if error
     """
     print(f"Collection name: {collection_name}")
     try:
-        # Try to create the directory if it doesn't exist
-        try:
-            os.makedirs(persist_directory, exist_ok=True)
-        except:
-            pass
-        
-        # Use more compatible ChromaDB configuration
-        try:
-            chroma_client = chromadb.PersistentClient(path=persist_directory)
-        except Exception as e:
-            # Fallback to in-memory client if persistent storage fails
-            print(f"Warning: Persistent storage failed, using in-memory client: {e}")
-            chroma_client = chromadb.Client()
-        
+        chroma_client = get_chroma_client(persist_directory)
         collection = chroma_client.get_or_create_collection(name=collection_name)
         return collection
     except Exception as e:
         st.error(f"Error accessing ChromaDB collection: {str(e)}")
-        return None
\ No newline at end of file
+        return None
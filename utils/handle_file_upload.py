@@ -1,52 +1,420 @@
+import hashlib
+import queue
+import threading
 import streamlit as st
-from utils.get_embeddings import get_embeddings
+from utils.get_embeddings import (
+    get_embeddings_batch, get_embedding_provider, get_collection_embedding_provider, embedding_metadata
+)
 from utils.get_chunks import get_chunks
-from utils.handle_chroma_db import get_chroma_collection
-from utils.sanitize_collection_name import sanitize_collection_name
+from utils.handle_chroma_db import get_chroma_client, get_chroma_collection, drop_collection
+from utils.sanitize_collection_name import get_collection_name
+from utils.extract_pdf_content import load_document_text
+from utils.ingestion_manifest import load_manifest, save_manifest, list_manifests, remove_manifests
+from utils.thread_context import with_script_run_ctx
+from utils.retrieval_cache import bump_collection_version
+from utils.dedupe_chunks import (
+    find_near_duplicates, register_chunk_signatures, record_dedupe_savings, is_near_duplicate
+)
 
-def handle_file_upload(uploaded_file):
+# Ingestion pipeline settings
+CHUNK_SIZE = 50
+EMBEDDING_BATCH_SIZE = 32
+EMBEDDING_WORKERS = 2
+QUEUE_SIZE = 4
+
+_DONE = object()
+
+
+def handle_file_upload(uploaded_file, cancel_event=None):
     """
-    Process uploaded file and store it in ChromaDB.
-    
+    Process uploaded file and store it in its content-addressed ChromaDB collection.
+
+    Chunking, embedding and writing run as pipelined stages connected by
+    bounded queues. After each batch is written, progress is checkpointed in a
+    manifest, so an interrupted ingestion resumes from the last committed
+    batch instead of re-embedding the whole document. Batches are committed in
+    page order and are searchable as soon as they are written.
+
     Args:
-        uploaded_file (dict): Document dictionary containing file info and content
-        
+        uploaded_file (dict): Document dictionary containing file info and either
+                              the content or a 'text_path' to it
+        cancel_event (threading.Event, optional): Stops the ingestion after the
+                                                  current batch when set
+
     Returns:
         bool: True if successful, False otherwise
     """
     try:
         # Extract information from the document dictionary
-        collection_name = sanitize_collection_name(uploaded_file['name'])
-        content = uploaded_file['content']
-        
+        content = load_document_text(uploaded_file)
+
         # Check if content is valid
         if not content or content.startswith("Error") or content == "No text content found in PDF":
-            st.warning(f"Skipping {collection_name} - no valid content to process")
+            st.warning(f"Skipping {uploaded_file['name']} - no valid content to process")
             return False
-        
+
+        # Documents are stored by content hash, so every name for the same file shares one collection
+        document_id = uploaded_file.get('id') or hashlib.sha256(content.encode('utf-8')).hexdigest()
+        collection_name = get_collection_name({**uploaded_file, 'id': document_id})
+
         # Process the content into chunks
-        knowledge_chunks = get_chunks(content, chunk_size=50)
+        knowledge_chunks = get_chunks(content, chunk_size=CHUNK_SIZE)
+
+        manifest = _start_or_resume_manifest(collection_name, document_id, len(knowledge_chunks))
 
         # Get ChromaDB collection (remove file extension from collection name)
         collection = get_chroma_collection(collection_name=collection_name)
         if not collection:
             return False
 
-        # Process chunks and add to ChromaDB
-        successful_chunks = 0
-        for i, chunk in enumerate(knowledge_chunks):
-            embedding = get_embeddings(chunk)
-            if embedding:  # Only add if embedding was successful
-                collection.add(
-                    ids=[f"chunk-{i+1}"],
-                    documents=[chunk],    
-                    embeddings=[embedding]
-                )
-                successful_chunks += 1
-        
-        print(f"Processed {successful_chunks}/{len(knowledge_chunks)} chunks for ChromaDB")
-        return successful_chunks > 0
-        
+        # A new collection records the configured provider; an existing one keeps
+        # the provider it was built with, so all its vectors stay comparable
+        if not (collection.metadata or {}).get('embedding_provider') and collection.count() == 0:
+            collection.modify(metadata={**(collection.metadata or {}),
+                                        **embedding_metadata(get_embedding_provider())})
+        provider = get_collection_embedding_provider(collection.metadata)
+
+        # A checkpoint is only trusted if the collection still holds its chunks
+        if collection.count() < manifest.get('stored_chunks', manifest['committed_chunks']):
+            manifest.update({'committed_batches': 0, 'committed_chunks': 0, 'stored_chunks': 0,
+                             'status': 'in_progress'})
+        if manifest['status'] == 'complete':
+            print(f"✅ {collection_name} already fully indexed ({manifest['committed_chunks']} chunks)")
+            return True
+        if manifest['committed_batches']:
+            print(f"↩️ Resuming {collection_name} from batch {manifest['committed_batches'] + 1}")
+
+        # Near-duplicate chunks are skipped or reuse an existing embedding
+        signatures, dedupe_plan = find_near_duplicates(knowledge_chunks, collection_name)
+
+        completed = run_ingestion_pipeline(collection, knowledge_chunks, manifest, cancel_event,
+                                           signatures=signatures, dedupe_plan=dedupe_plan, provider=provider)
+
+        print(f"Processed {manifest['committed_chunks']}/{len(knowledge_chunks)} chunks for ChromaDB")
+        if completed and 'dedupe' in manifest:
+            dedupe = manifest['dedupe']
+            print(f"♻️ Near-duplicates: {dedupe['skipped']} skipped, {dedupe['reused']} reused embeddings, "
+                  f"{dedupe['embedding_calls_saved']} embedding inputs and "
+                  f"{dedupe['index_bytes_saved'] / 1024:.1f} KB of index saved")
+        return completed
+
     except Exception as e:
         st.error(f"Error processing documents for ChromaDB: {str(e)}")
-        return False
\ No newline at end of file
+        return False
+
+
+def _start_or_resume_manifest(collection_name, document_id, total_chunks):
+    """
+    Load the checkpoint for this document, or start a new one.
+
+    Checkpoints of other documents previously indexed under the same
+    collection name are discarded together with the collection, so chunks of
+    an older file never mix with the new one.
+
+    Args:
+        collection_name (str): ChromaDB collection name
+        document_id (str): Content hash of the document
+        total_chunks (int): Number of chunks in the document
+
+    Returns:
+        dict: Ingestion manifest
+    """
+    manifest = load_manifest(collection_name, document_id)
+    if manifest and manifest['total_chunks'] == total_chunks and \
+       manifest['batch_size'] == EMBEDDING_BATCH_SIZE and manifest['chunk_size'] == CHUNK_SIZE:
+        return manifest
+
+    if any(m['document_id'] != document_id for m in list_manifests(collection_name)):
+        drop_collection(collection_name)
+        remove_manifests(collection_name)
+
+    manifest = {
+        'collection': collection_name,
+        'document_id': document_id,
+        'chunk_size': CHUNK_SIZE,
+        'batch_size': EMBEDDING_BATCH_SIZE,
+        'total_chunks': total_chunks,
+        'committed_batches': 0,
+        'committed_chunks': 0,
+        'stored_chunks': 0,
+        'status': 'in_progress'
+    }
+    save_manifest(manifest)
+    return manifest
+
+
+def chunk_id(document_id, index):
+    """Stable id of the index-th chunk (0-based) of a document."""
+    return f"{document_id[:16]}-chunk-{index + 1}"
+
+
+def run_ingestion_pipeline(collection, chunks, manifest, cancel_event=None, signatures=None, dedupe_plan=None,
+                           provider=None):
+    """
+    Embed and write the uncommitted batches of a document.
+
+    A producer thread feeds batches into a bounded queue, embedding workers
+    turn them into vectors, and the calling thread writes them to the
+    collection in batch order, checkpointing the manifest after each write.
+    Full queues make faster stages wait for slower ones.
+
+    Args:
+        collection (Collection): Target ChromaDB collection
+        chunks (list): All chunks of the document
+        manifest (dict): Ingestion manifest, updated in place
+        cancel_event (threading.Event, optional): Stops the pipeline when set
+        signatures (list, optional): SimHash signature of every chunk
+        dedupe_plan (list, optional): Per-chunk decision from find_near_duplicates()
+        provider (optional): Embedding provider, defaults to the one recorded on the collection
+
+    Returns:
+        bool: True if every batch was committed
+    """
+    batch_size = manifest['batch_size']
+    total_batches = (len(chunks) + batch_size - 1) // batch_size
+    dedupe_plan = dedupe_plan or [None] * len(chunks)
+    provider = provider or get_collection_embedding_provider(collection.metadata)
+    embed_queue = queue.Queue(maxsize=QUEUE_SIZE)
+    write_queue = queue.Queue(maxsize=QUEUE_SIZE)
+    stop = threading.Event()
+    embedding_dimensions = [0]
+
+    def put(target_queue, item):
+        # Give up instead of blocking forever once the pipeline is stopping
+        while not stop.is_set():
+            try:
+                target_queue.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def produce_batches():
+        for batch_index in range(manifest['committed_batches'], total_batches):
+            start = batch_index * batch_size
+            end = min(start + batch_size, len(chunks))
+            # Chunks repeating an earlier chunk of this document are never embedded or stored
+            indices = [i for i in range(start, end) if not (dedupe_plan[i] and dedupe_plan[i][0] == 'skip')]
+            put(embed_queue, (batch_index, end - start, indices))
+        for _ in range(EMBEDDING_WORKERS):
+            put(embed_queue, _DONE)
+
+    def embed_batches():
+        while not stop.is_set():
+            try:
+                item = embed_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if item is _DONE:
+                break
+            batch_index, processed, indices = item
+            embeddings = _embed_with_reuse(chunks, indices, dedupe_plan, provider)
+            if embeddings:
+                embedding_dimensions[0] = len(embeddings[0])
+            put(write_queue, (batch_index, processed, indices, embeddings))
+        put(write_queue, _DONE)
+
+    threads = [threading.Thread(target=with_script_run_ctx(produce_batches), daemon=True)]
+    threads += [threading.Thread(target=with_script_run_ctx(embed_batches), daemon=True)
+                for _ in range(EMBEDDING_WORKERS)]
+    for thread in threads:
+        thread.start()
+
+    # Writer stage: commit strictly in batch order so the checkpoint is a prefix
+    pending = {}
+    finished_workers = 0
+    try:
+        while finished_workers < EMBEDDING_WORKERS:
+            try:
+                item = write_queue.get(timeout=0.5)
+            except queue.Empty:
+                if stop.is_set() and not any(thread.is_alive() for thread in threads[1:]):
+                    break
+                continue
+            if item is _DONE:
+                finished_workers += 1
+                continue
+            batch_index, processed, indices, embeddings = item
+            pending[batch_index] = (processed, indices, embeddings)
+
+            if cancel_event is not None and cancel_event.is_set():
+                print(f"⏹️ Ingestion of {manifest['collection']} cancelled")
+                stop.set()
+
+            while manifest['committed_batches'] in pending and not stop.is_set():
+                processed, indices, embeddings = pending.pop(manifest['committed_batches'])
+                if indices and not embeddings:
+                    print(f"❌ Embedding failed for batch {manifest['committed_batches'] + 1}/{total_batches}")
+                    stop.set()
+                    break
+                if indices:
+                    ids = [chunk_id(manifest['document_id'], i) for i in indices]
+                    collection.upsert(ids=ids, documents=[chunks[i] for i in indices], embeddings=embeddings)
+                    # Documents are queryable while indexing, so every batch changes retrieval results
+                    bump_collection_version(manifest['collection'])
+                    if signatures:
+                        register_chunk_signatures(manifest['collection'],
+                                                  {ids[n]: signatures[i] for n, i in enumerate(indices)})
+                manifest['committed_batches'] += 1
+                manifest['committed_chunks'] += processed
+                manifest['stored_chunks'] = manifest.get('stored_chunks', 0) + len(indices)
+                save_manifest(manifest)
+    finally:
+        # Lets the producer and workers exit if the writer stopped early
+        stop.set()
+
+    completed = manifest['committed_batches'] == total_batches
+    if completed:
+        manifest['status'] = 'complete'
+        manifest['dedupe'] = record_dedupe_savings(chunks, dedupe_plan, embedding_dimensions[0])
+        save_manifest(manifest)
+    return completed
+
+
+def _embed_with_reuse(chunks, indices, dedupe_plan, provider=None):
+    """
+    Embed chunks, reusing stored embeddings of near-duplicates from other collections.
+
+    Only collections built with the same provider, model and dimensions can
+    lend their embeddings, and only after the stored chunk text was compared
+    with the new chunk; other candidates are embedded again and their plan
+    entry is reset, so the savings report counts real reuse only.
+
+    Args:
+        chunks (list): All chunks of the document
+        indices (list): Indices of the chunks to embed, in order
+        dedupe_plan (list): Per-chunk decision from find_near_duplicates()
+        provider (optional): Embedding provider, defaults to the configured one
+
+    Returns:
+        list or None: Embeddings in the order of indices, None if embedding failed
+    """
+    if not indices:
+        return []
+    provider = provider or get_embedding_provider()
+    embeddings = {}
+
+    reuse_by_collection = {}
+    for i in indices:
+        if dedupe_plan[i] and dedupe_plan[i][0] == 'reuse':
+            _, source_collection, source_id = dedupe_plan[i]
+            reuse_by_collection.setdefault(source_collection, []).append((i, source_id))
+    for source_collection, refs in reuse_by_collection.items():
+        try:
+            # get_collection, not get_or_create: a dropped source must not come back empty
+            source = get_chroma_client().get_collection(source_collection)
+            if embedding_metadata(get_collection_embedding_provider(source.metadata)) != embedding_metadata(provider):
+                continue
+            stored = source.get(
+                ids=[source_id for _, source_id in refs], include=['embeddings', 'documents']
+            )
+            by_id = {source_id: (embedding, document) for source_id, embedding, document
+                     in zip(stored['ids'], stored['embeddings'], stored['documents'])}
+            for i, source_id in refs:
+                if source_id in by_id and is_near_duplicate(chunks[i], by_id[source_id][1] or ""):
+                    embeddings[i] = list(by_id[source_id][0])
+        except Exception as e:
+            # The source may have been dropped meanwhile; embed the chunks instead
+            print(f"Could not reuse embeddings from {source_collection}: {e}")
+
+    for i in indices:
+        if i not in embeddings and dedupe_plan[i] and dedupe_plan[i][0] == 'reuse':
+            dedupe_plan[i] = None
+
+    missing = [i for i in indices if i not in embeddings]
+    if missing:
+        fresh = get_embeddings_batch([chunks[i] for i in missing], provider)
+        if not fresh:
+            return None
+        embeddings.update(zip(missing, fresh))
+    return [embeddings[i] for i in indices]
+
+
+# Background ingestions by collection name, shared by all sessions
+_background_ingestions = {}
+_background_ingestions_lock = threading.Lock()
+
+
+def start_background_ingestion(uploaded_file):
+    """
+    Index a document on a background thread so it can be queried while indexing.
+
+    Args:
+        uploaded_file (dict): Document dictionary as accepted by handle_file_upload(), with its 'id'
+
+    Returns:
+        bool: True if an ingestion was started, False if one is already running
+              (possibly for another session that uploaded the same file)
+    """
+    collection_name = get_collection_name(uploaded_file)
+    with _background_ingestions_lock:
+        running = _background_ingestions.get(collection_name)
+        if running and running['thread'].is_alive():
+            return False
+        cancel_event = threading.Event()
+        thread = threading.Thread(
+            target=handle_file_upload,
+            args=(uploaded_file, cancel_event),
+            name=f"ingest-{collection_name}",
+            daemon=True
+        )
+        _background_ingestions[collection_name] = {'thread': thread, 'cancel': cancel_event}
+        thread.start()
+    return True
+
+
+def cancel_background_ingestion(collection_name):
+    """
+    Ask a running background ingestion to stop after its current batch.
+
+    Args:
+        collection_name (str): ChromaDB collection name
+
+    Returns:
+        bool: True if a running ingestion was signalled
+    """
+    with _background_ingestions_lock:
+        running = _background_ingestions.get(collection_name)
+    if not running or not running['thread'].is_alive():
+        return False
+    running['cancel'].set()
+    running['thread'].join(timeout=5)
+    return True
+
+
+def get_ingestion_progress(uploaded_file):
+    """
+    Report how much of a document is indexed and searchable.
+
+    Args:
+        uploaded_file (dict): Document descriptor with 'name' and, ideally, 'id'
+
+    Returns:
+        dict: {'status': 'complete' | 'indexing' | 'interrupted',
+               'indexed_chunks': int, 'total_chunks': int, 'fraction': float}
+    """
+    collection_name = get_collection_name(uploaded_file)
+    if uploaded_file.get('id'):
+        manifest = load_manifest(collection_name, uploaded_file['id'])
+    else:
+        manifests = sorted(list_manifests(collection_name), key=lambda m: m.get('updated_at', 0))
+        manifest = manifests[-1] if manifests else None
+
+    with _background_ingestions_lock:
+        running = _background_ingestions.get(collection_name)
+    is_running = bool(running and running['thread'].is_alive())
+
+    if not manifest:
+        status = 'indexing' if is_running else 'interrupted'
+        return {'status': status, 'indexed_chunks': 0, 'total_chunks': 0, 'fraction': 0.0}
+
+    total = manifest['total_chunks']
+    if manifest['status'] == 'complete':
+        status = 'complete'
+    else:
+        status = 'indexing' if is_running else 'interrupted'
+    return {
+        'status': status,
+        'indexed_chunks': manifest['committed_chunks'],
+        'total_chunks': total,
+        'fraction': manifest['committed_chunks'] / total if total else 1.0
+    }
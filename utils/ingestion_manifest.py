@@ -0,0 +1,102 @@
+import os
+import json
+import glob
+import time
+import threading
+
+
+# One small JSON checkpoint per (collection, document) ingestion
+MANIFEST_DIR = "./ingest_manifests"
+
+
+def manifest_path(collection_name, document_id, manifest_dir=MANIFEST_DIR):
+    """
+    Path of the checkpoint file for a document's ingestion.
+
+    Args:
+        collection_name (str): ChromaDB collection the document is indexed into
+        document_id (str): Content hash of the document
+        manifest_dir (str): Directory holding the manifests
+
+    Returns:
+        str: Manifest file path
+    """
+    return os.path.join(manifest_dir, f"{collection_name}--{document_id[:16]}.json")
+
+
+def load_manifest(collection_name, document_id, manifest_dir=MANIFEST_DIR):
+    """
+    Load the ingestion checkpoint of a document.
+
+    Args:
+        collection_name (str): ChromaDB collection name
+        document_id (str): Content hash of the document
+        manifest_dir (str): Directory holding the manifests
+
+    Returns:
+        dict or None: Manifest, or None if there is no (readable) checkpoint
+    """
+    try:
+        with open(manifest_path(collection_name, document_id, manifest_dir), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def save_manifest(manifest, manifest_dir=MANIFEST_DIR):
+    """
+    Atomically write an ingestion checkpoint.
+
+    Args:
+        manifest (dict): Manifest with at least 'collection' and 'document_id'
+        manifest_dir (str): Directory holding the manifests
+    """
+    manifest["updated_at"] = time.time()
+    path = manifest_path(manifest["collection"], manifest["document_id"], manifest_dir)
+    os.makedirs(manifest_dir, exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(temp_path, path)
+
+
+def list_manifests(collection_name, manifest_dir=MANIFEST_DIR):
+    """
+    Load every ingestion checkpoint recorded for a collection.
+
+    Args:
+        collection_name (str): ChromaDB collection name
+        manifest_dir (str): Directory holding the manifests
+
+    Returns:
+        list: Manifests (dicts)
+    """
+    manifests = []
+    for path in glob.glob(os.path.join(glob.escape(manifest_dir), f"{glob.escape(collection_name)}--*.json")):
+        try:
+            with open(path, encoding="utf-8") as f:
+                manifests.append(json.load(f))
+        except (OSError, json.JSONDecodeError):
+            continue
+    return manifests
+
+
+def remove_manifests(collection_name, manifest_dir=MANIFEST_DIR):
+    """
+    Delete every ingestion checkpoint of a collection (e.g. after it is dropped).
+
+    Args:
+        collection_name (str): ChromaDB collection name
+        manifest_dir (str): Directory holding the manifests
+
+    Returns:
+        int: Number of manifests removed
+    """
+    removed = 0
+    for path in glob.glob(os.path.join(glob.escape(manifest_dir), f"{glob.escape(collection_name)}--*.json")):
+        try:
+            os.remove(path)
+            removed += 1
+        except OSError:
+            pass
+    return removed
@@ -0,0 +1,258 @@
+import os
+import json
+import time
+import numpy as np
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+from utils.handle_chroma_db import get_chroma_client, drop_collection
+from utils.ingestion_manifest import list_manifests, save_manifest, remove_manifests
+from utils.dedupe_chunks import simhash, register_chunk_signatures
+from utils.retrieval_cache import bump_collection_version
+
+
+SNAPSHOT_FORMAT_VERSION = 1
+# Rows read from ChromaDB per export batch and written per import batch
+EXPORT_BATCH_SIZE = 5000
+IMPORT_BATCH_SIZE = 5000
+# Files ending in these are written as Arrow IPC; anything else as Parquet
+ARROW_EXTENSIONS = (".arrow", ".feather", ".ipc")
+
+SNAPSHOT_SCHEMA = pa.schema([
+    ("collection", pa.string()),
+    ("id", pa.string()),
+    ("document", pa.string()),
+    ("embedding", pa.list_(pa.float32())),
+    ("metadata", pa.string()),
+])
+
+
+def _is_arrow(path):
+    return path.lower().endswith(ARROW_EXTENSIONS)
+
+
+def _embedding_array(embeddings, count):
+    """Build a list<float32> column from a (count, dimensions) matrix without per-row Python lists."""
+    matrix = np.asarray(embeddings, dtype=np.float32).reshape(count, -1)
+    offsets = np.arange(count + 1, dtype=np.int32) * matrix.shape[1]
+    return pa.ListArray.from_arrays(pa.array(offsets), pa.array(matrix.ravel()))
+
+
+def export_snapshot(path, collection_names=None, persist_directory="./chrome_store", batch_size=EXPORT_BATCH_SIZE):
+    """
+    Export collections with their embeddings to a Parquet or Arrow file.
+
+    Rows hold the chunk id, text, embedding and metadata of every chunk. The
+    file's schema metadata keeps each collection's metadata (embedding
+    provider and dimensions) and ingestion manifests, so an imported
+    collection is queried with the right provider and a re-upload of the same
+    document is recognised as already indexed. Collections are read and
+    written batch by batch, so memory use does not depend on their size.
+
+    Args:
+        path (str): Output file; '.arrow', '.feather' or '.ipc' writes Arrow IPC, otherwise Parquet
+        collection_names (list, optional): Collections to export, defaults to all
+        persist_directory (str): ChromaDB persist directory
+        batch_size (int): Rows read from ChromaDB at a time
+
+    Returns:
+        dict: {'path', 'collections': {name: rows}, 'rows', 'bytes', 'seconds'}
+    """
+    started = time.perf_counter()
+    client = get_chroma_client(persist_directory)
+    if collection_names is None:
+        collection_names = sorted(collection.name for collection in client.list_collections())
+    collections = [client.get_collection(name) for name in collection_names]
+
+    header = {
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "created_at": time.time(),
+        "collections": {
+            collection.name: {
+                "metadata": collection.metadata or {},
+                "count": collection.count(),
+                "manifests": list_manifests(collection.name)
+            }
+            for collection in collections
+        }
+    }
+    schema = SNAPSHOT_SCHEMA.with_metadata({"kb_snapshot": json.dumps(header)})
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    if _is_arrow(path):
+        writer = ipc.new_file(temporary_path, schema)
+    else:
+        writer = pq.ParquetWriter(temporary_path, schema, compression="zstd")
+
+    exported = {}
+    try:
+        for collection in collections:
+            exported[collection.name] = 0
+            offset = 0
+            while True:
+                rows = collection.get(limit=batch_size, offset=offset,
+                                      include=["documents", "embeddings", "metadatas"])
+                count = len(rows["ids"])
+                if not count:
+                    break
+                metadatas = rows.get("metadatas") or [None] * count
+                batch = pa.record_batch([
+                    pa.array([collection.name] * count, pa.string()),
+                    pa.array(rows["ids"], pa.string()),
+                    pa.array(rows["documents"], pa.string()),
+                    _embedding_array(rows["embeddings"], count),
+                    pa.array([json.dumps(m) if m else None for m in metadatas], pa.string()),
+                ], schema=schema)
+                writer.write_batch(batch)
+                exported[collection.name] += count
+                offset += count
+                if count < batch_size:
+                    break
+        writer.close()
+        os.replace(temporary_path, path)
+    except BaseException:
+        writer.close()
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
+
+    result = {
+        "path": path,
+        "collections": exported,
+        "rows": sum(exported.values()),
+        "bytes": os.path.getsize(path),
+        "seconds": time.perf_counter() - started
+    }
+    print(f"📦 Exported {result['rows']} chunks from {len(exported)} collection(s) to {path} "
+          f"({result['bytes'] / (1024 * 1024):.1f} MB) in {result['seconds']:.1f}s")
+    return result
+
+
+def read_snapshot_header(path):
+    """
+    Read the collection list of a snapshot without reading its rows.
+
+    Args:
+        path (str): Snapshot file
+
+    Returns:
+        dict: {'format_version', 'created_at', 'collections': {name: {'metadata', 'count', 'manifests'}}}
+    """
+    if _is_arrow(path):
+        with pa.memory_map(path) as source:
+            schema = ipc.open_file(source).schema
+    else:
+        schema = pq.read_schema(path)
+    raw = (schema.metadata or {}).get(b"kb_snapshot")
+    if raw is None:
+        raise ValueError(f"{path} is not a knowledge-base snapshot")
+    header = json.loads(raw)
+    if header.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot format version {header.get('format_version')}")
+    return header
+
+
+def _iter_batches(path, batch_size):
+    if _is_arrow(path):
+        with pa.memory_map(path) as source:
+            reader = ipc.open_file(source)
+            for index in range(reader.num_record_batches):
+                yield reader.get_batch(index)
+    else:
+        yield from pq.ParquetFile(path).iter_batches(batch_size=batch_size)
+
+
+def import_snapshot(path, persist_directory="./chrome_store", collection_names=None, replace=False,
+                    batch_size=IMPORT_BATCH_SIZE):
+    """
+    Bulk-load a snapshot written by export_snapshot() into a ChromaDB store.
+
+    Embeddings are written as stored, without any embedding calls. Existing
+    collections are extended (rows with the same id are overwritten) unless
+    replace is set, in which case they are dropped first. Ingestion manifests
+    and near-duplicate signatures are restored with the rows. Run it while the
+    app is stopped, since ChromaDB does not coordinate writers across processes.
+
+    Args:
+        path (str): Snapshot file
+        persist_directory (str): ChromaDB persist directory
+        collection_names (list, optional): Collections to import, defaults to all in the snapshot
+        replace (bool): Drop existing collections of the same name first
+        batch_size (int): Rows written per upsert (capped at the client's maximum batch size)
+
+    Returns:
+        dict: {'collections': {name: rows}, 'rows', 'seconds'}
+    """
+    started = time.perf_counter()
+    header = read_snapshot_header(path)
+    selected = set(collection_names if collection_names is not None else header["collections"])
+    client = get_chroma_client(persist_directory)
+    batch_size = min(batch_size, client.get_max_batch_size())
+
+    collections = {}
+    for name in selected:
+        info = header["collections"].get(name)
+        if info is None:
+            raise ValueError(f"Collection '{name}' is not in snapshot {path}")
+        if replace:
+            drop_collection(name, persist_directory)
+            remove_manifests(name)
+        collections[name] = client.get_or_create_collection(name, metadata=info["metadata"] or None)
+
+    imported = {name: 0 for name in selected}
+    for batch in _iter_batches(path, batch_size):
+        names = batch.column("collection").to_numpy(zero_copy_only=False)
+        # Rows are grouped by collection; split the batch at every change of collection
+        boundaries = [0] + [i for i in range(1, len(names)) if names[i] != names[i - 1]] + [len(names)]
+        for start, end in zip(boundaries, boundaries[1:]):
+            name = names[start]
+            if name not in selected:
+                continue
+            rows = batch.slice(start, end - start)
+            ids = rows.column("id").to_pylist()
+            documents = rows.column("document").to_pylist()
+            embeddings = rows.column("embedding").flatten().to_numpy().reshape(len(ids), -1)
+            metadatas = [json.loads(m) if m else None for m in rows.column("metadata").to_pylist()]
+            for offset in range(0, len(ids), batch_size):
+                window = slice(offset, offset + batch_size)
+                upsert = {"ids": ids[window], "documents": documents[window], "embeddings": embeddings[window]}
+                if any(metadatas[window]):
+                    upsert["metadatas"] = metadatas[window]
+                collections[name].upsert(**upsert)
+            register_chunk_signatures(name, {chunk_id: simhash(document or "")
+                                             for chunk_id, document in zip(ids, documents)})
+            imported[name] += len(ids)
+
+    for name in selected:
+        for manifest in header["collections"][name]["manifests"]:
+            save_manifest(manifest)
+        bump_collection_version(name)
+
+    result = {"collections": imported, "rows": sum(imported.values()), "seconds": time.perf_counter() - started}
+    print(f"📥 Imported {result['rows']} chunks into {len(imported)} collection(s) in {result['seconds']:.1f}s")
+    return result
+
+
+# Command line: python -m utils.kb_snapshot [export|import|inspect] FILE
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export or import knowledge-base snapshots")
+    parser.add_argument("command", choices=["export", "import", "inspect"])
+    parser.add_argument("file", help="Snapshot file (.parquet, or .arrow for Arrow IPC)")
+    parser.add_argument("--path", default="./chrome_store", help="ChromaDB persist directory")
+    parser.add_argument("--collections", nargs="+", help="Only these collections")
+    parser.add_argument("--replace", action="store_true", help="import: drop existing collections first")
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE, help="Rows per read/write batch")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_snapshot(args.file, args.collections, args.path, args.batch_size)
+    elif args.command == "import":
+        import_snapshot(args.file, args.path, args.collections, args.replace, args.batch_size)
+    else:
+        for name, info in sorted(read_snapshot_header(args.file)["collections"].items()):
+            provider = info["metadata"].get("embedding_provider", "openai")
+            dimensions = info["metadata"].get("embedding_dimensions", 1536)
+            print(f"{name}: {info['count']} chunks, {provider} {dimensions}d, {len(info['manifests'])} manifest(s)")
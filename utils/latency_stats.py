@@ -0,0 +1,42 @@
+import math
+
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile of a list of numbers.
+
+    Args:
+        values (list): Observed values (e.g. latencies in seconds)
+        pct (float): Percentile in the range 0-100
+
+    Returns:
+        float or None: The percentile value, or None when values is empty
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize_latencies(latencies, wall_seconds=None, percentiles=(50, 95)):
+    """
+    Summarize request latencies and throughput.
+
+    Args:
+        latencies (list): Per-request latencies in seconds
+        wall_seconds (float, optional): Wall-clock duration of the whole run
+        percentiles (tuple): Percentiles to report
+
+    Returns:
+        dict: {'count': int, 'mean': float, 'p50': float, ..., 'throughput': float}
+    """
+    summary = {
+        "count": len(latencies),
+        "mean": sum(latencies) / len(latencies) if latencies else None,
+    }
+    for pct in percentiles:
+        summary[f"p{pct}"] = percentile(latencies, pct)
+    if wall_seconds:
+        summary["throughput"] = len(latencies) / wall_seconds
+    return summary
@@ -0,0 +1,187 @@
+import os
+import re
+import shutil
+import sqlite3
+import time
+
+
+UUID_PATTERN = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$")
+
+
+def _directory_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def _connect_store(persist_directory):
+    """Open the store's SQLite catalog, or return None if the store has none yet."""
+    db_path = os.path.join(persist_directory, "chroma.sqlite3")
+    if not os.path.exists(db_path):
+        return None
+    return sqlite3.connect(db_path, timeout=30)
+
+
+def get_live_segment_ids(persist_directory="./chrome_store"):
+    """
+    Get the ids of all segments that belong to an existing collection.
+
+    Args:
+        persist_directory (str): ChromaDB persist directory
+
+    Returns:
+        set: Live segment ids (empty if the store has no catalog)
+    """
+    connection = _connect_store(persist_directory)
+    if connection is None:
+        return set()
+    try:
+        rows = connection.execute(
+            "SELECT s.id FROM segments s JOIN collections c ON s.collection = c.id"
+        ).fetchall()
+        return {row[0] for row in rows}
+    finally:
+        connection.close()
+
+
+def collect_garbage(persist_directory="./chrome_store", min_age_seconds=300, dry_run=False):
+    """
+    Remove segment folders that no live collection references.
+
+    Dropping a collection removes it from the catalog but can leave its
+    UUID-named vector segment folder on disk. Folders younger than
+    min_age_seconds are kept so a collection being created concurrently is
+    never touched.
+
+    Args:
+        persist_directory (str): ChromaDB persist directory
+        min_age_seconds (float): Minimum folder age before it may be removed
+        dry_run (bool): Only report what would be removed
+
+    Returns:
+        dict: {'removed': list of segment ids, 'freed_bytes': int}
+    """
+    if not os.path.isdir(persist_directory):
+        return {'removed': [], 'freed_bytes': 0}
+
+    live_segments = get_live_segment_ids(persist_directory)
+    now = time.time()
+    removed = []
+    freed_bytes = 0
+
+    for entry in os.listdir(persist_directory):
+        path = os.path.join(persist_directory, entry)
+        if not os.path.isdir(path) or not UUID_PATTERN.match(entry) or entry in live_segments:
+            continue
+        if now - os.path.getmtime(path) < min_age_seconds:
+            continue
+        size = _directory_size(path)
+        if not dry_run:
+            shutil.rmtree(path, ignore_errors=True)
+        removed.append(entry)
+        freed_bytes += size
+
+    action = "Would remove" if dry_run else "Removed"
+    print(f"🧹 {action} {len(removed)} orphaned segment(s), {freed_bytes / (1024 * 1024):.1f} MB")
+    return {'removed': removed, 'freed_bytes': freed_bytes}
+
+
+def vacuum_store(persist_directory="./chrome_store"):
+    """
+    Compact the store's SQLite catalog after large deletions.
+
+    VACUUM needs an exclusive lock, so run it when no ingestion is in progress.
+
+    Args:
+        persist_directory (str): ChromaDB persist directory
+
+    Returns:
+        dict: {'before_bytes': int, 'after_bytes': int}
+    """
+    db_path = os.path.join(persist_directory, "chroma.sqlite3")
+    connection = _connect_store(persist_directory)
+    if connection is None:
+        return {'before_bytes': 0, 'after_bytes': 0}
+
+    before = os.path.getsize(db_path)
+    try:
+        connection.execute("VACUUM")
+    finally:
+        connection.close()
+    after = os.path.getsize(db_path)
+    print(f"🗜️ Vacuumed catalog: {before / (1024 * 1024):.1f} MB → {after / (1024 * 1024):.1f} MB")
+    return {'before_bytes': before, 'after_bytes': after}
+
+
+def get_store_disk_usage(persist_directory="./chrome_store"):
+    """
+    Report disk usage per collection.
+
+    Args:
+        persist_directory (str): ChromaDB persist directory
+
+    Returns:
+        dict: {'collections': {name: {'embeddings': int, 'segment_bytes': int}},
+               'catalog_bytes': int, 'orphaned_bytes': int, 'total_bytes': int}
+    """
+    report = {'collections': {}, 'catalog_bytes': 0, 'orphaned_bytes': 0, 'total_bytes': 0}
+    if not os.path.isdir(persist_directory):
+        return report
+
+    segment_owner = {}
+    connection = _connect_store(persist_directory)
+    if connection is not None:
+        try:
+            rows = connection.execute("""
+                SELECT c.name, s.id, s.scope,
+                       (SELECT COUNT(*) FROM embeddings e WHERE e.segment_id = s.id)
+                FROM collections c JOIN segments s ON s.collection = c.id
+            """).fetchall()
+        finally:
+            connection.close()
+        for name, segment_id, scope, count in rows:
+            usage = report['collections'].setdefault(name, {'embeddings': 0, 'segment_bytes': 0})
+            if scope == "METADATA":
+                usage['embeddings'] = count
+            segment_owner[segment_id] = name
+
+    for entry in os.listdir(persist_directory):
+        path = os.path.join(persist_directory, entry)
+        size = _directory_size(path) if os.path.isdir(path) else os.path.getsize(path)
+        report['total_bytes'] += size
+        if entry in segment_owner:
+            report['collections'][segment_owner[entry]]['segment_bytes'] += size
+        elif UUID_PATTERN.match(entry):
+            report['orphaned_bytes'] += size
+        elif entry.startswith("chroma.sqlite3"):
+            report['catalog_bytes'] += size
+
+    return report
+
+
+# Command line maintenance: python -m utils.manage_chroma_store [usage|gc|vacuum]
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Maintain the ChromaDB store")
+    parser.add_argument("command", choices=["usage", "gc", "vacuum"])
+    parser.add_argument("--path", default="./chrome_store", help="ChromaDB persist directory")
+    parser.add_argument("--dry-run", action="store_true", help="gc: only report orphaned segments")
+    args = parser.parse_args()
+
+    if args.command == "gc":
+        collect_garbage(args.path, dry_run=args.dry_run)
+    elif args.command == "vacuum":
+        vacuum_store(args.path)
+    else:
+        usage = get_store_disk_usage(args.path)
+        for name, info in sorted(usage['collections'].items()):
+            print(f"{name}: {info['embeddings']} embeddings, {info['segment_bytes'] / 1024:.1f} KB")
+        print(f"Catalog: {usage['catalog_bytes'] / 1024:.1f} KB")
+        print(f"Orphaned: {usage['orphaned_bytes'] / 1024:.1f} KB")
+        print(f"Total: {usage['total_bytes'] / 1024:.1f} KB")
@@ -0,0 +1,237 @@
+import time
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from utils.latency_stats import percentile
+from utils.prompt_templates import record_prompt_usage
+
+
+# Model, max_tokens (None = no cap) and request timeout for every agent stage.
+# Tiers are ordered from preferred to fastest; a stage moves one tier down
+# when its rolling p95 latency exceeds slo_p95 seconds.
+MODEL_POLICY = {
+    "Router": {
+        "route": {"slo_p95": 3.0, "tiers": [
+            {"name": "standard", "model": "gpt-3.5-turbo", "max_tokens": 10, "timeout": 10},
+        ]},
+        "task_graph": {"slo_p95": 6.0, "tiers": [
+            {"name": "standard", "model": "gpt-3.5-turbo", "max_tokens": 400, "timeout": 20},
+        ]},
+    },
+    "Memory": {
+        "summarize": {"slo_p95": 5.0, "tiers": [
+            {"name": "standard", "model": "gpt-4o-mini", "max_tokens": 300, "timeout": 15},
+        ]},
+    },
+    "PlanerAgent": {
+        "outline": {"slo_p95": 8.0, "tiers": [
+            {"name": "quality", "model": "gpt-4", "max_tokens": 300, "timeout": 30},
+            {"name": "fast", "model": "gpt-4o-mini", "max_tokens": 300, "timeout": 15},
+        ]},
+        "plan": {"slo_p95": 30.0, "tiers": [
+            {"name": "quality", "model": "gpt-4", "max_tokens": None, "timeout": 90},
+            {"name": "fast", "model": "gpt-4o-mini", "max_tokens": None, "timeout": 45},
+        ]},
+        "critic": {"slo_p95": 20.0, "tiers": [
+            {"name": "quality", "model": "gpt-4", "max_tokens": None, "timeout": 60},
+            {"name": "fast", "model": "gpt-4o-mini", "max_tokens": None, "timeout": 30},
+        ]},
+    },
+    "SeoAgent": {
+        "answer": {"slo_p95": 15.0, "tiers": [
+            {"name": "quality", "model": "gpt-4", "max_tokens": 600, "timeout": 45},
+            {"name": "fast", "model": "gpt-4o-mini", "max_tokens": 600, "timeout": 20},
+        ]},
+    },
+    "ResearchAgent": {
+        "tool_call": {"slo_p95": 8.0, "tiers": [
+            {"name": "quality", "model": "gpt-4", "max_tokens": 100, "timeout": 30},
+            {"name": "fast", "model": "gpt-4o-mini", "max_tokens": 100, "timeout": 15},
+        ]},
+        "answer": {"slo_p95": 25.0, "tiers": [
+            {"name": "quality", "model": "gpt-4", "max_tokens": 1000, "timeout": 60},
+            {"name": "fast", "model": "gpt-4o-mini", "max_tokens": 1000, "timeout": 30},
+        ]},
+    },
+    "RagWriterAgent": {
+        "outline": {"slo_p95": 8.0, "tiers": [
+            {"name": "quality", "model": "gpt-4o-mini", "max_tokens": 200, "timeout": 20},
+            {"name": "fast", "model": "gpt-3.5-turbo", "max_tokens": 200, "timeout": 15},
+        ]},
+        "section": {"slo_p95": 30.0, "tiers": [
+            {"name": "quality", "model": "gpt-4", "max_tokens": 700, "timeout": 60},
+            {"name": "fast", "model": "gpt-4o-mini", "max_tokens": 700, "timeout": 30},
+        ]},
+        "stitch": {"slo_p95": 15.0, "tiers": [
+            {"name": "quality", "model": "gpt-4", "max_tokens": 400, "timeout": 45},
+            {"name": "fast", "model": "gpt-4o-mini", "max_tokens": 400, "timeout": 20},
+        ]},
+        "write": {"slo_p95": 40.0, "tiers": [
+            {"name": "quality", "model": "gpt-4", "max_tokens": None, "timeout": 120},
+            {"name": "fast", "model": "gpt-4o-mini", "max_tokens": None, "timeout": 60},
+        ]},
+    },
+}
+
+# Rolling window of the latest latencies per (agent, stage, tier)
+LATENCY_WINDOW = 20
+MIN_SAMPLES = 5
+# While degraded, every PROBE_INTERVAL-th call goes to the tier above; the stage
+# moves back up once the last MIN_SAMPLES probes show p95 below RECOVERY_RATIO * slo_p95
+PROBE_INTERVAL = 10
+RECOVERY_RATIO = 0.8
+
+_monitor_lock = threading.Lock()
+_active_tiers = {}   # (agent, stage) -> tier index
+_latencies = {}      # (agent, stage, tier index) -> deque of seconds
+_calls = {}          # (agent, stage) -> calls made while degraded
+_used_tiers = contextvars.ContextVar("model_tiers", default=None)
+
+
+def _window(agent, stage, index):
+    """Latency window of one tier (call with _monitor_lock held)."""
+    return _latencies.setdefault((agent, stage, index), deque(maxlen=LATENCY_WINDOW))
+
+
+def select_model(agent, stage):
+    """
+    Pick the tier to use for the next call of an agent stage.
+
+    Args:
+        agent (str): Agent name, e.g. 'PlanerAgent'
+        stage (str): Stage of the agent, e.g. 'critic'
+
+    Returns:
+        dict: {'index', 'name', 'model', 'max_tokens', 'timeout'}
+    """
+    tiers = MODEL_POLICY[agent][stage]["tiers"]
+    with _monitor_lock:
+        index = _active_tiers.get((agent, stage), 0)
+        if index > 0:
+            _calls[(agent, stage)] = _calls.get((agent, stage), 0) + 1
+            if _calls[(agent, stage)] % PROBE_INTERVAL == 0:
+                index -= 1
+    return {"index": index, **tiers[index]}
+
+
+def record_latency(agent, stage, tier_index, seconds):
+    """
+    Feed one observed latency into the monitor and switch tiers if needed.
+
+    Args:
+        agent (str): Agent name
+        stage (str): Stage name
+        tier_index (int): Tier the call used
+        seconds (float): Observed latency (the timeout if the call timed out)
+    """
+    config = MODEL_POLICY[agent][stage]
+    with _monitor_lock:
+        active = _active_tiers.get((agent, stage), 0)
+        window = _window(agent, stage, tier_index)
+        window.append(seconds)
+        if len(window) < MIN_SAMPLES:
+            return
+        p95 = percentile(list(window), 95)
+
+        if tier_index == active and p95 > config["slo_p95"] and active + 1 < len(config["tiers"]):
+            _active_tiers[(agent, stage)] = active + 1
+            # Recovery must be proven by fresh probes, not by the slow samples just seen
+            window.clear()
+            print(f"🐢 {agent}.{stage} p95 {p95:.1f}s > SLO {config['slo_p95']:.0f}s, "
+                  f"switching to {config['tiers'][active + 1]['name']} tier")
+        elif tier_index == active - 1:
+            # Probes are sparse, so judge recovery on the latest few only
+            recent = list(window)[-MIN_SAMPLES:]
+            recent_p95 = percentile(recent, 95)
+            if recent_p95 <= config["slo_p95"] * RECOVERY_RATIO:
+                _active_tiers[(agent, stage)] = tier_index
+                window.clear()
+                window.extend(recent)
+                _window(agent, stage, active).clear()
+                print(f"🐇 {agent}.{stage} p95 {recent_p95:.1f}s recovered, switching back to "
+                      f"{config['tiers'][tier_index]['name']} tier")
+
+
+def create_chat_completion(client, agent, stage, messages, **kwargs):
+    """
+    Call the chat completions API with the model policy of an agent stage.
+
+    Args:
+        client (OpenAI): OpenAI client
+        agent (str): Agent name
+        stage (str): Stage name
+        messages (list): Chat messages
+        **kwargs: Extra arguments for chat.completions.create (e.g. tools)
+
+    Returns:
+        ChatCompletion: API response
+    """
+    tier = select_model(agent, stage)
+    if tier["max_tokens"] is not None:
+        kwargs.setdefault("max_tokens", tier["max_tokens"])
+
+    used = _used_tiers.get()
+    if used is not None:
+        used[f"{agent}.{stage}"] = tier["name"]
+
+    start = time.perf_counter()
+    try:
+        response = client.chat.completions.create(
+            model=tier["model"], messages=messages, timeout=tier["timeout"], **kwargs
+        )
+    finally:
+        record_latency(agent, stage, tier["index"], time.perf_counter() - start)
+    record_prompt_usage(agent, stage, getattr(response, "usage", None))
+    return response
+
+
+@contextmanager
+def track_model_tiers():
+    """
+    Collect the tier used by every agent stage called inside the block.
+
+    Yields:
+        dict: '{agent}.{stage}' -> tier name, filled in as calls are made
+    """
+    tiers = {}
+    token = _used_tiers.set(tiers)
+    try:
+        yield tiers
+    finally:
+        _used_tiers.reset(token)
+
+
+def record_model_tiers(tiers):
+    """
+    Add tiers collected on a worker thread to the caller's tracking block, if any.
+
+    Args:
+        tiers (dict): Tiers from track_model_tiers()
+    """
+    used = _used_tiers.get()
+    if used is not None and tiers:
+        used.update(tiers)
+
+
+def get_model_policy_status():
+    """
+    Get the active tier and rolling p95 of every stage that has been called.
+
+    Returns:
+        dict: '{agent}.{stage}' -> {'tier', 'model', 'p95', 'slo_p95'}
+    """
+    status = {}
+    with _monitor_lock:
+        stages = {(agent, stage) for agent, stage, _ in _latencies}
+        for agent, stage in sorted(stages):
+            config = MODEL_POLICY[agent][stage]
+            index = _active_tiers.get((agent, stage), 0)
+            window = list(_latencies.get((agent, stage, index), ()))
+            status[f"{agent}.{stage}"] = {
+                "tier": config["tiers"][index]["name"],
+                "model": config["tiers"][index]["model"],
+                "p95": percentile(window, 95),
+                "slo_p95": config["slo_p95"]
+            }
+    return status
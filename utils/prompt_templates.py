@@ -0,0 +1,107 @@
+import json
+import threading
+
+
+# Every template registers itself here so its prefix can be checked
+TEMPLATES = {}
+
+_usage_lock = threading.Lock()
+_usage = {}  # '{agent}.{stage}' -> {'calls', 'prompt_tokens', 'cached_tokens'}
+
+
+class PromptTemplate:
+    """
+    Prompt split into a static prefix and variable content.
+
+    The instructions and few-shot examples form the system message, which is
+    identical byte for byte on every request. Per-request values (user input,
+    retrieved context, earlier outputs) only appear in the user message that
+    follows, so the provider can reuse its cached prefix across requests.
+
+    Args:
+        name (str): Unique template name
+        instructions (str): Static instructions and examples
+        fields (tuple): (field, label) pairs rendered in this order after the prefix
+    """
+
+    def __init__(self, name, instructions, fields):
+        self.name = name
+        self.instructions = instructions.strip()
+        self.fields = tuple(fields)
+        TEMPLATES[name] = self
+
+    def render(self, **values):
+        """
+        Build the chat messages for one request.
+
+        Args:
+            **values: A value for every field of the template; fields set to None are left out
+
+        Returns:
+            list: [system message with the static prefix, user message with the values]
+        """
+        content = "\n\n".join(
+            f"{label}:\n{values[field]}" for field, label in self.fields if values[field] is not None
+        )
+        return [
+            {"role": "system", "content": self.instructions},
+            {"role": "user", "content": content}
+        ]
+
+
+def record_prompt_usage(agent, stage, usage):
+    """
+    Record prompt and cached-token counts reported for one completion.
+
+    Args:
+        agent (str): Agent name
+        stage (str): Stage name
+        usage (CompletionUsage or None): response.usage
+    """
+    if usage is None:
+        return
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", None) or 0
+    with _usage_lock:
+        stats = _usage.setdefault(f"{agent}.{stage}", {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0})
+        stats["calls"] += 1
+        stats["prompt_tokens"] += getattr(usage, "prompt_tokens", 0) or 0
+        stats["cached_tokens"] += cached
+
+
+def get_prompt_cache_stats():
+    """
+    Get prompt-cache usage per agent stage.
+
+    Returns:
+        dict: '{agent}.{stage}' -> {'calls', 'prompt_tokens', 'cached_tokens', 'cached_ratio'}
+    """
+    with _usage_lock:
+        return {
+            key: {**stats, "cached_ratio": stats["cached_tokens"] / stats["prompt_tokens"] if stats["prompt_tokens"] else 0.0}
+            for key, stats in _usage.items()
+        }
+
+
+def verify_stable_prefixes(templates=None):
+    """
+    Check that two requests with different values share a byte-identical prefix.
+
+    The messages are serialised the way they are sent (JSON), and the shared
+    prefix must extend over the whole system message.
+
+    Args:
+        templates (iterable, optional): Templates to check; defaults to every registered one
+
+    Returns:
+        list: Names of templates whose prefix changes between requests
+    """
+    failures = []
+    for template in templates or TEMPLATES.values():
+        first = json.dumps(template.render(**{field: "first request" for field, _ in template.fields})).encode("utf-8")
+        second = json.dumps(template.render(**{field: "другой запрос 2" for field, _ in template.fields})).encode("utf-8")
+        prefix = json.dumps([{"role": "system", "content": template.instructions}])[:-1].encode("utf-8")
+        if not (first.startswith(prefix) and second.startswith(prefix)):
+            failures.append(template.name)
+    return failures
+
@@ -0,0 +1,190 @@
+import os
+import sys
+import time
+import pstats
+import cProfile
+import threading
+import contextlib
+from collections import Counter
+from datetime import datetime
+import streamlit as st
+
+
+# .prof and collapsed-stack files are written here
+PROFILE_DIR = "./profiles"
+# PROFILE_REQUESTS=1 profiles every request instead of only the one armed in the sidebar
+PROFILE_ALL_REQUESTS = os.environ.get("PROFILE_REQUESTS") == "1"
+SAMPLE_INTERVAL_SECONDS = 0.005
+TOP_FUNCTIONS = 15
+
+# Leaf frames of threads that are only waiting; left out of the sampled stacks
+_IDLE_FRAMES = {
+    ("threading.py", "wait"), ("selectors.py", "select"), ("queue.py", "get"),
+    ("thread.py", "_worker"), ("threading.py", "_wait_for_tstate_lock")
+}
+
+
+def _frame_name(code):
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class StackSampler:
+    """
+    Sample the Python stacks of all threads at a fixed interval.
+
+    cProfile only sees the thread that enabled it, while agents also run on
+    worker threads (speculation, parallel sections, ingestion). The sampler
+    records every busy thread, so the collapsed stacks show that work too.
+
+    Args:
+        interval (float): Seconds between samples
+        main_thread_id (int): Thread always sampled, even while it waits
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL_SECONDS, main_thread_id=None):
+        self.interval = interval
+        self.main_thread_id = main_thread_id or threading.get_ident()
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self):
+        names = {}
+        while not self._stop.wait(self.interval):
+            own = threading.get_ident()
+            if len(names) != threading.active_count():
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                code = frame.f_code
+                if thread_id != self.main_thread_id and \
+                        (os.path.basename(code.co_filename), code.co_name) in _IDLE_FRAMES:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_name(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write_collapsed(self, path):
+        """
+        Write stacks in the collapsed format read by flamegraph.pl, speedscope and inferno.
+
+        Args:
+            path (str): Output file, one 'frame;frame;frame count' line per stack
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def top_functions(stats, limit=TOP_FUNCTIONS):
+    """
+    Functions with the most time spent in their own code.
+
+    Args:
+        stats (pstats.Stats): Profile statistics
+        limit (int): Number of functions
+
+    Returns:
+        list: {'function', 'calls', 'self_seconds', 'cumulative_seconds'} dicts, hottest first
+    """
+    rows = []
+    for (filename, line, name), (_, calls, self_time, cumulative_time, _) in stats.stats.items():
+        # Built-ins are recorded with filename '~' and line 0
+        function = f"{name} ({os.path.basename(filename)}:{line})" if line else name
+        rows.append({
+            "function": function,
+            "calls": calls,
+            "self_seconds": round(self_time, 4),
+            "cumulative_seconds": round(cumulative_time, 4)
+        })
+    rows.sort(key=lambda row: row["self_seconds"], reverse=True)
+    return rows[:limit]
+
+
+@contextlib.contextmanager
+def profile_request(label, enabled=True, profile_dir=PROFILE_DIR):
+    """
+    Profile a block with cProfile and a stack sampler.
+
+    Writes '<timestamp>-<label>.prof' (open with snakeviz or pstats) and
+    '<timestamp>-<label>.collapsed' (render with flamegraph.pl or speedscope)
+    to profile_dir. When disabled the block runs without any overhead.
+
+    Args:
+        label (str): Name of what is profiled, used in the file names
+        enabled (bool): Whether to profile at all
+        profile_dir (str): Output directory
+
+    Yields:
+        dict or None: Filled when the block exits with 'label', 'duration_seconds',
+                      'prof_path', 'collapsed_path', 'samples' and 'top'; None if disabled
+    """
+    if not enabled:
+        yield None
+        return
+
+    result = {"label": label}
+    profiler = cProfile.Profile()
+    sampler = StackSampler()
+    started = time.perf_counter()
+    sampler.start()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Python 3.12+ allows one cProfile at a time; another session is profiling
+        profiler = None
+    try:
+        yield result
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        sampler.stop()
+        result["duration_seconds"] = time.perf_counter() - started
+
+        os.makedirs(profile_dir, exist_ok=True)
+        safe_label = "".join(c if c.isalnum() or c in "-_" else "_" for c in label)
+        base = os.path.join(profile_dir, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{safe_label}")
+        if profiler is not None:
+            profiler.dump_stats(f"{base}.prof")
+        sampler.write_collapsed(f"{base}.collapsed")
+        result.update({
+            "prof_path": f"{base}.prof" if profiler is not None else None,
+            "collapsed_path": f"{base}.collapsed",
+            "samples": sampler.samples,
+            "top": top_functions(pstats.Stats(profiler)) if profiler is not None else []
+        })
+        print(f"🔥 Profiled {label} in {result['duration_seconds']:.2f}s → {base}.prof, {base}.collapsed")
+
+
+@contextlib.contextmanager
+def profile_if_requested(label):
+    """
+    Profile a block if the session armed profiling or PROFILE_REQUESTS=1 is set.
+
+    Arming is one-shot: the first profiled block consumes it. The result is
+    kept in st.session_state.last_profile for the sidebar.
+
+    Args:
+        label (str): Name of what is profiled
+    """
+    enabled = PROFILE_ALL_REQUESTS or st.session_state.pop("profile_next_request", False)
+    profile = None
+    try:
+        with profile_request(label, enabled) as profile:
+            yield
+    finally:
+        if profile:
+            st.session_state.last_profile = profile
@@ -0,0 +1,100 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+# Collection versions are the sizes of append-only marker files: bumping appends
+# one byte, which is atomic across threads and worker processes, and reading a
+# version is a single stat() call.
+VERSION_DIR = "./ingest_manifests/versions"
+RETRIEVAL_CACHE_SIZE = 256
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+def bump_collection_version(collection_name):
+    """
+    Mark a collection as changed so cached retrievals over it are never reused.
+
+    Call after every write to or deletion of the collection.
+
+    Args:
+        collection_name (str): ChromaDB collection name
+    """
+    os.makedirs(VERSION_DIR, exist_ok=True)
+    fd = os.open(os.path.join(VERSION_DIR, collection_name), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, b".")
+    finally:
+        os.close(fd)
+
+
+def get_collection_version(collection_name):
+    """
+    Current version counter of a collection.
+
+    Args:
+        collection_name (str): ChromaDB collection name
+
+    Returns:
+        int: Number of changes recorded for the collection
+    """
+    try:
+        return os.stat(os.path.join(VERSION_DIR, collection_name)).st_size
+    except OSError:
+        return 0
+
+
+def cached_retrieval(query, collection_names, n_results, retrieve):
+    """
+    Return retrieved chunks for a query, reusing an earlier identical retrieval.
+
+    The key combines the query hash, the set of selected collections with
+    their versions, and n_results. Versions are read before retrieve() runs,
+    so a write that lands during retrieval produces a new key and the result
+    is never served stale.
+
+    Args:
+        query (str): Query text
+        collection_names (list): Collections being searched
+        n_results (int): Results per collection
+        retrieve (callable): Zero-argument function performing the embedding and
+                             vector search; returns a list of chunks, or None on failure
+
+    Returns:
+        list or None: Retrieved chunks, or None if retrieval failed
+    """
+    key = (
+        hashlib.sha256(query.encode("utf-8")).hexdigest(),
+        tuple(sorted((name, get_collection_version(name)) for name in set(collection_names))),
+        n_results
+    )
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            _stats["hits"] += 1
+            return list(_cache[key])
+        _stats["misses"] += 1
+
+    documents = retrieve()
+    if documents is not None:
+        with _cache_lock:
+            _cache[key] = list(documents)
+            _cache.move_to_end(key)
+            while len(_cache) > RETRIEVAL_CACHE_SIZE:
+                _cache.popitem(last=False)
+    return documents
+
+
+def get_retrieval_cache_stats():
+    """
+    Get retrieval cache hit and miss counts.
+
+    Returns:
+        dict: {'hits': int, 'misses': int, 'entries': int}
+    """
+    with _cache_lock:
+        return {**_stats, "entries": len(_cache)}
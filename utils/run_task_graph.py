@@ -0,0 +1,103 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from utils.handle_agent_call import handle_agent_call
+from utils.thread_context import with_script_run_ctx
+from utils.model_policy import track_model_tiers, record_model_tiers
+
+
+def build_node_prompt(node, upstream_outputs):
+    """
+    Build the prompt for a task, feeding in the outputs of the tasks it depends on.
+
+    Args:
+        node (dict): Task graph node
+        upstream_outputs (list): (agent, task, output) tuples of its dependencies
+
+    Returns:
+        str: Prompt passed to the node's agent
+    """
+    if not upstream_outputs:
+        return node["task"]
+
+    context = "\n\n".join(
+        f"[{agent} – {task}]\n{output}" for agent, task, output in upstream_outputs
+    )
+    return f"{node['task']}\n\nUse these results from previous steps:\n\n{context}"
+
+
+def run_task_graph(nodes, uploaded_files=None, max_workers=4, conversation=None):
+    """
+    Execute a task graph, running independent tasks concurrently.
+
+    A task starts as soon as all of its dependencies have finished, so the
+    wall-clock time follows the critical path of the graph rather than the
+    sum of all agent calls.
+
+    Args:
+        nodes (list): Nodes from assign_task_graph() in topological order
+        uploaded_files (list, optional): Uploaded documents for RagWriterAgent
+        max_workers (int): Maximum number of agents running at once
+        conversation (str, optional): Earlier conversation, given to every agent
+
+    Returns:
+        dict: {'response': merged text, 'results': {node_id: output},
+               'timings': {node_id: seconds}, 'wall_time': seconds}
+    """
+    by_id = {node["id"]: node for node in nodes}
+    results = {}
+    timings = {}
+    pending = list(nodes)
+    running = {}
+    start = time.perf_counter()
+
+    def run_node(node):
+        node_start = time.perf_counter()
+        upstream = [(by_id[dep]["agent"], by_id[dep]["task"], results[dep] or "") for dep in node["depends_on"]]
+        files = uploaded_files if node["agent"] == "RagWriterAgent" else None
+        with track_model_tiers() as tiers:
+            output = handle_agent_call(node["agent"], build_node_prompt(node, upstream), files, conversation)
+        return output, time.perf_counter() - node_start, tiers
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            ready = [node for node in pending if all(dep in results for dep in node["depends_on"])]
+            for node in ready:
+                pending.remove(node)
+                running[executor.submit(with_script_run_ctx(run_node), node)] = node
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                node = running.pop(future)
+                try:
+                    results[node["id"]], timings[node["id"]], tiers = future.result()
+                    record_model_tiers(tiers)
+                except Exception as e:
+                    results[node["id"]], timings[node["id"]] = None, 0.0
+                    print(f"Task {node['id']} ({node['agent']}) failed: {e}")
+
+    wall_time = time.perf_counter() - start
+    print(f"🧩 Ran {len(nodes)} tasks in {wall_time:.1f}s (sum of calls {sum(timings.values()):.1f}s)")
+    return {
+        "response": merge_task_results(nodes, results),
+        "results": results,
+        "timings": timings,
+        "wall_time": wall_time
+    }
+
+
+def merge_task_results(nodes, results):
+    """
+    Merge task outputs into one response, in graph order.
+
+    Args:
+        nodes (list): Task graph nodes in topological order
+        results (dict): node_id -> agent output (None if the task failed)
+
+    Returns:
+        str: Combined markdown response
+    """
+    sections = []
+    for node in nodes:
+        output = results.get(node["id"]) or "_This step did not return a result._"
+        sections.append(f"### {node['agent']}: {node['task']}\n\n{output}")
+    return "\n\n".join(sections)
@@ -52,6 +52,39 @@ def sanitize_collection_name(filename):
     return name
 
 
+
+def document_collection_name(document_id):
+    """
+    Content-addressed collection name of a document.
+
+    Identical files share one collection whatever they are called, and
+    different files with the same name never collide.
+
+    Args:
+        document_id (str): SHA-256 hex digest of the document
+
+    Returns:
+        str: 'doc_' followed by the first 40 hex digits of the digest
+    """
+    return f"doc_{document_id[:40]}"
+
+
+def get_collection_name(document):
+    """
+    Collection holding a document.
+
+    Args:
+        document (dict): Document descriptor; 'id' (content hash) selects its
+                         content-addressed collection, otherwise 'name' is taken
+                         as a file or collection name (server requests, older sessions)
+
+    Returns:
+        str: ChromaDB collection name
+    """
+    if document.get('id'):
+        return document_collection_name(document['id'])
+    return sanitize_collection_name(document['name'])
+
 def validate_collection_name(collection_name):
     """
     Validate if a collection name meets ChromaDB requirements.
@@ -0,0 +1,558 @@
+import os
+import sys
+import time
+import shutil
+import hashlib
+import threading
+import contextlib
+import tracemalloc
+import sqlite3
+import uuid
+import weakref
+from collections import OrderedDict
+
+try:
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    from streamlit.runtime import Runtime
+except ImportError:
+    get_script_run_ctx = None
+    Runtime = None
+
+
+# Large per-session payloads (long answers) live here, one directory per session
+SESSION_STORE_DIR = "./session_store"
+# Responses longer than this are moved to disk and referenced by id
+INLINE_PAYLOAD_CHARS = 2000
+# Sessions idle for longer than the TTL are evicted; beyond MAX_SESSIONS the
+# least recently used disconnected ones are evicted first. Sessions in the
+# middle of a script run are never evicted
+SESSION_TTL_SECONDS = int(os.environ.get("SESSION_TTL_SECONDS", 2 * 60 * 60))
+MAX_SESSIONS = int(os.environ.get("MAX_SESSIONS", 50))
+# Collection references of all processes sharing the store. A session's
+# references are refreshed at most this often; ones not refreshed within
+# the TTL belong to sessions of a process that is gone and no longer count
+REFERENCE_DB_PATH = "./ingest_manifests/collection_references.sqlite3"
+REFERENCE_REFRESH_SECONDS = 60
+PINNED_OWNER = "pinned"
+# Marks a collection whose last reference was released and is about to be dropped
+DROPPING_OWNER = "dropping"
+
+# SESSION_TRACEMALLOC=1 attributes Python heap growth to sessions instead of RSS growth
+if os.environ.get("SESSION_TRACEMALLOC") == "1" and not tracemalloc.is_tracing():
+    tracemalloc.start()
+
+# Session id -> registry entry, least recently used first
+_sessions = OrderedDict()
+_sessions_lock = threading.Lock()
+_capacity_warned_at = 0.0
+
+
+def get_session_id():
+    """
+    Id of the Streamlit session running the current script.
+
+    Returns:
+        str or None: Session id, or None outside a Streamlit session (CLI, HTTP service)
+    """
+    if get_script_run_ctx is None:
+        return None
+    try:
+        ctx = get_script_run_ctx(suppress_warning=True)
+    except TypeError:
+        ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else None
+
+
+def _session_dir(session_id):
+    return os.path.join(SESSION_STORE_DIR, hashlib.sha256(session_id.encode("utf-8")).hexdigest()[:32])
+
+
+def store_payload(session_id, text):
+    """
+    Move a large text out of session state to disk.
+
+    Args:
+        session_id (str): Owning session
+        text (str): Payload
+
+    Returns:
+        str: Payload id for load_payload()
+    """
+    payload_id = hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+    directory = _session_dir(session_id)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{payload_id}.txt")
+    if not os.path.exists(path):
+        temporary_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(temporary_path, path)
+    return payload_id
+
+
+def load_payload(session_id, payload_id):
+    """
+    Read a payload stored by store_payload().
+
+    Args:
+        session_id (str): Owning session
+        payload_id (str): Id returned by store_payload()
+
+    Returns:
+        str or None: Payload, or None if it was removed with its session
+    """
+    try:
+        with open(os.path.join(_session_dir(session_id), f"{payload_id}.txt"), encoding="utf-8") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def remove_payloads(session_id):
+    """
+    Delete every payload stored for a session.
+
+    Args:
+        session_id (str): Session id
+    """
+    shutil.rmtree(_session_dir(session_id), ignore_errors=True)
+
+
+def _disk_bytes(session_id):
+    directory = _session_dir(session_id)
+    try:
+        return sum(entry.stat().st_size for entry in os.scandir(directory) if entry.is_file())
+    except OSError:
+        return 0
+
+
+def estimate_size(value, _seen=None):
+    """
+    Approximate the memory retained by a value, following containers and object attributes.
+
+    Args:
+        value: Any object
+
+    Returns:
+        int: Size in bytes, counting shared objects once
+    """
+    seen = _seen if _seen is not None else set()
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value, 0)
+    if isinstance(value, dict):
+        size += sum(estimate_size(k, seen) + estimate_size(v, seen) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item, seen) for item in value)
+    elif hasattr(value, "__dict__") and not isinstance(value, type):
+        size += estimate_size(vars(value), seen)
+    return size
+
+
+def current_memory_bytes():
+    """
+    Memory currently used by the process.
+
+    Returns:
+        tuple: (bytes, source) - traced Python heap when tracemalloc is running,
+               otherwise resident set size
+    """
+    if tracemalloc.is_tracing():
+        return tracemalloc.get_traced_memory()[0], "tracemalloc"
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE"), "rss"
+    except (OSError, ValueError, IndexError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in KiB on Linux and bytes on macOS; only the peak is available here
+        return (peak if sys.platform == "darwin" else peak * 1024), "peak_rss"
+
+
+def touch_session(session_id, session_state=None, uploaded_file_mgr=None):
+    """
+    Mark a session as active and evict sessions that are idle or over capacity.
+
+    Args:
+        session_id (str): Session id
+        session_state (SafeSessionState, optional): The session's state, cleared on eviction
+        uploaded_file_mgr (UploadedFileManager, optional): Holds the session's uploaded file bytes
+
+    Returns:
+        bool: True if the session was not registered yet (new, or evicted earlier)
+    """
+    now = time.time()
+    with _sessions_lock:
+        entry = _sessions.get(session_id)
+        is_new = entry is None
+        if is_new:
+            entry = _sessions[session_id] = {
+                "created": now, "last_seen": now, "collections": set(), "runs": 0,
+                "memory_delta_bytes": 0, "state_bytes": 0, "state": None, "uploads": None,
+                "references_refreshed": now, "running": 0
+            }
+        entry["last_seen"] = now
+        refresh_references = entry["collections"] and \
+            now - entry["references_refreshed"] >= REFERENCE_REFRESH_SECONDS
+        if refresh_references:
+            entry["references_refreshed"] = now
+        if session_state is not None:
+            entry["state"] = weakref.ref(session_state)
+        if uploaded_file_mgr is not None:
+            entry["uploads"] = uploaded_file_mgr
+        _sessions.move_to_end(session_id)
+    if refresh_references:
+        _refresh_references(session_id, now)
+    evict_sessions(now, keep=session_id)
+    return is_new
+
+
+def _reference_db():
+    """Open the shared reference table, creating it on first use."""
+    os.makedirs(os.path.dirname(REFERENCE_DB_PATH), exist_ok=True)
+    connection = sqlite3.connect(REFERENCE_DB_PATH, timeout=30, isolation_level=None)
+    connection.execute("CREATE TABLE IF NOT EXISTS collection_references ("
+                       "collection TEXT NOT NULL, owner TEXT NOT NULL, seen REAL NOT NULL, "
+                       "PRIMARY KEY (collection, owner))")
+    return connection
+
+
+def _live_reference_count(connection, collection_name, now):
+    """References that still count: pinned ones, and sessions seen within the TTL."""
+    cutoff = now - SESSION_TTL_SECONDS - REFERENCE_REFRESH_SECONDS
+    return connection.execute(
+        "SELECT COUNT(*) FROM collection_references WHERE collection = ? AND owner != ? AND (owner = ? OR seen >= ?)",
+        (collection_name, DROPPING_OWNER, PINNED_OWNER, cutoff)
+    ).fetchone()[0]
+
+
+def _add_reference(collection_name, owner):
+    """Insert a reference, cancelling a drop another process has marked but not done yet."""
+    connection = _reference_db()
+    try:
+        connection.execute("DELETE FROM collection_references WHERE collection = ? AND owner = ?",
+                           (collection_name, DROPPING_OWNER))
+        connection.execute("INSERT OR REPLACE INTO collection_references VALUES (?, ?, ?)",
+                           (collection_name, owner, time.time()))
+    finally:
+        connection.close()
+
+
+def register_session_collection(collection_name, session_id=None):
+    """
+    Record that a session references a collection.
+
+    Collections are content-addressed and shared by every process using the
+    store, so references are kept in a SQLite table next to the manifests; a
+    collection is only dropped once no live reference from any process remains.
+
+    Args:
+        collection_name (str): ChromaDB collection name
+        session_id (str, optional): Defaults to the current session
+    """
+    session_id = session_id or get_session_id()
+    if session_id is None:
+        return
+    with _sessions_lock:
+        if session_id in _sessions:
+            _sessions[session_id]["collections"].add(collection_name)
+    _add_reference(collection_name, session_id)
+
+
+def pin_collection(collection_name):
+    """
+    Keep a collection regardless of session references (documents indexed
+    through server.py or run_batch.py, which clients reference by name later).
+
+    Args:
+        collection_name (str): ChromaDB collection name
+    """
+    _add_reference(collection_name, PINNED_OWNER)
+
+
+@contextlib.contextmanager
+def ingestion_reference(collection_name):
+    """
+    Reference a collection for the duration of an ingestion outside a session.
+
+    Keeps the collection from being dropped while it is written. Call
+    pin_collection() inside the block once the ingestion succeeded; if it
+    fails instead, leaving the block drops the half-written collection
+    unless something else references it.
+
+    Args:
+        collection_name (str): ChromaDB collection name
+    """
+    owner = f"ingest-{uuid.uuid4().hex}"
+    _add_reference(collection_name, owner)
+    try:
+        yield
+    finally:
+        _release_reference(collection_name, owner)
+
+
+def release_session_collection(collection_name, session_id=None):
+    """
+    Drop a session's reference to a collection (the user removed the file),
+    and drop the collection itself if that was the last live reference.
+
+    Only the count and a drop mark are written under the reference table's
+    write lock; the ingestion is cancelled and the collection dropped after
+    the commit, so other processes are never blocked on that work. A process
+    registering or pinning the collection in between removes the mark, and
+    the collection is then kept.
+
+    Args:
+        collection_name (str): ChromaDB collection name
+        session_id (str, optional): Defaults to the current session
+
+    Returns:
+        bool: True if the collection was dropped
+    """
+    session_id = session_id or get_session_id()
+    with _sessions_lock:
+        if session_id in _sessions:
+            _sessions[session_id]["collections"].discard(collection_name)
+    return _release_reference(collection_name, session_id)
+
+
+def _release_reference(collection_name, owner):
+    # Imported here: handle_chroma_db imports streamlit and chromadb
+    from utils.handle_chroma_db import clear_chroma_db
+    from utils.handle_file_upload import cancel_background_ingestion
+
+    connection = _reference_db()
+    try:
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute("DELETE FROM collection_references WHERE collection = ? AND owner = ?",
+                               (collection_name, owner))
+            unreferenced = _live_reference_count(connection, collection_name, time.time()) == 0
+            if unreferenced:
+                # Rows left are references of sessions that ended without releasing them
+                connection.execute("DELETE FROM collection_references WHERE collection = ?", (collection_name,))
+                connection.execute("INSERT INTO collection_references VALUES (?, ?, ?)",
+                                   (collection_name, DROPPING_OWNER, time.time()))
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        if not unreferenced:
+            return False
+
+        cancel_background_ingestion(collection_name)
+        if not _take_drop_mark(connection, collection_name):
+            print(f"Collection '{collection_name}' was referenced again, keeping it")
+            return False
+        clear_chroma_db(collection_name)
+        return True
+    finally:
+        connection.close()
+
+
+def _take_drop_mark(connection, collection_name):
+    """Remove the drop mark if it is still there and nothing references the collection."""
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        marked = connection.execute(
+            "SELECT 1 FROM collection_references WHERE collection = ? AND owner = ?",
+            (collection_name, DROPPING_OWNER)
+        ).fetchone() is not None
+        still_unreferenced = marked and _live_reference_count(connection, collection_name, time.time()) == 0
+        if marked:
+            connection.execute("DELETE FROM collection_references WHERE collection = ? AND owner = ?",
+                               (collection_name, DROPPING_OWNER))
+        connection.execute("COMMIT")
+    except BaseException:
+        connection.execute("ROLLBACK")
+        raise
+    return still_unreferenced
+
+
+def _refresh_references(session_id, now):
+    """Mark a session's references as live, so other processes do not treat them as stale."""
+    connection = _reference_db()
+    try:
+        connection.execute("UPDATE collection_references SET seen = ? WHERE owner = ?", (now, session_id))
+    finally:
+        connection.close()
+
+
+def collection_reference_count(collection_name):
+    """
+    Number of live references to a collection across all processes using the store.
+
+    Args:
+        collection_name (str): ChromaDB collection name
+
+    Returns:
+        int: Referencing sessions, plus one if the collection is pinned
+    """
+    connection = _reference_db()
+    try:
+        return _live_reference_count(connection, collection_name, time.time())
+    finally:
+        connection.close()
+
+
+def _is_connected(session_id):
+    """Whether a browser is still connected to the session; unknown counts as connected."""
+    try:
+        return Runtime is None or not Runtime.exists() or Runtime.instance().is_active_session(session_id)
+    except Exception:
+        return True
+
+
+def evict_sessions(now=None, keep=None):
+    """
+    Evict sessions idle for longer than SESSION_TTL_SECONDS, then the least
+    recently used disconnected ones until at most MAX_SESSIONS remain.
+
+    Sessions in the middle of a script run are never evicted, and connected
+    sessions are not evicted for capacity: if every session is connected,
+    the registry stays above MAX_SESSIONS and a warning is printed.
+
+    An evicted session loses its state and uploaded file bytes, its stored
+    payloads are deleted, and its collection references are released:
+    a collection is dropped unless a live session of any process sharing
+    the store, or a pinned upload, still references it. This release work
+    runs on a background thread, not in the request that triggered it.
+
+    Args:
+        now (float, optional): Current time, defaults to time.time()
+        keep (str, optional): Session never evicted (the one running now)
+
+    Returns:
+        list: Ids of the evicted sessions
+    """
+    global _capacity_warned_at
+    now = now if now is not None else time.time()
+    with _sessions_lock:
+        evicted = [sid for sid, entry in _sessions.items()
+                   if sid != keep and not entry["running"] and now - entry["last_seen"] > SESSION_TTL_SECONDS]
+        overflow = len(_sessions) - len(evicted) - MAX_SESSIONS
+        for sid, entry in _sessions.items():
+            if overflow <= 0:
+                break
+            if sid != keep and sid not in evicted and not entry["running"] and not _is_connected(sid):
+                evicted.append(sid)
+                overflow -= 1
+        if overflow > 0 and now - _capacity_warned_at > 60:
+            _capacity_warned_at = now
+            print(f"⚠️ {len(_sessions) - len(evicted)} sessions connected, above MAX_SESSIONS={MAX_SESSIONS}")
+        removed = [(sid, _sessions.pop(sid)) for sid in evicted]
+
+    if removed:
+        threading.Thread(target=_release_sessions, args=(removed,), name="session-eviction", daemon=True).start()
+    return evicted
+
+
+def _release_sessions(removed):
+    for session_id, entry in removed:
+        try:
+            _release_session(session_id, entry)
+        except Exception as e:
+            print(f"Could not release session {session_id}: {e}")
+
+
+def _release_session(session_id, entry):
+    session_state = entry["state"]() if entry["state"] is not None else None
+    if session_state is not None:
+        for key in list(session_state.filtered_state):
+            try:
+                del session_state[key]
+            except Exception:
+                pass
+    if entry["uploads"] is not None:
+        try:
+            entry["uploads"].remove_session_files(session_id)
+        except Exception as e:
+            print(f"Could not release uploads of session {session_id}: {e}")
+    remove_payloads(session_id)
+    dropped = sum(_release_reference(collection_name, session_id) for collection_name in entry["collections"])
+    idle = time.time() - entry["last_seen"]
+    print(f"🧹 Evicted session {session_id} after {idle:.0f}s idle ({dropped} collection(s) dropped)")
+
+
+@contextlib.contextmanager
+def session_run():
+    """
+    Track one script run of the current Streamlit session.
+
+    Registers the session (evicting idle ones), and afterwards records the
+    size of its state and the memory growth seen during the run. A session
+    that comes back after being evicted starts again from the home page.
+
+    Yields:
+        str or None: Session id, None outside Streamlit
+    """
+    ctx = None
+    if get_script_run_ctx is not None:
+        try:
+            ctx = get_script_run_ctx(suppress_warning=True)
+        except TypeError:
+            ctx = get_script_run_ctx()
+    if ctx is None:
+        yield None
+        return
+
+    session_id = ctx.session_id
+    touch_session(session_id, ctx.session_state, ctx.uploaded_file_mgr)
+    with _sessions_lock:
+        if session_id in _sessions:
+            _sessions[session_id]["running"] += 1
+    before, _ = current_memory_bytes()
+    try:
+        yield session_id
+    finally:
+        after, _ = current_memory_bytes()
+        state_bytes = estimate_size(ctx.session_state.filtered_state)
+        with _sessions_lock:
+            entry = _sessions.get(session_id)
+            if entry is not None:
+                entry["running"] -= 1
+                entry["last_seen"] = time.time()
+                entry["runs"] += 1
+                entry["memory_delta_bytes"] += after - before
+                entry["state_bytes"] = state_bytes
+
+
+def get_memory_report():
+    """
+    Memory use per session and for the whole process.
+
+    'state_bytes' is the estimated size of the session's state after its last
+    run, 'disk_bytes' the payloads moved to disk, and 'memory_delta_bytes'
+    the process memory growth (RSS, or traced heap with SESSION_TRACEMALLOC=1)
+    summed over the session's runs. Runs of concurrent sessions overlap, so
+    deltas are an attribution, not an exact split.
+
+    Returns:
+        dict: {'process_bytes', 'source', 'traced_peak_bytes', 'sessions': {id: {...}},
+               'total_state_bytes', 'total_disk_bytes'}
+    """
+    process_bytes, source = current_memory_bytes()
+    now = time.time()
+    with _sessions_lock:
+        snapshot = {sid: dict(entry) for sid, entry in _sessions.items()}
+    sessions = {
+        sid: {
+            "state_bytes": entry["state_bytes"],
+            "disk_bytes": _disk_bytes(sid),
+            "memory_delta_bytes": entry["memory_delta_bytes"],
+            "runs": entry["runs"],
+            "collections": sorted(entry["collections"]),
+            "idle_seconds": now - entry["last_seen"],
+            "age_seconds": now - entry["created"]
+        }
+        for sid, entry in snapshot.items()
+    }
+    return {
+        "process_bytes": process_bytes,
+        "source": source,
+        "traced_peak_bytes": tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else None,
+        "sessions": sessions,
+        "total_state_bytes": sum(s["state_bytes"] for s in sessions.values()),
+        "total_disk_bytes": sum(s["disk_bytes"] for s in sessions.values())
+    }
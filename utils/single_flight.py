@@ -0,0 +1,98 @@
+import hashlib
+import json
+import threading
+
+
+# In-flight calls keyed by (namespace, fingerprint) and per-namespace counters
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+_stats = {}
+
+
+class _InFlightCall:
+    """Result slot shared by the leader call and any concurrent duplicates."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def make_fingerprint(*parts):
+    """
+    Build a stable fingerprint for an upstream request.
+
+    Args:
+        *parts: JSON-serialisable values that fully describe the request
+                (model, prompt, parameters, ...)
+
+    Returns:
+        str: SHA-256 hex digest of the request parts
+    """
+    payload = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def single_flight(namespace, fingerprint, fn):
+    """
+    Run fn once for all concurrent callers sharing the same fingerprint.
+
+    The first caller executes fn. Callers arriving while it is still running
+    wait for that result instead of issuing the same upstream request again.
+    Exceptions raised by fn are re-raised in every waiting caller. Nothing is
+    cached once the call has finished.
+
+    Args:
+        namespace (str): Request family, e.g. "llm", "embeddings", "web_search"
+        fingerprint (str): Request fingerprint from make_fingerprint()
+        fn (callable): Zero-argument callable performing the request
+
+    Returns:
+        Any: The value returned by fn
+    """
+    key = (namespace, fingerprint)
+    with _in_flight_lock:
+        counters = _stats.setdefault(namespace, {"calls": 0, "executed": 0, "saved": 0})
+        counters["calls"] += 1
+        call = _in_flight.get(key)
+        is_leader = call is None
+        if is_leader:
+            call = _InFlightCall()
+            _in_flight[key] = call
+            counters["executed"] += 1
+        else:
+            counters["saved"] += 1
+
+    if not is_leader:
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    try:
+        call.result = fn()
+        return call.result
+    except BaseException as e:
+        call.error = e
+        raise
+    finally:
+        with _in_flight_lock:
+            _in_flight.pop(key, None)
+        call.done.set()
+
+
+def get_single_flight_stats():
+    """
+    Get counters of coalesced upstream calls.
+
+    Returns:
+        dict: Per-namespace {'calls': int, 'executed': int, 'saved': int}
+    """
+    with _in_flight_lock:
+        return {namespace: dict(counters) for namespace, counters in _stats.items()}
+
+
+def reset_single_flight_stats():
+    """Reset all single-flight counters"""
+    with _in_flight_lock:
+        _stats.clear()
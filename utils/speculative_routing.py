@@ -0,0 +1,162 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from utils.get_llm_response import _fallback_routing
+from utils.handle_agent_call import handle_agent_call
+from utils.model_policy import track_model_tiers, record_model_tiers
+from utils.session_manager import get_session_id
+
+
+# Set SPECULATIVE_ROUTING=0 to always wait for the router before starting an agent
+SPECULATIVE_ROUTING = os.environ.get("SPECULATIVE_ROUTING", "1") != "0"
+
+# RagWriterAgent waits for the user to pick documents, so it is never started early
+SPECULATIVE_AGENTS = ("PlanerAgent", "SeoAgent", "ResearchAgent")
+
+# The pool is shared by all sessions. Speculation is skipped while every worker
+# is busy, and a session gets at most MAX_SPECULATIONS_PER_SESSION in flight,
+# so discarded guesses cannot queue up in front of correct ones
+SPECULATION_WORKERS = 4
+MAX_SPECULATIONS_PER_SESSION = 1
+
+_executor = ThreadPoolExecutor(max_workers=SPECULATION_WORKERS, thread_name_prefix="speculative-agent")
+_stats_lock = threading.Lock()
+_stats = {"speculations": 0, "hits": 0, "misses": 0, "skipped": 0, "saved_seconds": 0.0}
+_in_flight = {}  # session id -> speculative calls queued or running
+
+
+def start_speculative_agent(user_input, conversation=None):
+    """
+    Start the agent predicted by the local keyword router while the LLM router runs.
+
+    The speculative call runs without the session's script run context, so a
+    mispredicted agent never writes to the page.
+
+    Args:
+        user_input (str): The user's query or request
+        conversation (str, optional): Conversation context for the agent
+
+    Returns:
+        dict or None: Speculation {'agent', 'future', 'started', 'finished'},
+                      or None if nothing was started
+    """
+    if not SPECULATIVE_ROUTING:
+        return None
+    predicted_agent = _fallback_routing(user_input)
+    if predicted_agent not in SPECULATIVE_AGENTS:
+        return None
+
+    session_id = get_session_id()
+    with _stats_lock:
+        if sum(_in_flight.values()) >= SPECULATION_WORKERS or \
+                _in_flight.get(session_id, 0) >= MAX_SPECULATIONS_PER_SESSION:
+            _stats["skipped"] += 1
+            return None
+        _in_flight[session_id] = _in_flight.get(session_id, 0) + 1
+
+    speculation = {"agent": predicted_agent, "started": time.perf_counter(), "finished": None}
+
+    def run():
+        try:
+            with track_model_tiers() as tiers:
+                speculation["model_tiers"] = tiers
+                return handle_agent_call(predicted_agent, user_input, conversation=conversation)
+        finally:
+            speculation["finished"] = time.perf_counter()
+
+    def release(_):
+        # Runs once the call finished or was cancelled before it started
+        with _stats_lock:
+            _in_flight[session_id] -= 1
+            if not _in_flight[session_id]:
+                del _in_flight[session_id]
+
+    speculation["future"] = _executor.submit(run)
+    speculation["future"].add_done_callback(release)
+    with _stats_lock:
+        _stats["speculations"] += 1
+    return speculation
+
+
+def cancel_speculation(speculation):
+    """
+    Discard a speculative call whose prediction did not match the router.
+
+    A call that has not started yet is cancelled outright; one already
+    running finishes in the background and its result is dropped.
+
+    Args:
+        speculation (dict or None): Value returned by start_speculative_agent()
+    """
+    if speculation is None or speculation.get("resolved"):
+        return
+    speculation["resolved"] = True
+    speculation["future"].cancel()
+    with _stats_lock:
+        _stats["misses"] += 1
+        hit_rate = _stats["hits"] / _stats["speculations"]
+    print(f"🎲 Speculation miss: started {speculation['agent']}, cancelled (hit rate {hit_rate:.0%})")
+
+
+def run_with_speculation(speculation, assigned_agent, user_input, conversation=None):
+    """
+    Get the assigned agent's response, reusing the speculative call when the routes agree.
+
+    A matching speculation that is still queued behind other sessions' work
+    is cancelled and the agent runs inline, so a correct guess is never
+    slower than not speculating.
+
+    Args:
+        speculation (dict or None): Value returned by start_speculative_agent()
+        assigned_agent (str): Agent chosen by the LLM router
+        user_input (str): The user's query or request
+        conversation (str, optional): Conversation context, the same one the speculation started with
+
+    Returns:
+        str or None: Agent response
+    """
+    routed = time.perf_counter()
+    if speculation is None:
+        return handle_agent_call(assigned_agent, user_input, conversation=conversation)
+    if speculation["agent"] != assigned_agent:
+        cancel_speculation(speculation)
+        return handle_agent_call(assigned_agent, user_input, conversation=conversation)
+
+    speculation["resolved"] = True
+    if speculation["future"].cancel():
+        with _stats_lock:
+            _stats["misses"] += 1
+        print(f"🎲 Speculative {assigned_agent} call still queued, running it inline")
+        return handle_agent_call(assigned_agent, user_input, conversation=conversation)
+    try:
+        response = speculation["future"].result()
+    except Exception as e:
+        print(f"Speculative {assigned_agent} call failed, retrying: {e}")
+        with _stats_lock:
+            _stats["misses"] += 1
+        return handle_agent_call(assigned_agent, user_input, conversation=conversation)
+
+    record_model_tiers(speculation.get("model_tiers"))
+    # Sequentially the request costs routing + agent time; overlapped it costs
+    # the longer of the two, so the saving is the shorter one
+    saved = min(routed, speculation["finished"]) - speculation["started"]
+    with _stats_lock:
+        _stats["hits"] += 1
+        _stats["saved_seconds"] += saved
+        hit_rate = _stats["hits"] / _stats["speculations"]
+    print(f"⚡ Speculation hit: {assigned_agent} saved {saved:.2f}s (hit rate {hit_rate:.0%})")
+    return response
+
+
+def get_speculation_stats():
+    """
+    Get process-wide speculative routing statistics.
+
+    Returns:
+        dict: {'speculations', 'hits', 'misses', 'skipped', 'hit_rate', 'saved_seconds'}
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["hit_rate"] = stats["hits"] / stats["speculations"] if stats["speculations"] else 0.0
+    return stats
@@ -0,0 +1,36 @@
+import threading
+
+try:
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+except ImportError:
+    add_script_run_ctx = get_script_run_ctx = None
+
+
+def with_script_run_ctx(fn):
+    """
+    Wrap fn so that Streamlit calls made from a worker thread reach the current session.
+
+    Agents call st.text / st.error directly. Without the session's script run
+    context those calls are dropped when they happen off the script thread.
+    Outside a Streamlit session (CLI, HTTP service) fn is returned unchanged.
+
+    Args:
+        fn (callable): Function that will run on another thread
+
+    Returns:
+        callable: fn, bound to the caller's script run context if there is one
+    """
+    if get_script_run_ctx is None:
+        return fn
+    try:
+        ctx = get_script_run_ctx(suppress_warning=True)
+    except TypeError:
+        ctx = get_script_run_ctx()
+    if ctx is None:
+        return fn
+
+    def wrapper(*args, **kwargs):
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return fn(*args, **kwargs)
+
+    return wrapper